@@ -1,3 +1,4 @@
+from .bit_sequence import BitSequence
 from .tests import NistSP80022r1Tests, TestOutcome
 
-__all__ = ["NistSP80022r1Tests", "TestOutcome"]
+__all__ = ["BitSequence", "NistSP80022r1Tests", "TestOutcome"]
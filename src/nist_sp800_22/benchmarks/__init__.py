@@ -0,0 +1,17 @@
+from .runner import (
+    BenchmarkReport,
+    Regression,
+    Timing,
+    compare,
+    random_bits,
+    run_benchmarks,
+)
+
+__all__ = [
+    "BenchmarkReport",
+    "Regression",
+    "Timing",
+    "compare",
+    "random_bits",
+    "run_benchmarks",
+]
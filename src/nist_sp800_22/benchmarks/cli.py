@@ -0,0 +1,90 @@
+import argparse
+import sys
+
+from nist_sp800_22.tests import NistSP80022r1Tests
+
+from .runner import DEFAULT_SIZES, BenchmarkReport, Timing, compare, run_benchmarks
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="sp800-22-bench",
+        description="Time the NIST SP800-22 tests on seeded random sequences.",
+    )
+    parser.add_argument(
+        "--sizes",
+        type=lambda value: int(float(value)),
+        nargs="+",
+        default=DEFAULT_SIZES,
+        help="sequence lengths in bits, e.g. 1e5 1e6",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="seed of the data")
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="runs per timing, the best is kept"
+    )
+    parser.add_argument(
+        "--tests",
+        nargs="+",
+        default=None,
+        help="names of the tests to time, e.g. 'Runs Test' (all by default)",
+    )
+    parser.add_argument(
+        "--no-suite",
+        action="store_true",
+        help="do not time NistSP80022r1Tests.run",
+    )
+    parser.add_argument("--output", help="write the timings to this JSON file")
+    parser.add_argument(
+        "--baseline", help="JSON file of earlier timings to compare against"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="slowdown over the baseline reported as a regression",
+    )
+    args = parser.parse_args(argv)
+
+    tests = NistSP80022r1Tests.tests
+    if args.tests is not None:
+        unknown = set(args.tests) - {test.name for test in tests}
+        if unknown:
+            parser.error("unknown tests: %s" % ", ".join(sorted(unknown)))
+        tests = [test for test in tests if test.name in args.tests]
+
+    def progress(timing: Timing) -> None:
+        print(
+            "  %-40s %12d bits %10.4fs" % (timing.name, timing.bits, timing.seconds),
+            file=sys.stderr,
+        )
+
+    report = run_benchmarks(
+        args.sizes, args.seed, args.repeat, tests, not args.no_suite, progress
+    )
+    print(report.format())
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report.model_dump_json(indent=2))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = BenchmarkReport.model_validate_json(f.read())
+        regressions = compare(report, baseline, args.tolerance)
+        print()
+        if not regressions:
+            print("No regression against %s" % args.baseline)
+            return 0
+        print("REGRESSIONS")
+        for regression in regressions:
+            print(
+                "%-40s %12d bits %10.4fs -> %10.4fs (x%.2f)"
+                % (
+                    regression.name,
+                    regression.bits,
+                    regression.baseline_seconds,
+                    regression.seconds,
+                    regression.ratio,
+                )
+            )
+        return 1
+    return 0
@@ -0,0 +1,175 @@
+import math
+import platform
+import time
+from functools import partial
+from typing import Callable
+
+import numpy as np
+from pydantic import BaseModel
+
+from nist_sp800_22.bit_sequence import BitSequence
+from nist_sp800_22.tests import NistSP80022r1Tests
+from nist_sp800_22.tests.test_interface import TestInterface
+
+DEFAULT_SIZES = [100000, 1000000, 10000000, 100000000]
+# Name under which the timings of NistSP80022r1Tests.run are reported
+SUITE_NAME = "Full Suite"
+
+
+class Timing(BaseModel):
+    name: str
+    bits: int
+    # Best of the repeats
+    seconds: float
+    bits_per_second: float
+    # False when the test declined the sequence, so the time is meaningless
+    eligible: bool
+
+
+class Regression(BaseModel):
+    name: str
+    bits: int
+    baseline_seconds: float
+    seconds: float
+    ratio: float
+
+
+class BenchmarkReport(BaseModel):
+    seed: int
+    repeat: int
+    sizes: list[int]
+    python: str
+    numpy: str
+    timings: list[Timing]
+
+    def scaling(self) -> dict[str, float | None]:
+        """Exponent b of the least squares fit time = a n^b, per name."""
+        exponents = {}
+        for name in dict.fromkeys(timing.name for timing in self.timings):
+            points = [
+                (math.log(timing.bits), math.log(timing.seconds))
+                for timing in self.timings
+                if timing.name == name and timing.eligible and timing.seconds > 0
+            ]
+            if len(points) < 2:
+                exponents[name] = None
+                continue
+            x, y = np.array(points).T
+            exponents[name] = float(np.polyfit(x, y, 1)[0])
+        return exponents
+
+    def format(self) -> str:
+        names = list(dict.fromkeys(timing.name for timing in self.timings))
+        by_key = {(timing.name, timing.bits): timing for timing in self.timings}
+        header = "%-40s" % "TEST" + "".join("%14.0e" % n for n in self.sizes)
+        lines = [header + "  EXPONENT", "-" * (len(header) + 10)]
+        exponents = self.scaling()
+        for name in names:
+            cells = ""
+            for n in self.sizes:
+                timing = by_key.get((name, n))
+                if timing is None or not timing.eligible:
+                    cells += "%14s" % "-"
+                else:
+                    cells += "%14s" % ("%.3g b/s" % timing.bits_per_second)
+            exponent = exponents[name]
+            lines.append(
+                "%-40s%s  %s"
+                % (name, cells, "-" if exponent is None else "%.2f" % exponent)
+            )
+        return "\n".join(lines)
+
+
+def random_bits(bits: int, seed: int = 0) -> BitSequence:
+    """``bits`` reproducible uniform random bits."""
+    rng = np.random.default_rng(seed)
+    data = rng.integers(0, 256, size=-(-bits // 8), dtype=np.uint8)
+    return BitSequence.from_buffer(data.tobytes(), length=bits)
+
+
+def _best_time(function: Callable[[], object], repeat: int) -> float:
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _timing(name: str, bits: int, seconds: float, eligible: bool) -> Timing:
+    return Timing(
+        name=name,
+        bits=bits,
+        seconds=seconds,
+        bits_per_second=bits / seconds if seconds > 0 else math.inf,
+        eligible=eligible,
+    )
+
+
+def run_benchmarks(
+    sizes: list[int] | None = None,
+    seed: int = 0,
+    repeat: int = 3,
+    tests: list[TestInterface] | None = None,
+    suite: bool = True,
+    progress: Callable[[Timing], None] | None = None,
+) -> BenchmarkReport:
+    """Time every test, and ``NistSP80022r1Tests.run`` when ``suite``, on
+    seeded random sequences of each of ``sizes`` bits."""
+    sizes = DEFAULT_SIZES if sizes is None else sizes
+    runner = NistSP80022r1Tests()
+    tests = runner.tests if tests is None else tests
+    timings = []
+
+    def record(timing: Timing) -> None:
+        timings.append(timing)
+        if progress is not None:
+            progress(timing)
+
+    for n in sizes:
+        bitstring = random_bits(n, seed)
+        for test in tests:
+            eligible = test.is_eligible(bitstring)
+            seconds = _best_time(partial(test.test, bitstring), repeat)
+            record(_timing(test.name, n, seconds, eligible))
+        if suite:
+            seconds = _best_time(partial(runner.run, bitstring), repeat)
+            record(_timing(SUITE_NAME, n, seconds, True))
+
+    return BenchmarkReport(
+        seed=seed,
+        repeat=repeat,
+        sizes=sizes,
+        python=platform.python_version(),
+        numpy=np.__version__,
+        timings=timings,
+    )
+
+
+def compare(
+    report: BenchmarkReport, baseline: BenchmarkReport, tolerance: float = 0.25
+) -> list[Regression]:
+    """Timings more than ``tolerance`` slower than the same name and size in
+    ``baseline``."""
+    reference = {
+        (timing.name, timing.bits): timing
+        for timing in baseline.timings
+        if timing.eligible
+    }
+    regressions = []
+    for timing in report.timings:
+        previous = reference.get((timing.name, timing.bits))
+        if previous is None or not timing.eligible or previous.seconds <= 0:
+            continue
+        ratio = timing.seconds / previous.seconds
+        if ratio > 1.0 + tolerance:
+            regressions.append(
+                Regression(
+                    name=timing.name,
+                    bits=timing.bits,
+                    baseline_seconds=previous.seconds,
+                    seconds=timing.seconds,
+                    ratio=ratio,
+                )
+            )
+    return regressions
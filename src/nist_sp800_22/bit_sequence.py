@@ -0,0 +1,206 @@
+from typing import Iterator, Literal, Sequence
+
+import numpy as np
+
+BitOrder = Literal["msb", "lsb"]
+
+_NUMPY_BITORDER = {"msb": "big", "lsb": "little"}
+
+# Every byte with its bits in the reverse order
+_REVERSED = np.packbits(
+    np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1),
+    axis=1,
+    bitorder="little",
+).reshape(-1)
+
+
+class BitSequence:
+    """A sequence of bits backed by a packed ``uint8`` buffer.
+
+    The packed buffer is never copied: constructing a ``BitSequence`` from
+    ``bytes``, ``bytearray``, ``memoryview``, ``mmap`` or a NumPy array only
+    wraps it, and slicing returns a new ``BitSequence`` sharing the same
+    buffer. ``bitorder`` tells which bit of each byte comes first ("msb" or
+    "lsb"). The unpacked representation (one ``uint8`` per bit) is produced
+    lazily, the first time a test asks for it, and is shared with slices.
+    """
+
+    __slots__ = ("_packed", "_offset", "_length", "_bitorder", "_unpacked")
+
+    def __init__(
+        self,
+        packed: np.ndarray,
+        length: int | None = None,
+        offset: int = 0,
+        bitorder: BitOrder = "msb",
+    ):
+        if bitorder not in _NUMPY_BITORDER:
+            raise ValueError("bitorder must be 'msb' or 'lsb', got %r" % bitorder)
+        if packed.dtype != np.uint8 or packed.ndim != 1:
+            raise ValueError("packed buffer must be a one dimensional uint8 array")
+        available = packed.size * 8
+        if offset < 0 or offset > available:
+            raise ValueError("offset %d is outside of the buffer" % offset)
+        if length is None:
+            length = available - offset
+        if length < 0 or offset + length > available:
+            raise ValueError(
+                "%d bits at offset %d do not fit in %d bytes"
+                % (length, offset, packed.size)
+            )
+        # Only keep the bytes that actually hold bits of the sequence.
+        first = offset // 8
+        last = (offset + length + 7) // 8
+        self._packed = packed[first:last]
+        self._offset = offset - first * 8
+        self._length = length
+        self._bitorder: BitOrder = bitorder
+        self._unpacked: np.ndarray | None = None
+
+    @classmethod
+    def from_buffer(
+        cls,
+        buffer,
+        length: int | None = None,
+        offset: int = 0,
+        bitorder: BitOrder = "msb",
+    ) -> "BitSequence":
+        """Wrap packed bytes without copying them.
+
+        ``buffer`` can be anything exposing the buffer protocol (``bytes``,
+        ``bytearray``, ``memoryview``, ``mmap``) or a NumPy array, whose raw
+        bytes are used. ``offset`` and ``length`` are expressed in bits.
+        """
+        if isinstance(buffer, np.ndarray):
+            packed = buffer.reshape(-1).view(np.uint8)
+        else:
+            packed = np.frombuffer(buffer, dtype=np.uint8)
+        return cls(packed, length=length, offset=offset, bitorder=bitorder)
+
+    @classmethod
+    def from_bits(cls, bits: Sequence[int] | np.ndarray) -> "BitSequence":
+        """Pack a sequence of 0/1 values."""
+        unpacked = np.asarray(bits, dtype=np.uint8).reshape(-1)
+        if unpacked.size and unpacked.max() > 1:
+            raise ValueError("bits must only contain 0 and 1")
+        sequence = cls(np.packbits(unpacked), length=unpacked.size)
+        sequence._unpacked = unpacked
+        return sequence
+
+    @property
+    def bitorder(self) -> BitOrder:
+        return self._bitorder
+
+    @property
+    def offset(self) -> int:
+        """Bit offset of the first bit inside the first byte of ``packed``."""
+        return self._offset
+
+    @property
+    def packed(self) -> np.ndarray:
+        """The bytes holding the sequence, starting at bit ``offset``."""
+        return self._packed
+
+    @property
+    def unpacked(self) -> np.ndarray:
+        """One ``uint8`` (0 or 1) per bit, computed on first access."""
+        if self._unpacked is None:
+            bits = np.unpackbits(self._packed, bitorder=_NUMPY_BITORDER[self._bitorder])
+            self._unpacked = bits[self._offset : self._offset + self._length]
+        return self._unpacked
+
+    def to_packed(self, bitorder: BitOrder = "msb") -> np.ndarray:
+        """Packed bytes starting at the first bit, in the requested order.
+
+        No copy is made when the sequence is byte aligned and already stored
+        in ``bitorder``. The unused bits of the last byte are set to zero.
+        """
+        tail = self._length % 8
+        if self._offset == 0 and self._bitorder == bitorder:
+            if tail == 0:
+                return self._packed
+            packed = self._packed.copy()
+            keep = (0xFF00 >> tail) & 0xFF if bitorder == "msb" else (1 << tail) - 1
+            packed[-1] &= keep
+            return packed
+        # Shift and reverse the packed bytes rather than unpacking them
+        packed = self._packed
+        if self._bitorder == "lsb":
+            packed = _REVERSED[packed]
+        if self._offset:
+            following = np.append(packed[1:], np.uint8(0))
+            packed = (packed << self._offset) | (following >> (8 - self._offset))
+        packed = packed[: -(-self._length // 8)]
+        if bitorder == "lsb":
+            packed = _REVERSED[packed]
+        if tail:
+            keep = (0xFF00 >> tail) & 0xFF if bitorder == "msb" else (1 << tail) - 1
+            packed[-1] &= keep
+        return packed
+
+    def split(
+        self, count: int | None = None, length: int | None = None
+    ) -> list["BitSequence"]:
+        """Split into ``count`` consecutive views of ``length`` bits each.
+
+        Either argument can be omitted, in which case it is derived from the
+        other one. Trailing bits that do not fill a whole view are ignored.
+        """
+        if (count is not None and count <= 0) or (length is not None and length <= 0):
+            raise ValueError("count and length must be positive")
+        if count is None and length is None:
+            raise ValueError("count or length must be given")
+        if length is None:
+            length = self._length // count
+        if count is None:
+            count = self._length // length
+        if count == 0 or length == 0 or count * length > self._length:
+            raise ValueError(
+                "cannot split %d bits into %d sequences of %d bits"
+                % (self._length, count, length)
+            )
+        return [self[i * length : (i + 1) * length] for i in range(count)]
+
+    def tolist(self) -> list[int]:
+        return self.unpacked.tolist()
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.tolist())
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._length)
+            if step != 1:
+                return BitSequence.from_bits(self.unpacked[index])
+            stop = max(start, stop)
+            view = BitSequence(
+                self._packed,
+                length=stop - start,
+                offset=self._offset + start,
+                bitorder=self._bitorder,
+            )
+            if self._unpacked is not None:
+                view._unpacked = self._unpacked[start:stop]
+            return view
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("bit index out of range")
+        if self._unpacked is not None:
+            return int(self._unpacked[index])
+        position = self._offset + index
+        shift = 7 - position % 8 if self._bitorder == "msb" else position % 8
+        return (int(self._packed[position // 8]) >> shift) & 1
+
+    def __repr__(self) -> str:
+        return "BitSequence(length=%d, bitorder=%r)" % (self._length, self._bitorder)
+
+
+def as_bit_sequence(bits: "BitSequence | Sequence[int] | np.ndarray") -> BitSequence:
+    """Return ``bits`` as a ``BitSequence``, packing it if it holds 0/1 values."""
+    if isinstance(bits, BitSequence):
+        return bits
+    return BitSequence.from_bits(bits)
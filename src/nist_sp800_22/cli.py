@@ -0,0 +1,190 @@
+import argparse
+import time
+
+from .file_reader import read_bit_sequences, stream_file
+from .tests import (
+    DEFAULT_POLICY,
+    Instrumentation,
+    NeverStop,
+    NistSP80022r1Tests,
+    ResultCache,
+    StopOnFirstFailure,
+    TestOutcome,
+    TestResult,
+)
+
+POLICIES = {
+    "never": NeverStop(),
+    "first": StopOnFirstFailure(),
+    "monobit": DEFAULT_POLICY,
+}
+
+
+def _format_p(p_value, p_list) -> str:
+    if p_value is not None:
+        return repr(p_value)
+    if p_list is not None:
+        return "%r (min of %d)" % (min(p_list), len(p_list))
+    return "-"
+
+
+def print_summary(results: dict) -> None:
+    print("SUMMARY")
+    print("-------")
+    for name, (outcome, p_value, p_list) in results.items():
+        print("%-40s %-30s %s" % (name, _format_p(p_value, p_list), outcome))
+
+
+def any_failed(results: dict) -> bool:
+    return any(
+        outcome == TestOutcome.FAILED.value for outcome, _, _ in results.values()
+    )
+
+
+def print_metrics(name: str, result: TestResult) -> None:
+    metrics = result.metrics
+    if metrics is None:
+        return
+    phases = ", ".join("%s %.4fs" % item for item in metrics.phases.items())
+    memory = (
+        "-"
+        if metrics.peak_memory_bytes is None
+        else "%.1f MiB" % (metrics.peak_memory_bytes / 2**20)
+    )
+    print(
+        "  %-40s wall %.4fs  cpu %.4fs  peak %s  %s"
+        % (name, metrics.wall_seconds, metrics.cpu_seconds, memory, phases)
+    )
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="sp800-22",
+        description="Run the NIST SP800-22 Rev1a tests on a binary file. "
+        "The command exits with status 1 when a test fails.",
+    )
+    parser.add_argument("filename", help="binary file holding the bits to test")
+    parser.add_argument(
+        "--offset", type=int, default=0, help="first byte of the file to read"
+    )
+    parser.add_argument(
+        "--length", type=int, default=None, help="number of bytes to read"
+    )
+    parser.add_argument(
+        "--sequences", type=int, default=None, help="number of sequences to test"
+    )
+    parser.add_argument(
+        "--bits", type=int, default=None, help="number of bits per sequence"
+    )
+    parser.add_argument(
+        "--bitorder",
+        choices=("msb", "lsb"),
+        default="msb",
+        help="which bit of each byte comes first",
+    )
+    parser.add_argument(
+        "--executor",
+        choices=("serial", "thread", "process"),
+        default="serial",
+        help="run the tests of a sequence serially or concurrently",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None, help="number of concurrent workers"
+    )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="split the capture with --sequences/--bits and report the "
+        "proportion of passing sequences and the uniformity of the p-values",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="read the file in chunks and test it in bounded memory",
+    )
+    parser.add_argument(
+        "--metrics",
+        action="store_true",
+        help="print the time, peak memory and phase timings of every test",
+    )
+    parser.add_argument(
+        "--cache",
+        default=None,
+        help="SQLite file caching the results of previously tested sequences",
+    )
+    parser.add_argument(
+        "--fail-fast",
+        choices=tuple(POLICIES),
+        default="monobit",
+        help="skip the remaining tests of a sequence once any test, or "
+        "Monobit, fails, or never",
+    )
+    args = parser.parse_args(argv)
+
+    if args.stream:
+        start = time.perf_counter()
+        results = stream_file(
+            args.filename,
+            offset=args.offset,
+            length=args.length,
+            bitorder=args.bitorder,
+        )
+        print("Tests of Distinguishability from Random")
+        print()
+        print_summary(results)
+        print("Streamed the file in %.3fs" % (time.perf_counter() - start))
+        return 1 if any_failed(results) else 0
+
+    start = time.perf_counter()
+    sequences = read_bit_sequences(
+        args.filename,
+        offset=args.offset,
+        length=args.length,
+        # Batch mode splits the capture itself
+        sequences=None if args.batch else args.sequences,
+        bits=None if args.batch else args.bits,
+        bitorder=args.bitorder,
+    )
+    print("Tests of Distinguishability from Random")
+    print(
+        "Mapped %d sequence(s) of %d bits in %.3fs"
+        % (len(sequences), len(sequences[0]), time.perf_counter() - start)
+    )
+
+    suite = NistSP80022r1Tests(
+        cache=ResultCache(args.cache) if args.cache else None,
+        policy=POLICIES[args.fail_fast],
+    )
+    if args.metrics:
+        suite.instrumentation = Instrumentation(trace_memory=True)
+        suite.add_observer(print_metrics)
+    if args.batch:
+        start = time.perf_counter()
+        report = suite.run_batch(
+            sequences[0],
+            sequences=args.sequences,
+            sequence_length=args.bits,
+            executor=args.executor,
+            max_workers=args.workers,
+        )
+        print()
+        print(report.format())
+        print(
+            "Tested %d sequences in %.3fs"
+            % (report.sequences, time.perf_counter() - start)
+        )
+        failures = [r for r in report.results if r.outcome == TestOutcome.FAILED]
+        return 1 if failures else 0
+
+    status = 0
+    for index, sequence in enumerate(sequences):
+        start = time.perf_counter()
+        results = suite.run(sequence, executor=args.executor, max_workers=args.workers)
+        print()
+        if len(sequences) > 1:
+            print("SEQUENCE %d" % index)
+        print_summary(results)
+        print("Tested %d bits in %.3fs" % (len(sequence), time.perf_counter() - start))
+        if any_failed(results):
+            status = 1
+    return status
@@ -0,0 +1,98 @@
+import mmap
+import os
+
+from .bit_sequence import BitOrder, BitSequence
+from .tests import NistSP80022r1Tests
+
+
+def read_bit_sequences(
+    path: str | os.PathLike,
+    offset: int = 0,
+    length: int | None = None,
+    sequences: int | None = None,
+    bits: int | None = None,
+    bitorder: BitOrder = "msb",
+) -> list[BitSequence]:
+    """Memory-map ``path`` and return zero-copy views over its bits.
+
+    ``offset`` and ``length`` select a byte range of the file. The range is
+    returned as a single sequence, or split into ``sequences`` sequences of
+    ``bits`` bits each when either of them is given.
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if offset < 0 or offset > size:
+            raise ValueError(
+                "offset %d is outside of %s (%d bytes)" % (offset, path, size)
+            )
+        if length is None:
+            length = size - offset
+        if length <= 0 or offset + length > size:
+            raise ValueError(
+                "cannot read %d bytes at offset %d from %s (%d bytes)"
+                % (length, offset, path, size)
+            )
+        # The array returned by from_buffer keeps the mapping alive.
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    data = BitSequence.from_buffer(
+        mapped, length=length * 8, offset=offset * 8, bitorder=bitorder
+    )
+    if sequences is None and bits is None:
+        return [data]
+    return data.split(sequences, bits)
+
+
+def run_file(
+    path: str | os.PathLike,
+    offset: int = 0,
+    length: int | None = None,
+    sequences: int | None = None,
+    bits: int | None = None,
+    bitorder: BitOrder = "msb",
+) -> list[dict]:
+    """Run the test suite on every sequence read from ``path``."""
+    suite = NistSP80022r1Tests()
+    return [
+        suite.run(sequence)
+        for sequence in read_bit_sequences(
+            path, offset, length, sequences, bits, bitorder
+        )
+    ]
+
+
+def stream_file(
+    path: str | os.PathLike,
+    offset: int = 0,
+    length: int | None = None,
+    bitorder: BitOrder = "msb",
+    chunk_size: int = 1 << 20,
+) -> dict:
+    """Run the test suite on a byte range of ``path`` in bounded memory.
+
+    The range is read ``chunk_size`` bytes at a time and fed to a
+    ``TestStream``, so the whole file is never held in memory.
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if offset < 0 or offset > size:
+            raise ValueError(
+                "offset %d is outside of %s (%d bytes)" % (offset, path, size)
+            )
+        if length is None:
+            length = size - offset
+        if length <= 0 or offset + length > size:
+            raise ValueError(
+                "cannot read %d bytes at offset %d from %s (%d bytes)"
+                % (length, offset, path, size)
+            )
+        stream = NistSP80022r1Tests().stream(length * 8)
+        f.seek(offset)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            stream.update(BitSequence.from_buffer(chunk, bitorder=bitorder))
+            remaining -= len(chunk)
+    return stream.finalize()
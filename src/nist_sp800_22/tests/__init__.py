@@ -15,8 +15,21 @@ from .non_overlapping_template_matching import NonOverlappingTemplateMatchingTes
 from .linear_complexity import LinearComplexityTest
 
 from .test_outcome_enum import TestOutcome
-from .test_result import TestResult
+from .test_result import TestMetrics, TestResult
+from .instrumentation import Instrumentation, phase
+from .cache import ResultCache
+from .termination import (
+    DEFAULT_POLICY,
+    NeverStop,
+    StopOnFailureOf,
+    StopOnFirstFailure,
+    TerminationPolicy,
+)
 from .test_suite import NistSP80022r1Tests
+from .batch import BatchReport, SecondLevelResult
+from .sequence_context import SequenceContext
+from .monitor import Alert, HealthMonitor
+from .streaming import Accumulator, AccumulatorState, StreamState, TestStream
 
 __all__ = [
     "ApproximateEntropyTest",
@@ -36,5 +49,23 @@ __all__ = [
     "LinearComplexityTest",
     "TestOutcome",
     "TestResult",
+    "TestMetrics",
+    "Instrumentation",
+    "phase",
+    "ResultCache",
     "NistSP80022r1Tests",
+    "TerminationPolicy",
+    "NeverStop",
+    "StopOnFirstFailure",
+    "StopOnFailureOf",
+    "DEFAULT_POLICY",
+    "BatchReport",
+    "SecondLevelResult",
+    "SequenceContext",
+    "Accumulator",
+    "TestStream",
+    "AccumulatorState",
+    "StreamState",
+    "Alert",
+    "HealthMonitor",
 ]
@@ -16,54 +16,78 @@
 # You should have received a copy of the GNU General Public License
 # along with sp800_22_tests.  If not, see <http://www.gnu.org/licenses/>.
 
-from typing import Sequence
+from nist_sp800_22.bit_sequence import BitSequence
 
 from .test_result import TestResult
 
 from .test_outcome_enum import TestOutcome
 from nist_sp800_22.utils.gamma_functions import gammaincc
 from .test_interface import TestInterface
+from .sequence_context import SequenceContext
+from .parameters import ApproximateEntropyParameters
+from .instrumentation import phase
+from .streaming import Accumulator
 import math
+import numpy as np
+from nist_sp800_22.utils.pattern_counts import (
+    StreamingPatternCounts,
+    marginal_histogram,
+    pattern_histogram,
+)
 
 
 class ApproximateEntropyTest(TestInterface):
     name = "Approximate Entropy Test"
+    cost = 5
 
-    def _bits_to_int(self, bits):
-        theint = 0
-        for i in range(len(bits)):
-            theint = (theint << 1) + bits[i]
-        return theint
-
-    def _test(self, bitstring: Sequence, verbose: bool = False) -> TestResult:
-        n = len(bitstring)
+    def __init__(self, pattern_length: int | None = None):
+        # None picks m from n, at most 3
+        self.parameters = ApproximateEntropyParameters(pattern_length=pattern_length)
+        self._pattern_length: int | None = pattern_length
 
+    def pattern_length(self, n: int) -> int:
+        if self._pattern_length is not None:
+            return self._pattern_length
         m = int(math.floor(math.log(n, 2))) - 6
         if m < 2:
             m = 2
         if m > 3:
             m = 3
-
+        return m
+
+    def _test(
+        self,
+        bitstring: BitSequence,
+        verbose: bool = False,
+        context: SequenceContext | None = None,
+    ) -> TestResult:
+        n = len(bitstring)
+        bits = bitstring.unpacked
+        m = self.pattern_length(n)
+
+        # Steps 1 and 2: the (m+1)-bit histogram in one pass
+        with phase("histogram"):
+            longer = pattern_histogram(bits, m + 1)
+        with phase("entropy"):
+            return self._evaluate(n, m, longer, verbose)
+
+    def _evaluate(
+        self, n: int, m: int, longer: np.ndarray, verbose: bool = False
+    ) -> TestResult:
         if verbose:
             print("  n         = ", n)
             print("  m         = ", m)
 
+        # The m-bit histogram by adding up the pairs of patterns that only
+        # differ by the last bit
+        histograms = {m: marginal_histogram(longer, 1), m + 1: longer}
+
         Cmi = list()
         phi_m = list()
         for iterm in range(m, m + 2):
-            # Step 1
-            padded_bits = bitstring + bitstring[0 : iterm - 1]
-
-            # Step 2
-            counts = list()
-            for i in range(2**iterm):
-                # print "  Pattern #%d of %d" % (i+1,2**iterm)
-                count = 0
-                for j in range(n):
-                    if self._bits_to_int(padded_bits[j : j + iterm]) == i:
-                        count += 1
-                counts.append(count)
-                if verbose:
+            counts = histograms[iterm].tolist()
+            if verbose:
+                for i, count in enumerate(counts):
                     print("  Pattern %d of %d, count = %d" % (i + 1, 2**iterm, count))
 
             # step 3
@@ -100,5 +124,37 @@ class ApproximateEntropyTest(TestInterface):
         outcome = TestOutcome.PASSED if (p >= 0.01) else TestOutcome.FAILED
         return TestResult(outcome=outcome, p_value=p, p_list=None)
 
-    def is_eligible(self, bitstring: Sequence) -> bool:
-        return True
+    def is_eligible(
+        self, bitstring: BitSequence, context: SequenceContext | None = None
+    ) -> bool:
+        n = len(bitstring)
+        return n > 0 and n >= self.pattern_length(n) + 1
+
+    def accumulator(
+        self, length: int | None = None, offset: int = 0
+    ) -> "ApproximateEntropyAccumulator":
+        return ApproximateEntropyAccumulator(self, length, offset)
+
+
+class ApproximateEntropyAccumulator(Accumulator):
+    mergeable = True
+    state_fields = ("patterns",)
+
+    def __init__(
+        self, test: ApproximateEntropyTest, length: int | None = None, offset: int = 0
+    ):
+        super().__init__(test, length, offset)
+        self.m = test.pattern_length(max(self.reference_length, 1))
+        self.patterns = StreamingPatternCounts(self.m + 1)
+
+    def _update(self, bits: np.ndarray) -> None:
+        self.patterns.update(bits)
+
+    def _merge(self, other: "ApproximateEntropyAccumulator") -> None:
+        self.patterns.merge(other.patterns)
+
+    def is_eligible(self) -> bool:
+        return self.n >= self.m + 1
+
+    def _finalize(self) -> TestResult:
+        return self.test._evaluate(self.n, self.m, self.patterns.histogram())
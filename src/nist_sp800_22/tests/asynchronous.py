@@ -0,0 +1,125 @@
+import asyncio
+from concurrent.futures import wait
+from typing import AsyncIterable, AsyncIterator, Sequence
+
+from nist_sp800_22.bit_sequence import BitSequence, as_bit_sequence
+
+from .parallel import (
+    ExecutorKind,
+    SharedBitSequence,
+    get_executor,
+    run_shared_test,
+)
+from .instrumentation import Instrumentation
+from .sequence_context import SequenceContext
+from .test_interface import TestInterface
+from .test_result import TestResult
+
+AsyncSource = (
+    asyncio.StreamReader
+    | AsyncIterable[bytes]
+    | BitSequence
+    | bytes
+    | bytearray
+    | memoryview
+    | Sequence
+)
+
+# Bytes asked for at once from a StreamReader
+READ_SIZE = 1 << 16
+
+
+async def read_source(source: AsyncSource) -> BitSequence:
+    """Bits of a ``StreamReader`` or an async iterator of byte chunks, read
+    until the end. Anything else is taken as the bits themselves."""
+    if isinstance(source, asyncio.StreamReader):
+        data = bytearray()
+        while chunk := await source.read(READ_SIZE):
+            data += chunk
+    elif hasattr(source, "__aiter__"):
+        data = bytearray()
+        async for chunk in source:
+            data += chunk
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        return BitSequence.from_buffer(source)
+    else:
+        return as_bit_sequence(source)
+    return BitSequence.from_buffer(bytes(data))
+
+
+async def iter_results_async(
+    tests: list[TestInterface],
+    bitstring: BitSequence,
+    executor: ExecutorKind = "thread",
+    max_workers: int | None = None,
+    instrumentation: Instrumentation | None = None,
+) -> AsyncIterator[tuple[TestInterface, TestResult]]:
+    """Run ``tests`` in an executor and yield their results as they complete.
+
+    The tests are submitted cheapest first, so that quick verdicts come out
+    while the expensive tests are still running.
+    """
+    loop = asyncio.get_running_loop()
+    ordered = sorted(tests, key=lambda test: test.cost)
+    if executor == "serial":
+        # One test at a time, still off the event loop
+        context = SequenceContext(bitstring)
+        for test in ordered:
+            result = await loop.run_in_executor(
+                None,
+                lambda test=test: test.test(
+                    bitstring, context=context, instrumentation=instrumentation
+                ),
+            )
+            yield test, result
+        return
+
+    pool = get_executor(executor, max_workers)
+    shared = None
+    if executor == "thread":
+        context = SequenceContext(bitstring)
+        cfutures = {
+            pool.submit(
+                test.test,
+                bitstring,
+                context=context,
+                instrumentation=instrumentation,
+            ): test
+            for test in ordered
+        }
+    else:
+        # Worker processes map the packed bits instead of receiving a pickle
+        shared = SharedBitSequence(bitstring)
+        cfutures = {
+            pool.submit(
+                run_shared_test,
+                test,
+                shared.name,
+                shared.length,
+                instrumentation,
+            ): test
+            for test in ordered
+        }
+    futures = {
+        asyncio.wrap_future(cfuture, loop=loop): test
+        for cfuture, test in cfutures.items()
+    }
+    try:
+        pending = set(futures)
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            # Ties are reported cheapest first
+            for future in sorted(done, key=lambda future: futures[future].cost):
+                yield futures[future], future.result()
+    finally:
+        # Tests not started yet are dropped once the verdict is settled
+        for cfuture in cfutures:
+            cfuture.cancel()
+        if shared is not None:
+            # Let the running tests finish with the block before unlinking
+            # it. Cancelling the asyncio futures does not stop them, so wait
+            # on the pool's own futures.
+            await loop.run_in_executor(None, wait, cfutures)
+            shared.close()
@@ -0,0 +1,225 @@
+import math
+
+import numpy as np
+from pydantic import BaseModel
+
+from nist_sp800_22.bit_sequence import BitSequence
+from nist_sp800_22.utils.special_functions import igamc
+
+from .parallel import (
+    ExecutorKind,
+    SharedBitSequence,
+    get_executor,
+    iter_results,
+    run_shared_sequence,
+)
+from .test_interface import TestInterface
+from .test_outcome_enum import TestOutcome
+from .test_result import TestResult
+
+# SP800-22 section 4.2.2: p-values are binned into 10 intervals and the
+# uniformity P-value below this threshold means they are not uniform.
+UNIFORMITY_BINS = 10
+UNIFORMITY_THRESHOLD = 0.0001
+# Below this many sequences the uniformity check is not meaningful (4.2.2)
+UNIFORMITY_MIN_SEQUENCES = 55
+
+
+class SecondLevelResult(BaseModel):
+    name: str
+    # Position in the test's p_list, None when the test reports one p_value
+    index: int | None
+    histogram: list[int]
+    uniformity_p_value: float | None
+    passed: int
+    total: int
+    proportion_min: float
+    proportion_max: float
+    outcome: TestOutcome
+
+
+class BatchReport(BaseModel):
+    sequences: int
+    sequence_length: int
+    alpha: float
+    results: list[SecondLevelResult]
+
+    def format(self) -> str:
+        rule = "-" * 86
+        lines = [
+            rule,
+            "RESULTS FOR THE UNIFORMITY OF P-VALUES"
+            " AND THE PROPORTION OF PASSING SEQUENCES",
+            rule,
+            "%d sequences of %d bits, alpha = %g"
+            % (self.sequences, self.sequence_length, self.alpha),
+            rule,
+            " C1  C2  C3  C4  C5  C6  C7  C8  C9 C10"
+            "  P-VALUE   PROPORTION  STATISTICAL TEST",
+            rule,
+        ]
+        for result in self.results:
+            name = result.name
+            if result.index is not None:
+                name += " [%d]" % (result.index + 1)
+            if result.uniformity_p_value is None:
+                uniformity = "   ----  "
+            else:
+                uniformity = "%9.6f" % result.uniformity_p_value
+            flag = "*" if result.outcome == TestOutcome.FAILED else " "
+            lines.append(
+                "%s %s %6d/%-6d%s %s"
+                % (
+                    "".join("%3d " % c for c in result.histogram),
+                    uniformity,
+                    result.passed,
+                    result.total,
+                    flag,
+                    name,
+                )
+            )
+        lines.append(rule)
+        lines.append(
+            "The minimum pass rate is %.4f of the sequences tested for each test."
+            % (
+                1.0
+                - self.alpha
+                - 3.0 * math.sqrt(self.alpha * (1.0 - self.alpha) / self.sequences)
+            )
+        )
+        lines.append("* marks a failed proportion or uniformity check.")
+        return "\n".join(lines)
+
+
+def _p_value_matrix(results: list[TestResult]) -> np.ndarray:
+    """(sequences, k) p-values of one test, NaN where the test did not run."""
+    width = max(
+        (
+            1 if r.p_value is not None or r.p_list is None else len(r.p_list)
+            for r in results
+        ),
+        default=1,
+    )
+    matrix = np.full((len(results), width), np.nan)
+    for row, result in enumerate(results):
+        if result.outcome == TestOutcome.UNELIGIBLE:
+            continue
+        if result.p_value is not None:
+            matrix[row, 0] = result.p_value
+        elif result.p_list is not None:
+            matrix[row, : len(result.p_list)] = result.p_list
+    return matrix
+
+
+def analyse(
+    name: str, results: list[TestResult], alpha: float = 0.01
+) -> list[SecondLevelResult]:
+    """Proportion of passing sequences and uniformity of the p-values."""
+    p_values = _p_value_matrix(results)
+    valid = ~np.isnan(p_values)
+    total = valid.sum(axis=0)
+    passed = (valid & (np.nan_to_num(p_values, nan=-1.0) >= alpha)).sum(axis=0)
+
+    # Histogram of every column at once: bin b of column c goes to c*10 + b
+    columns = p_values.shape[1]
+    bins = np.minimum(
+        (np.nan_to_num(p_values) * UNIFORMITY_BINS).astype(np.int64),
+        UNIFORMITY_BINS - 1,
+    )
+    bins += np.arange(columns) * UNIFORMITY_BINS
+    histogram = np.bincount(bins[valid], minlength=columns * UNIFORMITY_BINS).reshape(
+        columns, UNIFORMITY_BINS
+    )
+    expected = total / UNIFORMITY_BINS
+    with np.errstate(divide="ignore", invalid="ignore"):
+        chisq = (((histogram - expected[:, None]) ** 2) / expected[:, None]).sum(axis=1)
+
+    # Acceptable proportion: p_hat +/- 3 sqrt(p_hat (1 - p_hat) / m) (4.2.1)
+    p_hat = 1.0 - alpha
+    with np.errstate(divide="ignore", invalid="ignore"):
+        margin = 3.0 * np.sqrt(p_hat * alpha / total)
+    proportion = np.where(total > 0, passed / np.maximum(total, 1), 0.0)
+    uniformities = igamc((UNIFORMITY_BINS - 1) / 2.0, chisq / 2.0)
+
+    summaries = []
+    for column in range(columns):
+        if total[column] == 0:
+            uniformity = None
+        else:
+            uniformity = float(uniformities[column])
+        success = proportion[column] >= p_hat - margin[column]
+        if uniformity is not None and total[column] >= UNIFORMITY_MIN_SEQUENCES:
+            success = success and uniformity >= UNIFORMITY_THRESHOLD
+        if total[column] == 0:
+            outcome = TestOutcome.UNELIGIBLE
+        else:
+            outcome = TestOutcome.PASSED if success else TestOutcome.FAILED
+        summaries.append(
+            SecondLevelResult(
+                name=name,
+                index=None if columns == 1 else column,
+                histogram=histogram[column].tolist(),
+                uniformity_p_value=uniformity,
+                passed=int(passed[column]),
+                total=int(total[column]),
+                proportion_min=float(p_hat - margin[column]) if total[column] else 0.0,
+                proportion_max=float(p_hat + margin[column]) if total[column] else 0.0,
+                outcome=outcome,
+            )
+        )
+    return summaries
+
+
+def run_batch(
+    tests: list[TestInterface],
+    bitstring: BitSequence,
+    sequences: int | None = None,
+    sequence_length: int | None = None,
+    executor: ExecutorKind = "process",
+    max_workers: int | None = None,
+    alpha: float = 0.01,
+) -> BatchReport:
+    """Run ``tests`` on each of ``sequences`` views of ``sequence_length`` bits."""
+    views = bitstring.split(sequences, sequence_length)
+
+    if executor == "serial":
+        per_sequence = [
+            [result for _, result in iter_results(tests, view)] for view in views
+        ]
+    elif executor == "thread":
+        pool = get_executor(executor, max_workers)
+        futures = [
+            pool.submit(lambda v: [r for _, r in iter_results(tests, v)], view)
+            for view in views
+        ]
+        per_sequence = [f.result() for f in futures]
+    else:
+        # The capture is copied to shared memory once; each task only names
+        # the range of bits its sequence covers.
+        pool = get_executor(executor, max_workers)
+        length = len(views[0])
+        with SharedBitSequence(bitstring) as shared:
+            futures = [
+                pool.submit(
+                    run_shared_sequence,
+                    tests,
+                    shared.name,
+                    shared.length,
+                    i * length,
+                    (i + 1) * length,
+                )
+                for i in range(len(views))
+            ]
+            per_sequence = [f.result() for f in futures]
+
+    results = []
+    for position, test in enumerate(tests):
+        results.extend(
+            analyse(test.name, [row[position] for row in per_sequence], alpha)
+        )
+    return BatchReport(
+        sequences=len(views),
+        sequence_length=len(views[0]),
+        alpha=alpha,
+        results=results,
+    )
@@ -16,25 +16,51 @@
 # You should have received a copy of the GNU General Public License
 # along with sp800_22_tests.  If not, see <http://www.gnu.org/licenses/>.
 
-from typing import Sequence
+from functools import lru_cache
+
+from nist_sp800_22.bit_sequence import BitSequence
 from .test_result import TestResult
 
 from .test_outcome_enum import TestOutcome
 from .test_interface import TestInterface
+from .sequence_context import SequenceContext
+from .parameters import BinaryMatrixRankParameters
+from .instrumentation import phase
+from .streaming import BlockAccumulator, BlockBuffer
 import math
-import nist_sp800_22.utils.gf2matrix as gf2matrix
+import numpy as np
+from nist_sp800_22.utils.gf2rank import (
+    batched_rank,
+    pack_rows,
+    rank_probability,
+)
+
+
+@lru_cache(maxsize=None)
+def reference_probabilities(M: int, Q: int) -> tuple[float, float, float]:
+    # Full rank, full rank - 1 and lower rank probabilities of a M x Q matrix
+    full = min(M, Q)
+    FR_prob = rank_probability(full, M, Q)
+    FRM1_prob = rank_probability(full - 1, M, Q)
+    return FR_prob, FRM1_prob, 1.0 - (FR_prob + FRM1_prob)
 
 
 class BinaryMatrixRankTest(TestInterface):
     name = "Binary Matrix Rank Test"
+    cost = 5
 
-    def __init__(self):
-        pass
-        self._rows_number: int = 32
-        self._cols_number: int = 32
+    def __init__(self, rows: int = 32, cols: int = 32):
+        self.parameters = BinaryMatrixRankParameters(rows=rows, cols=cols)
+        self._rows_number: int = rows
+        self._cols_number: int = cols
         self._block_size_min: int = 38
 
-    def _test(self, bitstring: Sequence, verbose: bool = False) -> TestResult:
+    def _test(
+        self,
+        bitstring: BitSequence,
+        verbose: bool = False,
+        context: SequenceContext | None = None,
+    ) -> TestResult:
         n = len(bitstring)
         M = self._rows_number
         Q = self._cols_number
@@ -45,48 +71,30 @@ class BinaryMatrixRankTest(TestInterface):
             print("  Data bits used: %d" % (N * M * Q))
             print("  Data bits discarded: %d" % (n - (N * M * Q)))
 
-        if N < 38:  # ~is_eligible
-            print("  Number of blocks must be greater than 37")
-            p = 0.0
-            return False, p, None
+        FM, FMM = self._rank_counts(bitstring.unpacked[: N * M * Q])
+        with phase("chi-square"):
+            return self._evaluate(N, FM, FMM, verbose)
+
+    def _rank_counts(self, bits: np.ndarray) -> tuple[int, int]:
+        # Rows of Q bits, packed into words, then all the ranks at once
+        M = self._rows_number
+        Q = self._cols_number
+        with phase("build blocks"):
+            rows = pack_rows(bits.reshape(-1, M, Q))
+        with phase("rank"):
+            ranks = batched_rank(rows, Q)
 
+        full = min(M, Q)
+        FM = int(np.count_nonzero(ranks == full))  # Number of full rank matrices
+        FMM = int(np.count_nonzero(ranks == full - 1))  # Number of rank -1 matrices
+        return FM, FMM
+
+    def _evaluate(self, N: int, FM: int, FMM: int, verbose: bool = False) -> TestResult:
         # Compute the reference probabilities for FM, FMM and remainder
-        r = M
-        product = 1.0
-        for i in range(r):
-            upper1 = 1.0 - (2.0 ** (i - Q))
-            upper2 = 1.0 - (2.0 ** (i - M))
-            lower = 1 - (2.0 ** (i - r))
-            product = product * ((upper1 * upper2) / lower)
-        FR_prob = product * (2.0 ** ((r * (Q + M - r)) - (M * Q)))
-
-        r = M - 1
-        product = 1.0
-        for i in range(r):
-            upper1 = 1.0 - (2.0 ** (i - Q))
-            upper2 = 1.0 - (2.0 ** (i - M))
-            lower = 1 - (2.0 ** (i - r))
-            product = product * ((upper1 * upper2) / lower)
-        FRM1_prob = product * (2.0 ** ((r * (Q + M - r)) - (M * Q)))
-
-        LR_prob = 1.0 - (FR_prob + FRM1_prob)
-
-        FM = 0  # Number of full rank matrices
-        FMM = 0  # Number of rank -1 matrices
-        remainder = 0
-        for blknum in range(N):
-            block = bitstring[blknum * (M * Q) : (blknum + 1) * (M * Q)]
-            # Put in a matrix
-            matrix = gf2matrix.matrix_from_bits(M, Q, block, blknum)
-            # Compute rank
-            rank = gf2matrix.rank(M, Q, matrix, blknum)
-
-            if rank == M:  # count the result
-                FM += 1
-            elif rank == M - 1:
-                FMM += 1
-            else:
-                remainder += 1
+        FR_prob, FRM1_prob, LR_prob = reference_probabilities(
+            self._rows_number, self._cols_number
+        )
+        remainder = N - FM - FMM
 
         chisq = ((FM - (FR_prob * N)) ** 2) / (FR_prob * N)
         chisq += ((FMM - (FRM1_prob * N)) ** 2) / (FRM1_prob * N)
@@ -101,10 +109,44 @@ class BinaryMatrixRankTest(TestInterface):
         outcome = TestOutcome.PASSED if (p >= 0.01) else TestOutcome.FAILED
         return TestResult(outcome=outcome, p_value=p, p_list=None)
 
-    def is_eligible(self, bitstring: Sequence) -> bool:
+    def is_eligible(
+        self, bitstring: BitSequence, context: SequenceContext | None = None
+    ) -> bool:
         blocks_number: int = int(
             math.floor(len(bitstring) / (self._rows_number * self._cols_number))
         )
         if blocks_number < self._block_size_min:
             return False
         return True
+
+    def accumulator(
+        self, length: int | None = None, offset: int = 0
+    ) -> "BinaryMatrixRankAccumulator":
+        return BinaryMatrixRankAccumulator(self, length, offset)
+
+
+class BinaryMatrixRankAccumulator(BlockAccumulator):
+    state_fields = ("buffer", "FM", "FMM")
+
+    def __init__(
+        self, test: BinaryMatrixRankTest, length: int | None = None, offset: int = 0
+    ):
+        super().__init__(test, length, offset)
+        self.buffer = BlockBuffer(test._rows_number * test._cols_number, offset=offset)
+        self.FM = 0
+        self.FMM = 0
+
+    def _add_blocks(self, matrices: np.ndarray) -> None:
+        FM, FMM = self.test._rank_counts(matrices)
+        self.FM += FM
+        self.FMM += FMM
+
+    def _merge_blocks(self, other: "BinaryMatrixRankAccumulator") -> None:
+        self.FM += other.FM
+        self.FMM += other.FMM
+
+    def is_eligible(self) -> bool:
+        return self.buffer.blocks >= self.test._block_size_min
+
+    def _finalize(self) -> TestResult:
+        return self.test._evaluate(self.buffer.blocks, self.FM, self.FMM)
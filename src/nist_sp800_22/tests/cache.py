@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from importlib import metadata
+
+from nist_sp800_22.bit_sequence import BitSequence, as_bit_sequence
+
+from .instrumentation import Instrumentation
+from .sequence_context import SequenceContext
+from .test_interface import TestInterface
+from .test_result import TestResult
+
+DEFAULT_MAX_BYTES = 64 << 20
+
+try:
+    VERSION = metadata.version("nist_sp800_22")
+except metadata.PackageNotFoundError:  # Running from a source tree
+    VERSION = "unknown"
+
+
+def sequence_digest(bitstring: BitSequence) -> str:
+    """BLAKE2b digest of the packed bits and of their number."""
+    digest = hashlib.blake2b(digest_size=32)
+    digest.update(b"%d:" % len(bitstring))
+    digest.update(memoryview(bitstring.to_packed()))
+    return digest.hexdigest()
+
+
+def test_parameters(test: TestInterface) -> str:
+    """The configuration of ``test``, as a canonical string."""
+    if "parameters" in vars(test):
+        return test.parameters.model_dump_json()
+    return json.dumps(vars(test), sort_keys=True, default=repr)
+
+
+class ResultCache:
+    """Test results stored in SQLite, keyed by the digest of the sequence,
+    the test, its parameters and the library version.
+
+    The least recently used results are evicted once the stored results
+    exceed ``max_bytes``.
+    """
+
+    def __init__(self, path: str | os.PathLike, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " key TEXT PRIMARY KEY,"
+                " result TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " used REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS results_used ON results (used)"
+            )
+
+    def key(self, test: TestInterface, digest: str) -> str:
+        return hashlib.blake2b(
+            "\0".join((digest, test.name, test_parameters(test), VERSION)).encode(),
+            digest_size=32,
+        ).hexdigest()
+
+    def get(self, key: str) -> TestResult | None:
+        with self._lock, self._db:
+            row = self._db.execute(
+                "SELECT result FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute(
+                "UPDATE results SET used = ? WHERE key = ?", (time.time(), key)
+            )
+        return TestResult.model_validate_json(row[0])
+
+    def put(self, key: str, result: TestResult) -> None:
+        # Metrics describe one run, not the result
+        data = result.model_copy(update={"metrics": None}).model_dump_json()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                (key, data, len(data), time.time()),
+            )
+            self._evict()
+
+    def _evict(self) -> None:
+        (total,) = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM results"
+        ).fetchone()
+        if total <= self.max_bytes:
+            return
+        stale = []
+        for key, size in self._db.execute(
+            "SELECT key, size FROM results ORDER BY used"
+        ):
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        self._db.executemany("DELETE FROM results WHERE key = ?", stale)
+
+    def lookup(self, tests: list[TestInterface], digest: str) -> dict[str, TestResult]:
+        """The cached results of ``tests``, by name."""
+        results = {}
+        for test in tests:
+            result = self.get(self.key(test, digest))
+            if result is not None:
+                results[test.name] = result
+        return results
+
+    def store(self, test: TestInterface, digest: str, result: TestResult) -> None:
+        self.put(self.key(test, digest), result)
+
+    def test(
+        self,
+        test: TestInterface,
+        bitstring: BitSequence,
+        context: SequenceContext | None = None,
+        instrumentation: Instrumentation | None = None,
+    ) -> TestResult:
+        """``test.test(bitstring)``, unless its result is cached."""
+        bitstring = as_bit_sequence(bitstring)
+        digest = sequence_digest(bitstring)
+        result = self.get(self.key(test, digest))
+        if result is None:
+            result = test.test(
+                bitstring, context=context, instrumentation=instrumentation
+            )
+            self.store(test, digest, result)
+        return result
+
+    def clear(self) -> None:
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM results")
+
+    def close(self) -> None:
+        self._db.close()
+
+    def __enter__(self) -> "ResultCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
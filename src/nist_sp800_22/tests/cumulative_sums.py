@@ -16,71 +16,69 @@
 # You should have received a copy of the GNU General Public License
 # along with sp800_22_tests.  If not, see <http://www.gnu.org/licenses/>.
 
-from typing import Sequence
+from nist_sp800_22.bit_sequence import BitSequence
 from .test_result import TestResult
 
 from .test_outcome_enum import TestOutcome
 from .test_interface import TestInterface
+from .sequence_context import SequenceContext
+from .streaming import Accumulator
 import math
+import numpy as np
+from nist_sp800_22.utils.special_functions import normal_cdf
 
 
 class CumulativeSumsTest(TestInterface):
     name = "Cumulative Sums Test"
+    cost = 10
+    context_keys = (SequenceContext.PARTIAL_SUMS,)
 
     def _normcdf(self, n):
-        return 0.5 * math.erfc(-n * math.sqrt(0.5))
+        return normal_cdf(n)
 
     def _p_value(self, n, z):
-        sum_a = 0.0
+        # Both sums over k at once, every term being a difference of two
+        # normal CDFs
         startk = int(math.floor((((float(-n) / z) + 1.0) / 4.0)))
         endk = int(math.floor((((float(n) / z) - 1.0) / 4.0)))
-        for k in range(startk, endk + 1):
-            c = (((4.0 * k) + 1.0) * z) / math.sqrt(n)
-            # d = scipy.stats.norm.cdf(c)
-            d = self._normcdf(c)
-            c = (((4.0 * k) - 1.0) * z) / math.sqrt(n)
-            # e = scipy.stats.norm.cdf(c)
-            e = self._normcdf(c)
-            sum_a = sum_a + d - e
-
-        sum_b = 0.0
+        k = np.arange(startk, endk + 1, dtype=np.float64)
+        d = self._normcdf((((4.0 * k) + 1.0) * z) / math.sqrt(n))
+        e = self._normcdf((((4.0 * k) - 1.0) * z) / math.sqrt(n))
+        sum_a = float(np.sum(d - e))
+
         startk = int(math.floor((((float(-n) / z) - 3.0) / 4.0)))
         endk = int(math.floor((((float(n) / z) - 1.0) / 4.0)))
-        for k in range(startk, endk + 1):
-            c = (((4.0 * k) + 3.0) * z) / math.sqrt(n)
-            # d = scipy.stats.norm.cdf(c)
-            d = self._normcdf(c)
-            c = (((4.0 * k) + 1.0) * z) / math.sqrt(n)
-            # e = scipy.stats.norm.cdf(c)
-            e = self._normcdf(c)
-            sum_b = sum_b + d - e
+        k = np.arange(startk, endk + 1, dtype=np.float64)
+        d = self._normcdf((((4.0 * k) + 3.0) * z) / math.sqrt(n))
+        e = self._normcdf((((4.0 * k) + 1.0) * z) / math.sqrt(n))
+        sum_b = float(np.sum(d - e))
 
         p = 1.0 - sum_a + sum_b
         return p
 
-    def _test(self, bitstring: Sequence, verbose: bool = False) -> TestResult:
+    def _test(
+        self,
+        bitstring: BitSequence,
+        verbose: bool = False,
+        context: SequenceContext | None = None,
+    ) -> TestResult:
+        if context is None:
+            context = SequenceContext(bitstring)
         n = len(bitstring)
-        # Step 1
-        x = list()  # Convert to +1,-1
-        for bit in bitstring:
-            # if bit == 0:
-            x.append((bit * 2) - 1)
-
-        # Steps 2 and 3 Combined
-        # Compute the partial sum and records the largest excursion.
-        pos = 0
-        forward_max = 0
-        for e in x:
-            pos = pos + e
-            if abs(pos) > forward_max:
-                forward_max = abs(pos)
-        pos = 0
-        backward_max = 0
-        for e in reversed(x):
-            pos = pos + e
-            if abs(pos) > backward_max:
-                backward_max = abs(pos)
+        # Steps 1 and 2: the +1,-1 partial sums S_1..S_n
+        s = context.partial_sums
+
+        # Step 3 Records the largest excursion. The backward sums are
+        # S_n - S_k for k = n-1..0 (with S_0 = 0), so they follow from the
+        # extrema of the forward walk without reversing the sequence.
+        forward_max = max(int(s.max(initial=0)), -int(s.min(initial=0)))
+        total = int(s[-1]) if n > 0 else 0
+        lowest = int(s[:-1].min(initial=0))
+        highest = int(s[:-1].max(initial=0))
+        backward_max = max(total - lowest, highest - total)
+        return self._evaluate(n, forward_max, backward_max)
 
+    def _evaluate(self, n: int, forward_max: int, backward_max: int) -> TestResult:
         # Step 4
         p_forward = self._p_value(n, forward_max)
         p_backward = self._p_value(n, backward_max)
@@ -90,5 +88,71 @@ class CumulativeSumsTest(TestInterface):
         outcome = TestOutcome.PASSED if success else TestOutcome.FAILED
         return TestResult(outcome=outcome, p_value=None, p_list=plist)
 
-    def is_eligible(self, bitstring: Sequence) -> bool:
+    def is_eligible(
+        self, bitstring: BitSequence, context: SequenceContext | None = None
+    ) -> bool:
         return True
+
+    def accumulator(
+        self, length: int | None = None, offset: int = 0
+    ) -> "CumulativeSumsAccumulator":
+        return CumulativeSumsAccumulator(self, length, offset)
+
+
+class CumulativeSumsAccumulator(Accumulator):
+    """Keeps the walk's current value S_n, its extrema over S_0..S_n and over
+    S_0..S_{n-1}, which is all the backward excursion needs. The walk of a
+    shard starts from 0, and is shifted by the total of the shards before it
+    when they are merged."""
+
+    mergeable = True
+    state_fields = (
+        "total",
+        "lowest",
+        "highest",
+        "lowest_before_last",
+        "highest_before_last",
+    )
+
+    def __init__(
+        self, test: CumulativeSumsTest, length: int | None = None, offset: int = 0
+    ):
+        super().__init__(test, length, offset)
+        self.total = 0
+        self.lowest = 0
+        self.highest = 0
+        self.lowest_before_last = 0
+        self.highest_before_last = 0
+
+    def _update(self, bits: np.ndarray) -> None:
+        if len(bits) == 0:
+            return
+        s = self.total + np.cumsum(bits.astype(np.int8) * 2 - 1, dtype=np.int64)
+        # S_0..S_{n-1} now also covers the previous S_n and the chunk but its
+        # last sum
+        self.lowest_before_last = min(self.lowest, int(s[:-1].min(initial=0)))
+        self.highest_before_last = max(self.highest, int(s[:-1].max(initial=0)))
+        self.lowest = min(self.lowest, int(s.min()))
+        self.highest = max(self.highest, int(s.max()))
+        self.total = int(s[-1])
+
+    def _merge(self, other: "CumulativeSumsAccumulator") -> None:
+        if other.n == 0:
+            return
+        self.lowest_before_last = min(
+            self.lowest, self.total + other.lowest_before_last
+        )
+        self.highest_before_last = max(
+            self.highest, self.total + other.highest_before_last
+        )
+        self.lowest = min(self.lowest, self.total + other.lowest)
+        self.highest = max(self.highest, self.total + other.highest)
+        self.total += other.total
+
+    def _finalize(self) -> TestResult:
+        forward_max = max(self.highest, -self.lowest)
+        backward_max = max(
+            self.total - self.lowest_before_last,
+            self.highest_before_last - self.total,
+        )
+        return self.test._evaluate(self.n, forward_max, backward_max)
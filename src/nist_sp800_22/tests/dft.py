@@ -16,41 +16,247 @@
 # You should have received a copy of the GNU General Public License
 # along with sp800_22_tests.  If not, see <http://www.gnu.org/licenses/>.
 
-from typing import Sequence
+from nist_sp800_22.bit_sequence import BitSequence
 from .test_result import TestResult
 
 from .test_outcome_enum import TestOutcome
 from .test_interface import TestInterface
+from .sequence_context import SequenceContext
+from .parameters import DiscreteFourierTransformParameters
+from .parallel import in_worker
+from .instrumentation import phase
+from .streaming import Accumulator, BlockBuffer
 import math
+import tempfile
 import numpy as np
+import scipy.fft
+from nist_sp800_22.utils.popcount import CHUNK_BYTES
+
+# Longest block a stream is transformed in, so that its memory stays bounded
+STREAM_BLOCK_SIZE = 1 << 21
+
+DTYPES = ("float32", "float64")
+
+
+def plus_minus_one(
+    packed: np.ndarray, start: int, count: int, dtype: str = "float64"
+) -> np.ndarray:
+    """Bits start .. start + count of an MSB first packed buffer, mapped to
+    -1/+1 in ``dtype`` without unpacking them first."""
+    table = _SIGNS[dtype]
+    first = start // 8
+    last = -(-(start + count) // 8)
+    signs = table[packed[first:last]].reshape(-1)
+    return signs[start - first * 8 : start - first * 8 + count]
+
+
+def _sign_table(dtype: str) -> np.ndarray:
+    bits = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1)
+    table = bits.astype(dtype) * 2 - 1
+    table.flags.writeable = False
+    return table
+
+
+_SIGNS = {dtype: _sign_table(dtype) for dtype in DTYPES}
+
+
+def _split(m: int) -> tuple[int, int]:
+    # The even divisor n1 of m closest to sqrt(m) from below, and m / n1.
+    # Lengths without one (such as twice a prime) degrade to n1 = 2.
+    n1 = 2
+    for d in range(2, math.isqrt(m) + 1, 2):
+        if m % d == 0:
+            n1 = d
+    return n1, m // n1
+
+
+def _smooth_splits(m: int) -> list[tuple[int, int]]:
+    # Powers of two n1 around sqrt(m), with n2 = m // n1: the first
+    # n1 * n2 bits leave out fewer than n1 bits of the m
+    low = 1 << max(math.isqrt(m).bit_length() - 1, 1)
+    return [(n1, m // n1) for n1 in (low, 2 * low) if m // n1 > 0]
+
+
+def _end_sums(packed: np.ndarray, m: int) -> tuple[int, int]:
+    # Sums of x[j] and of (-1)^j x[j] over j < m, from the ones at even
+    # (0xAA in MSB first bytes) and at odd positions
+    even = odd = 0
+    full = m // 8
+    for a in range(0, full, CHUNK_BYTES):
+        chunk = packed[a : min(a + CHUNK_BYTES, full)]
+        even += int(np.bitwise_count(chunk & 0xAA).sum())
+        odd += int(np.bitwise_count(chunk & 0x55).sum())
+    if m % 8:
+        last = packed[full] & ((0xFF00 >> (m % 8)) & 0xFF)
+        even += int(np.bitwise_count(last & 0xAA))
+        odd += int(np.bitwise_count(last & 0x55))
+    return 2 * (even + odd) - m, 2 * (even - odd)
 
 
 class DiscreteFourierTransformTest(TestInterface):
+    """Counts the peaks of the real FFT of the -1/+1 sequence.
+
+    ``dtype`` is the precision of the transform: float32 halves its memory
+    but may move the peaks closest to the threshold. ``workers`` is passed
+    to ``scipy.fft``, -1 for every CPU. The default, None, is every CPU but
+    one in the workers of the process executor. A sequence whose transform
+    would need more than ``max_memory`` bytes (at least 1 MiB) is
+    transformed out of core with the four-step algorithm, see
+    ``_four_step_peaks``.
+    """
+
     name = "Discrete Fourier Transform Test"
+    cost = 25
 
-    def _test(self, bitstring: Sequence, verbose: bool = False) -> TestResult:
+    def __init__(
+        self,
+        dtype: str = "float64",
+        workers: int | None = None,
+        max_memory: int | None = None,
+    ):
+        self.parameters = DiscreteFourierTransformParameters(
+            dtype=dtype, workers=workers, max_memory=max_memory
+        )
+        self.dtype = dtype
+        self.workers = workers
+        self.max_memory = max_memory
+
+    def _test(
+        self,
+        bitstring: BitSequence,
+        verbose: bool = False,
+        context: SequenceContext | None = None,
+    ) -> TestResult:
         n = len(bitstring)
+        packed = bitstring.to_packed()
+        if self.max_memory is not None and self._memory(n) > self.max_memory:
+            n, N1 = self._four_step_peaks(packed, n, verbose)
+        else:
+            with phase("build sequence"):
+                ts_np = plus_minus_one(packed, 0, n, self.dtype)
+            N1 = self._peaks(ts_np)
+        return self._evaluate(n, N1, verbose)
+
+    def _workers(self) -> int:
+        if self.workers is not None:
+            return self.workers
+        return 1 if in_worker() else -1
+
+    def _memory(self, n: int) -> int:
+        # The sequence, its transform and the magnitudes of half of it
+        itemsize = np.dtype(self.dtype).itemsize
+        return n * itemsize + (n // 2 + 1) * 3 * itemsize
+
+    def _signal(self, bits: np.ndarray) -> np.ndarray:
+        return bits.astype(self.dtype) * 2 - 1
+
+    def _peaks(self, ts_np: np.ndarray) -> int:
+        n = len(ts_np)
         if (n % 2) == 1:  # Make it an even number
-            bitstring = bitstring[:-1]
+            ts_np = ts_np[:-1]
+
+        with phase("fft"):
+            fs = scipy.fft.rfft(ts_np, workers=self._workers())  # Compute DFT
+
+        with phase("peaks"):
+            # Squared magnitudes of the first half of the sequence, against
+            # the squared upper threshold
+            fs = fs[: n // 2]
+            T2 = math.log(1.0 / 0.05) * n
+            return int(np.count_nonzero(fs.real**2 + fs.imag**2 < T2))
+
+    def _four_step_fits(self, n1: int, n2: int) -> bool:
+        # Whether one column of the first pass and one row of the second
+        # fit in the budget of _four_step_peaks
+        budget = self.max_memory
+        itemsize = np.dtype(self.dtype).itemsize
+        column = n1 * (itemsize + 8) + (n1 // 2 + 1) * 40
+        return column <= budget and n2 * 4 * itemsize <= budget
+
+    def _four_step_peaks(
+        self, packed: np.ndarray, n: int, verbose: bool
+    ) -> tuple[int, int]:
+        """Length tested and peaks of the transform of the first m = n1 * n2
+        (even) bits, with x[j1 * n2 + j2] seen as an n1 x n2 matrix:
+
+        1. transform its columns, which are real, into the rows 0 .. n1 / 2
+           of Y (the others are their conjugates);
+        2. multiply Y[k1, j2] by exp(-2 pi i j2 k1 / m);
+        3. transform the rows of Y: X[k1 + n1 * k2] = Z[k1, k2].
+
+        Y is kept in a temporary file and both passes go through it in
+        slices of at most ``max_memory`` bytes. |X[k]| = |X[m - k]|, so the
+        rows 1 .. n1 / 2 - 1 hold the magnitudes of their mirrors as well,
+        and the peaks of X[1 .. m / 2 - 1] are half of those of the whole
+        transform, bar X[0] and X[m / 2].
 
-        ts = list()  # Convert to +1,-1
-        for bit in bitstring:
-            ts.append((bit * 2) - 1)
+        m is n, or n - 1 when n is odd, if it splits into n1 x n2 within
+        the budget. Lengths without such a split (twice a prime, say) are
+        cut to a multiple of a power of two n1 near sqrt(n), and the test
+        is that of their first m bits. A budget that no split fits in
+        raises ValueError.
+        """
+        m = n - n % 2
+        n1, n2 = _split(m)
+        if not self._four_step_fits(n1, n2):
+            for n1, n2 in _smooth_splits(m):
+                if self._four_step_fits(n1, n2):
+                    n = m = n1 * n2
+                    break
+            else:
+                raise ValueError(
+                    "max_memory of %d bytes is too small for a four-step "
+                    "transform of %d bits" % (self.max_memory, n)
+                )
+        rows = n1 // 2 + 1
+        real = np.dtype(self.dtype)
+        complex_ = np.result_type(real, np.complex64)
+        T2 = math.log(1.0 / 0.05) * n
+        if verbose:
+            print("  four-step FFT of %d = %d x %d" % (m, n1, n2))
+
+        budget = self.max_memory
+        with tempfile.TemporaryFile() as scratch:
+            Y = np.memmap(scratch, dtype=complex_, mode="w+", shape=(rows, n2))
+            k1 = np.arange(rows, dtype=np.int64)[:, None]
+            # Per column: its bits and signs, the rfft and the twiddles
+            width = max(budget // (n1 * (real.itemsize + 8) + rows * 40), 1)
+            for a in range(0, n2, width):
+                b = min(a + width, n2)
+                with phase("build sequence"):
+                    position = np.arange(n1)[:, None] * n2 + np.arange(a, b)
+                    bits = (packed[position >> 3] >> (7 - (position & 7))) & 1
+                    x = bits.astype(real) * 2 - 1
+                with phase("fft"):
+                    y = scipy.fft.rfft(x, axis=0, workers=self._workers())
+                    j2 = np.arange(a, b, dtype=np.int64)
+                    angle = (k1 * j2 % m) * (-2.0 * math.pi / m)
+                    Y[:, a:b] = y * np.exp(1j * angle).astype(complex_)
 
-        ts_np = np.array(ts)
-        fs = np.fft.fft(ts_np)  # Compute DFT
+            total = 0
+            height = max(budget // (n2 * 2 * complex_.itemsize), 1)
+            for r in range(0, rows, height):
+                s = min(r + height, rows)
+                with phase("fft"):
+                    Z = scipy.fft.fft(Y[r:s], axis=1, workers=self._workers())
+                with phase("peaks"):
+                    below = np.count_nonzero(Z.real**2 + Z.imag**2 < T2, axis=1)
+                    # Rows 0 and n1 / 2 are their own mirrors
+                    weight = np.full(s - r, 2)
+                    weight[(np.arange(r, s) == 0) | (np.arange(r, s) == n1 // 2)] = 1
+                    total += int(below @ weight)
+            del Y
 
-        mags = abs(fs)[: n // 2]  # Compute magnitudes of first half of sequence
+        # X[0] and X[m / 2] are the plain and the alternating sums
+        ends = [abs(X) ** 2 < T2 for X in _end_sums(packed, m)]
+        return n, (total + ends[0] - ends[1]) // 2
 
-        T = math.sqrt(math.log(1.0 / 0.05) * n)  # Compute upper threshold
+    def _evaluate(self, n: int, N1: float, verbose: bool = False) -> TestResult:
         N0 = 0.95 * n / 2.0
         if verbose:
             print("  N0 = %f" % N0)
 
-        N1 = 0.0  # Count the peaks above the upper theshold
-        for mag in mags:
-            if mag < T:
-                N1 += 1.0
+        N1 = float(N1)
         if verbose:
             print("  N1 = %f" % N1)
         d = (N1 - N0) / math.sqrt((n * 0.95 * 0.05) / 4)  # Compute the P value
@@ -59,5 +265,42 @@ class DiscreteFourierTransformTest(TestInterface):
         outcome = TestOutcome.PASSED if (p >= 0.01) else TestOutcome.FAILED
         return TestResult(outcome=outcome, p_value=p, p_list=None)
 
-    def is_eligible(self, bitstring: Sequence) -> bool:
+    def is_eligible(
+        self, bitstring: BitSequence, context: SequenceContext | None = None
+    ) -> bool:
         return True
+
+    def accumulator(
+        self, length: int | None = None, offset: int = 0
+    ) -> "DiscreteFourierTransformAccumulator":
+        return DiscreteFourierTransformAccumulator(self, length, offset)
+
+
+class DiscreteFourierTransformAccumulator(Accumulator):
+    """The transform needs the whole sequence, so a stream is transformed in
+    consecutive blocks of at most ``STREAM_BLOCK_SIZE`` bits and the peak
+    counts N1 and the expected counts N0 of the blocks are added up. A stream
+    no longer than one block gives exactly the result of the test."""
+
+    state_fields = ("buffer", "N1")
+
+    def __init__(
+        self,
+        test: DiscreteFourierTransformTest,
+        length: int | None = None,
+        offset: int = 0,
+    ):
+        super().__init__(test, length, offset)
+        self.buffer = BlockBuffer(max(min(self.reference_length, STREAM_BLOCK_SIZE), 1))
+        self.N1 = 0
+
+    def _update(self, bits: np.ndarray) -> None:
+        for block in self.buffer.push(bits):
+            self.N1 += self.test._peaks(self.test._signal(block))
+
+    def _finalize(self) -> TestResult:
+        N1 = self.N1
+        pending = self.buffer.pending
+        if len(pending):
+            N1 += self.test._peaks(self.test._signal(pending))
+        return self.test._evaluate(self.n, N1)
@@ -16,43 +16,52 @@
 # You should have received a copy of the GNU General Public License
 # along with sp800_22_tests.  If not, see <http://www.gnu.org/licenses/>.
 
-from typing import Sequence
+from nist_sp800_22.bit_sequence import BitSequence
 from .test_result import TestResult
 
 from .test_outcome_enum import TestOutcome
 from .test_interface import TestInterface
+from .sequence_context import SequenceContext
+from .parameters import FrequencyWithinBlockParameters
+from .streaming import BlockPiece, BlockTally, TallyAccumulator
 import math
+import numpy as np
 from nist_sp800_22.utils.gamma_functions import gammaincc
-from fractions import Fraction
 
 
 class FrequencyWithinBlockTest(TestInterface):
     name = "Frequency Within Block Test"
+    cost = 1
+    context_keys = (SequenceContext.BLOCK_SUMS,)
 
-    def count_ones_zeroes(self, bits):
-        ones = 0
-        zeroes = 0
-        for bit in bits:
-            if bit == 1:
-                ones += 1
-            else:
-                zeroes += 1
-        return (zeroes, ones)
-
-    def _test(self, bitstring: Sequence, verbose: bool = False) -> TestResult:
+    def __init__(self, block_size: int | None = None):
+        # None picks M from n, see block_shape
+        self.parameters = FrequencyWithinBlockParameters(block_size=block_size)
+        self._block_size: int | None = block_size
+
+    def block_shape(self, n: int) -> tuple[int, int]:
+        if self._block_size is not None:
+            return n // self._block_size, self._block_size
         # Compute number of blocks M = block size. N=num of blocks
         # N = floor(n/M)
         # miniumum block size 20 bits, most blocks 100
-        n = len(bitstring)
         M = 20
         N = int(math.floor(n / M))
         if N > 99:
             N = 99
             M = int(math.floor(n / N))
+        return N, M
 
-        if len(bitstring) < 100:
-            print("Too little data for test. Supply at least 100 bits")
-            return False, 1.0, None
+    def _test(
+        self,
+        bitstring: BitSequence,
+        verbose: bool = False,
+        context: SequenceContext | None = None,
+    ) -> TestResult:
+        if context is None:
+            context = SequenceContext(bitstring)
+        n = len(bitstring)
+        N, M = self.block_shape(n)
 
         if verbose:
             print("  n = %d" % len(bitstring))
@@ -63,20 +72,80 @@ class FrequencyWithinBlockTest(TestInterface):
         block_size = M  # int(math.floor(len(bits)/num_of_blocks))
         # n = int(block_size * num_of_blocks)
 
-        proportions = list()
-        for i in range(num_of_blocks):
-            block = bitstring[i * (block_size) : ((i + 1) * (block_size))]
-            zeroes, ones = self.count_ones_zeroes(block)
-            proportions.append(Fraction(ones, block_size))
+        block_sums = context.block_sums(block_size)[:num_of_blocks]
+        return self._evaluate(
+            num_of_blocks, block_size, self._deviation(block_sums, block_size)
+        )
 
-        chisq = 0.0
-        for prop in proportions:
-            chisq += 4.0 * block_size * ((prop - Fraction(1, 2)) ** 2)
+    def _deviation(self, block_sums: np.ndarray, block_size: int) -> int:
+        # 4 M (pi_i - 1/2)^2 = (2 ones - M)^2 / M, summed without the 1/M
+        # so that it stays an exact integer
+        return int(np.sum((2 * block_sums.astype(np.int64) - block_size) ** 2))
 
+    def _evaluate(
+        self, num_of_blocks: int, block_size: int, deviation: int
+    ) -> TestResult:
+        chisq = deviation / block_size
         p = gammaincc((num_of_blocks / 2.0), float(chisq) / 2.0)
 
         outcome = TestOutcome.PASSED if (p >= 0.01) else TestOutcome.FAILED
         return TestResult(outcome=outcome, p_value=p, p_list=None)
 
-    def is_eligible(self, bitstring: Sequence) -> bool:
-        return True
+    def is_eligible(
+        self, bitstring: BitSequence, context: SequenceContext | None = None
+    ) -> bool:
+        n = len(bitstring)
+        return n >= 100 and self.block_shape(n)[0] > 0
+
+    def accumulator(
+        self, length: int | None = None, offset: int = 0
+    ) -> "FrequencyWithinBlockAccumulator":
+        return FrequencyWithinBlockAccumulator(self, length, offset)
+
+
+class OnesCount(BlockPiece):
+    state_fields = ("ones",)
+
+    def __init__(self):
+        super().__init__()
+        self.ones = 0
+
+    def _extend(self, bits: np.ndarray) -> None:
+        self.ones += int(np.count_nonzero(bits))
+
+    def _join(self, other: "OnesCount") -> None:
+        self.ones += other.ones
+
+
+class FrequencyWithinBlockAccumulator(TallyAccumulator):
+    state_fields = ("buffer", "deviation")
+
+    def __init__(
+        self, test: FrequencyWithinBlockTest, length: int | None = None, offset: int = 0
+    ):
+        super().__init__(test, length, offset)
+        limit, self.block_size = test.block_shape(self.reference_length)
+        self.buffer = BlockTally(
+            self.block_size,
+            OnesCount,
+            limit if self.block_limit_known else None,
+            offset,
+        )
+        self.deviation = 0
+
+    def _add_blocks(self, blocks: np.ndarray) -> None:
+        self.deviation += self.test._deviation(
+            np.count_nonzero(blocks, axis=1), self.block_size
+        )
+
+    def _add_piece(self, piece: OnesCount) -> None:
+        self.deviation += self.test._deviation(np.array([piece.ones]), self.block_size)
+
+    def _merge_blocks(self, other: "FrequencyWithinBlockAccumulator") -> None:
+        self.deviation += other.deviation
+
+    def is_eligible(self) -> bool:
+        return self.n >= 100 and self.buffer.blocks > 0
+
+    def _finalize(self) -> TestResult:
+        return self.test._evaluate(self.buffer.blocks, self.block_size, self.deviation)
@@ -0,0 +1,105 @@
+import threading
+import time
+import tracemalloc
+from contextlib import nullcontext
+from contextvars import ContextVar
+from typing import TYPE_CHECKING
+
+from pydantic import BaseModel
+
+from .test_result import TestMetrics, TestResult
+
+if TYPE_CHECKING:
+    from nist_sp800_22.bit_sequence import BitSequence
+
+    from .sequence_context import SequenceContext
+    from .test_interface import TestInterface
+
+# Phase timings of the test running in the current context, None when the
+# test is not instrumented
+_phases: ContextVar[dict[str, float] | None] = ContextVar("phases", default=None)
+_NO_PHASE = nullcontext()
+# tracemalloc's peak is process-wide, so the tests measuring their memory run
+# one at a time, even in a thread pool
+_memory_lock = threading.Lock()
+
+
+class _Phase:
+    def __init__(self, phases: dict[str, float], name: str):
+        self.phases = phases
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc) -> None:
+        elapsed = time.perf_counter() - self.start
+        self.phases[self.name] = self.phases.get(self.name, 0.0) + elapsed
+
+
+def phase(name: str) -> _Phase | nullcontext:
+    """Time the enclosed block as phase ``name`` of the running test.
+
+    Outside an instrumented run this is a shared no-op context manager.
+    """
+    phases = _phases.get()
+    if phases is None:
+        return _NO_PHASE
+    return _Phase(phases, name)
+
+
+class Instrumentation(BaseModel):
+    """Options of the metrics recorded on every ``TestResult``."""
+
+    # Record the peak of the memory allocated by the test with tracemalloc,
+    # which slows the tests down noticeably. The peak is process-wide, so in
+    # a thread pool the tests then run one at a time.
+    trace_memory: bool = False
+
+    def measure(
+        self,
+        test: "TestInterface",
+        bitstring: "BitSequence",
+        verbose: bool = False,
+        context: "SequenceContext | None" = None,
+    ) -> TestResult:
+        with _memory_lock if self.trace_memory else nullcontext():
+            return self._measure(test, bitstring, verbose, context)
+
+    def _measure(
+        self,
+        test: "TestInterface",
+        bitstring: "BitSequence",
+        verbose: bool = False,
+        context: "SequenceContext | None" = None,
+    ) -> TestResult:
+        phases: dict[str, float] = {}
+        token = _phases.set(phases)
+        started = False
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started = True
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        try:
+            result = test.test(bitstring, verbose, context)
+        finally:
+            cpu = time.thread_time() - cpu
+            wall = time.perf_counter() - wall
+            _phases.reset(token)
+            peak = None
+            if self.trace_memory:
+                peak = tracemalloc.get_traced_memory()[1] - baseline
+                if started:
+                    tracemalloc.stop()
+        metrics = TestMetrics(
+            wall_seconds=wall,
+            cpu_seconds=cpu,
+            peak_memory_bytes=peak,
+            bits=len(bitstring),
+            phases=phases,
+        )
+        return result.model_copy(update={"metrics": metrics})
@@ -16,58 +16,83 @@
 # You should have received a copy of the GNU General Public License
 # along with sp800_22_tests.  If not, see <http://www.gnu.org/licenses/>.
 
-from typing import Sequence
+from functools import lru_cache
+
+from nist_sp800_22.bit_sequence import BitSequence
 from .test_result import TestResult
 
 from .test_outcome_enum import TestOutcome
 from .test_interface import TestInterface
+from .sequence_context import SequenceContext
+from .parameters import LinearComplexityParameters
+from .instrumentation import phase
+from .streaming import BlockAccumulator, BlockBuffer
 import math
+import numpy as np
+from nist_sp800_22.utils.berlekamp_massey import (
+    batched_linear_complexity,
+    linear_complexity,
+)
 from nist_sp800_22.utils.gamma_functions import gammaincc
 
 
+def class_edges(K: int) -> np.ndarray:
+    # Edges of the K + 1 classes of T: v_0 is T <= -2.5 and v_6 is T > 2.5
+    # for K = 6
+    return np.arange(K) - (K - 1) / 2.0
+
+
+def mean_complexity(M: int) -> float:
+    a = float(M) / 2.0
+    b = (((-1) ** (M + 1)) + 9.0) / 36.0
+    # 2.0 ** -M underflows to 0 instead of overflowing for large M
+    c = ((M / 3.0) + (2.0 / 9.0)) * (2.0**-M)
+    return a + b - c
+
+
+@lru_cache(maxsize=None)
+def class_probabilities(M: int, K: int) -> tuple[float, ...]:
+    """Exact probabilities of the K + 1 classes of T for blocks of M bits.
+
+    Of the 2^M blocks, 1 has linear complexity 0, 2^(2L - 1) have L for
+    1 <= L <= M / 2 and 2^(2(M - L)) have L above (Rueppel). For K = 6
+    they round to the values of the spec (3.10).
+    """
+    L = np.arange(M + 1)
+    log2_count = np.where(L <= M // 2, 2 * L - 1, 2 * (M - L)).astype(float)
+    log2_count[0] = 0.0
+    probability = 2.0 ** (log2_count - M)
+    T = ((-1.0) ** M) * (L - mean_complexity(M)) + (2.0 / 9.0)
+    classes = np.searchsorted(class_edges(K), T, side="left")
+    return tuple(np.bincount(classes, weights=probability, minlength=K + 1).tolist())
+
+
 class LinearComplexityTest(TestInterface):
     name = "Linear Complexity Test"
+    cost = 25
+
+    def __init__(self, block_size: int = 512, degrees_of_freedom: int = 6):
+        self.parameters = LinearComplexityParameters(
+            block_size=block_size, degrees_of_freedom=degrees_of_freedom
+        )
+        self._block_size: int = block_size
+        self._K: int = degrees_of_freedom
 
     def berelekamp_massey(self, bits):
-        n = len(bits)
-        b = [0 for x in bits]  # initialize b and c arrays
-        c = [0 for x in bits]
-        b[0] = 1
-        c[0] = 1
-
-        L = 0
-        m = -1
-        N = 0
-        while N < n:
-            # compute discrepancy
-            d = bits[N]
-            for i in range(1, L + 1):
-                d = d ^ (c[i] & bits[N - i])
-            if d != 0:  # If d is not zero, adjust poly
-                t = c[:]
-                for i in range(0, n - N + m):
-                    c[N - m + i] = c[N - m + i] ^ b[i]
-                if L <= (N / 2):
-                    L = N + 1 - L
-                    m = N
-                    b = t
-            N = N + 1
+        L, c = linear_complexity(bits)
         # Return length of generator and the polynomial
-        return L, c[0:L]
+        return L, [(c >> i) & 1 for i in range(L)]
 
-    def _test(self, bitstring: Sequence, verbose: bool = False) -> TestResult:
-        patternlen = None
+    def _test(
+        self,
+        bitstring: BitSequence,
+        verbose: bool = False,
+        context: SequenceContext | None = None,
+    ) -> TestResult:
         n = len(bitstring)
         # Step 1. Choose the block size
-        if patternlen is not None:
-            M = patternlen
-        else:
-            if n < 1000000:
-                print("Error. Need at least 10^6 bits")
-                # exit()
-                return False, 0.0, None
-            M = 512
-        K = 6
+        M = self._block_size
+        K = self._K
         N = int(math.floor(n / M))
 
         if verbose:
@@ -75,43 +100,34 @@ class LinearComplexityTest(TestInterface):
             print("  N = ", N)
             print("  K = ", K)
 
+        blocks = bitstring.unpacked[: N * M].reshape(N, M)
+        v = self._frequencies(blocks)
+        with phase("chi-square"):
+            return self._evaluate(N, v, verbose)
+
+    def _frequencies(self, blocks: np.ndarray) -> np.ndarray:
+        M = self._block_size
+        K = self._K
         # Step 2 Compute the linear complexity of the blocks
-        LC = list()
-        for i in range(N):
-            x = bitstring[(i * M) : ((i + 1) * M)]
-            LC.append(self.berelekamp_massey(x)[0])
+        # All the blocks at once, 64 per machine word
+        with phase("berlekamp-massey"):
+            LC = batched_linear_complexity(blocks)
 
         # Step 3 Compute mean
-        a = float(M) / 2.0
-        b = (((-1) ** (M + 1)) + 9.0) / 36.0
-        c = ((M / 3.0) + (2.0 / 9.0)) / (2**M)
-        mu = a + b - c
+        mu = mean_complexity(M)
 
-        T = list()
-        for i in range(N):
-            x = ((-1.0) ** M) * (LC[i] - mu) + (2.0 / 9.0)
-            T.append(x)
+        T = ((-1.0) ** M) * (LC - mu) + (2.0 / 9.0)
 
         # Step 4 Count the distribution over Ticket
-        v = [0, 0, 0, 0, 0, 0, 0]
-        for t in T:
-            if t <= -2.5:
-                v[0] += 1
-            elif t <= -1.5:
-                v[1] += 1
-            elif t <= -0.5:
-                v[2] += 1
-            elif t <= 0.5:
-                v[3] += 1
-            elif t <= 1.5:
-                v[4] += 1
-            elif t <= 2.5:
-                v[5] += 1
-            else:
-                v[6] += 1
+        classes = np.searchsorted(class_edges(K), T, side="left")
+        return np.bincount(classes, minlength=K + 1)
+
+    def _evaluate(self, N: int, v: np.ndarray, verbose: bool = False) -> TestResult:
+        K = self._K
+        v = v.tolist()
 
         # Step 5 Compute Chi Square Statistic
-        pi = [0.010417, 0.03125, 0.125, 0.5, 0.25, 0.0625, 0.020833]
+        pi = class_probabilities(self._block_size, K)
         chisq = 0.0
         for i in range(K + 1):
             chisq += ((v[i] - (N * pi[i])) ** 2.0) / (N * pi[i])
@@ -123,5 +139,35 @@ class LinearComplexityTest(TestInterface):
         outcome = TestOutcome.PASSED if (p >= 0.01) else TestOutcome.FAILED
         return TestResult(outcome=outcome, p_value=p, p_list=None)
 
-    def is_eligible(self, bitstring: Sequence) -> bool:
+    def is_eligible(
+        self, bitstring: BitSequence, context: SequenceContext | None = None
+    ) -> bool:
         return len(bitstring) >= 1000000
+
+    def accumulator(
+        self, length: int | None = None, offset: int = 0
+    ) -> "LinearComplexityAccumulator":
+        return LinearComplexityAccumulator(self, length, offset)
+
+
+class LinearComplexityAccumulator(BlockAccumulator):
+    state_fields = ("buffer", "v")
+
+    def __init__(
+        self, test: LinearComplexityTest, length: int | None = None, offset: int = 0
+    ):
+        super().__init__(test, length, offset)
+        self.buffer = BlockBuffer(test._block_size, offset=offset)
+        self.v = np.zeros(test._K + 1, dtype=np.int64)
+
+    def _add_blocks(self, blocks: np.ndarray) -> None:
+        self.v += self.test._frequencies(blocks)
+
+    def _merge_blocks(self, other: "LinearComplexityAccumulator") -> None:
+        self.v += other.v
+
+    def is_eligible(self) -> bool:
+        return self.n >= 1000000
+
+    def _finalize(self) -> TestResult:
+        return self.test._evaluate(self.buffer.blocks, self.v)
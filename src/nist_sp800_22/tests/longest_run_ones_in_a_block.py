@@ -16,114 +16,109 @@
 # You should have received a copy of the GNU General Public License
 # along with sp800_22_tests.  If not, see <http://www.gnu.org/licenses/>.
 
-from typing import Sequence
+from functools import lru_cache
+
+from nist_sp800_22.bit_sequence import BitSequence
 from .test_result import TestResult
 
 from .test_outcome_enum import TestOutcome
 from .test_interface import TestInterface
+from .sequence_context import SequenceContext
+from .parameters import LongestRunOnesInABlockParameters
+from .instrumentation import phase
+from .streaming import BlockAccumulator, BlockBuffer
+import numpy as np
 
 # import math
 from nist_sp800_22.utils.gamma_functions import gammaincc
+from nist_sp800_22.utils.longest_runs import longest_runs, row_longest_runs
+
+
+def longest_run_cdf(M: int, r: int) -> float:
+    """Probability that the longest run of ones in M random bits is at most
+    r, from the M-th power of the transitions between trailing run lengths
+    0 .. r."""
+    step = np.zeros((r + 1, r + 1))
+    step[:, 0] = 0.5
+    step[np.arange(r), np.arange(1, r + 1)] = 0.5
+    return float(np.linalg.matrix_power(step, M)[0].sum())
+
+
+@lru_cache(maxsize=None)
+def run_classes(M: int) -> tuple[int, int, tuple[float, ...]]:
+    """K, the longest run of the first class and the probabilities of the
+    K + 1 classes (at most that run, each longer run, and longer than
+    all) for blocks of M bits.
+
+    The probabilities are exact. They match the table of the spec (3.4) to
+    its four decimals for M = 8 and 128, but its rows for M = 512 to 10000
+    are approximations, off by enough to fail random data once every block
+    of a large sequence is counted.
+    """
+    K = 3 if M < 128 else 5 if M < 10000 else 6
+    # The first class holds at least 8% of the blocks, which gives back
+    # the classes of the spec for its block sizes
+    low = 0
+    while longest_run_cdf(M, low) < 0.08:
+        low += 1
+    cdf = [longest_run_cdf(M, low + i) for i in range(K)]
+    probabilities = [cdf[0]]
+    probabilities += [cdf[i] - cdf[i - 1] for i in range(1, K)]
+    probabilities.append(1.0 - cdf[-1])
+    return K, low, tuple(probabilities)
 
 
 class LongestRunOnesInABlockTest(TestInterface):
     name = "Longest Run of Ones in a Block Test"
+    cost = 20
 
-    def probs(self, K, M, i):
-        M8 = [0.2148, 0.3672, 0.2305, 0.1875]
-        M128 = [0.1174, 0.2430, 0.2493, 0.1752, 0.1027, 0.1124]
-        M512 = [0.1170, 0.2460, 0.2523, 0.1755, 0.1027, 0.1124]
-        M1000 = [0.1307, 0.2437, 0.2452, 0.1714, 0.1002, 0.1088]
-        M10000 = [0.0882, 0.2092, 0.2483, 0.1933, 0.1208, 0.0675, 0.0727]
-        if M == 8:
-            return M8[i]
-        elif M == 128:
-            return M128[i]
-        elif M == 512:
-            return M512[i]
-        elif M == 1000:
-            return M1000[i]
-        else:
-            return M10000[i]
-
-    def _test(self, bitstring: Sequence, verbose: bool = False) -> TestResult:
-        n = len(bitstring)
+    def __init__(self, block_size: int | None = None):
+        # None picks M from n as in the spec, see block_shape
+        self.parameters = LongestRunOnesInABlockParameters(block_size=block_size)
+        self._block_size: int | None = block_size
 
-        if n < 128:
-            return TestResult(TestOutcome.FAILED, 1.0, None)
-        elif n < 6272:
-            M = 8
-        elif n < 750000:
-            M = 128
-        else:
-            M = 10000
-
-        # compute new values for K & N
-        if M == 8:
-            K = 3
-            N = 16
-        elif M == 128:
-            K = 5
-            N = 49
-        else:
-            K = 6
-            N = 75
-
-        # Table of frequencies
-        v = [0, 0, 0, 0, 0, 0, 0]
-
-        for i in range(N):  # over each block
-            # find longest run
-            block = bitstring[i * M : ((i + 1) * M)]  # Block i
-
-            run = 0
-            longest = 0
-            for j in range(M):  # Count the bits.
-                if block[j] == 1:
-                    run += 1
-                    if run > longest:
-                        longest = run
-                else:
-                    run = 0
-
-            if M == 8:
-                if longest <= 1:
-                    v[0] += 1
-                elif longest == 2:
-                    v[1] += 1
-                elif longest == 3:
-                    v[2] += 1
-                else:
-                    v[3] += 1
-            elif M == 128:
-                if longest <= 4:
-                    v[0] += 1
-                elif longest == 5:
-                    v[1] += 1
-                elif longest == 6:
-                    v[2] += 1
-                elif longest == 7:
-                    v[3] += 1
-                elif longest == 8:
-                    v[4] += 1
-                else:
-                    v[5] += 1
+    def probs(self, K, M, i):
+        return run_classes(M)[2][i]
+
+    def block_shape(self, n: int) -> tuple[int, int, int]:
+        # Block size M, number of classes K + 1 and number of blocks N
+        M = self._block_size
+        if M is None:
+            if n < 6272:
+                M = 8
+            elif n < 750000:
+                M = 128
             else:
-                if longest <= 10:
-                    v[0] += 1
-                elif longest == 11:
-                    v[1] += 1
-                elif longest == 12:
-                    v[2] += 1
-                elif longest == 13:
-                    v[3] += 1
-                elif longest == 14:
-                    v[4] += 1
-                elif longest == 15:
-                    v[5] += 1
-                else:
-                    v[6] += 1
+                M = 10000
+        K = run_classes(M)[0]
+        # Every complete block is used
+        return M, K, n // M
+
+    def _test(
+        self,
+        bitstring: BitSequence,
+        verbose: bool = False,
+        context: SequenceContext | None = None,
+    ) -> TestResult:
+        n = len(bitstring)
+        M, K, N = self.block_shape(n)
 
+        with phase("longest runs"):
+            v = self._frequencies(M, longest_runs(bitstring.to_packed(), M, N))
+        if verbose:
+            print("  n = " + str(n))
+        with phase("chi-square"):
+            return self._evaluate(M, K, N, v, verbose)
+
+    def _frequencies(self, M: int, longest: np.ndarray) -> list[int]:
+        # Table of frequencies of the K + 1 classes
+        K, low = run_classes(M)[:2]
+        classes = np.clip(longest, low, low + K) - low
+        return np.bincount(classes, minlength=K + 1).tolist()
+
+    def _evaluate(
+        self, M: int, K: int, N: int, v: list[int], verbose: bool = False
+    ) -> TestResult:
         # Compute Chi-Sq
         chi_sq = 0.0
         for i in range(K + 1):
@@ -132,7 +127,6 @@ class LongestRunOnesInABlockTest(TestInterface):
             lower = N * p_i
             chi_sq += upper / lower
         if verbose:
-            print("  n = " + str(n))
             print("  K = " + str(K))
             print("  M = " + str(M))
             print("  N = " + str(N))
@@ -142,5 +136,44 @@ class LongestRunOnesInABlockTest(TestInterface):
         outcome = TestOutcome.PASSED if (p >= 0.01) else TestOutcome.FAILED
         return TestResult(outcome=outcome, p_value=p, p_list=None)
 
-    def is_eligible(self, bitstring: Sequence) -> bool:
-        return True
+    def is_eligible(
+        self, bitstring: BitSequence, context: SequenceContext | None = None
+    ) -> bool:
+        n = len(bitstring)
+        return n >= 128 and self.block_shape(n)[2] > 0
+
+    def accumulator(
+        self, length: int | None = None, offset: int = 0
+    ) -> "LongestRunOnesInABlockAccumulator":
+        return LongestRunOnesInABlockAccumulator(self, length, offset)
+
+
+class LongestRunOnesInABlockAccumulator(BlockAccumulator):
+    state_fields = ("buffer", "v")
+
+    def __init__(
+        self,
+        test: LongestRunOnesInABlockTest,
+        length: int | None = None,
+        offset: int = 0,
+    ):
+        super().__init__(test, length, offset)
+        self.block_size, self.K, limit = test.block_shape(self.reference_length)
+        self.buffer = BlockBuffer(
+            self.block_size, limit if self.block_limit_known else None, offset
+        )
+        self.v = [0] * (self.K + 1)
+
+    def _add_blocks(self, blocks: np.ndarray) -> None:
+        longest = row_longest_runs(np.packbits(blocks, axis=1))
+        counts = self.test._frequencies(self.block_size, longest)
+        self.v = [a + b for a, b in zip(self.v, counts)]
+
+    def _merge_blocks(self, other: "LongestRunOnesInABlockAccumulator") -> None:
+        self.v = [a + b for a, b in zip(self.v, other.v)]
+
+    def is_eligible(self) -> bool:
+        return self.n >= 128 and self.buffer.blocks > 0
+
+    def _finalize(self) -> TestResult:
+        return self.test._evaluate(self.block_size, self.K, self.buffer.blocks, self.v)
@@ -17,79 +17,132 @@
 # along with sp800_22_tests.  If not, see <http://www.gnu.org/licenses/>.
 
 
-from typing import Sequence
+from nist_sp800_22.bit_sequence import BitSequence
 from .test_result import TestResult
 
 from .test_outcome_enum import TestOutcome
 from .test_interface import TestInterface
+from .sequence_context import SequenceContext
+from .parameters import MaurersUniversalParameters
+from .instrumentation import phase
+from .streaming import BlockAccumulator, BlockBuffer
 import math
+import numpy as np
+from nist_sp800_22.utils.pattern_counts import block_codes
+
+
+# Blocks scanned at once, so that the temporaries of a scan stay bounded
+SCAN_BLOCKS = 1 << 20
 
 
 class MaurersUniversalTest(TestInterface):
     name = "Maurer's Universal Test"
+    cost = 20
+
+    def __init__(
+        self, block_length: int | None = None, initialization_blocks: int | None = None
+    ):
+        # None picks L from n and Q = 10 * 2^L, as in the spec
+        self.parameters = MaurersUniversalParameters(
+            block_length=block_length, initialization_blocks=initialization_blocks
+        )
+        self._block_length: int | None = block_length
+        self._initialization_blocks: int | None = initialization_blocks
 
     def pattern2int(self, pattern):
         # l = len(pattern)
         n = 0
         for bit in pattern:
-            n = (n << 1) + bit
+            n = (n << 1) + int(bit)
         return n
 
-    def _test(self, bitstring: Sequence, verbose: bool = False) -> TestResult:
-        patternlen = None
-        initblocks = None
+    def block_length(self, n: int) -> int:
+        if self._block_length is not None:
+            return self._block_length
+        # Step 1. Choose the block size
+        ns = [
+            904960,
+            2068480,
+            4654080,
+            10342400,
+            22753280,
+            49643520,
+            107560960,
+            231669760,
+            496435200,
+            1059061760,
+        ]
+        L = 6
+        for threshold in ns:
+            if n >= threshold:
+                L += 1
+        return L
 
-        n = len(bitstring)
+    def initialization_blocks(self, L: int) -> int:
+        if self._initialization_blocks is not None:
+            return self._initialization_blocks
+        return 10 * (2**L)
 
-        # Step 1. Choose the block size
-        if patternlen is not None:
-            L = patternlen
-        else:
-            ns = [
-                904960,
-                2068480,
-                4654080,
-                10342400,
-                22753280,
-                49643520,
-                107560960,
-                231669760,
-                496435200,
-                1059061760,
-            ]
-            L = 6
-            if n < 387840:
-                print("Error. Need at least 387840 bits. Got %d." % n)
-                # exit()
-                return False, 0.0, None
-            for threshold in ns:
-                if n >= threshold:
-                    L += 1
+    def _test(
+        self,
+        bitstring: BitSequence,
+        verbose: bool = False,
+        context: SequenceContext | None = None,
+    ) -> TestResult:
+        n = len(bitstring)
+        L = self.block_length(n)
 
         # Step 2 Split the data into Q and K blocks
         nblocks = int(math.floor(n / L))
-        if initblocks is not None:
-            Q = initblocks
-        else:
-            Q = 10 * (2**L)
+        Q = self.initialization_blocks(L)
         K = nblocks - Q
 
         # Step 3 Construct Table
-        nsymbols = 2**L
-        T = [0 for x in range(nsymbols)]  # zero out the table
-        for i in range(Q):  # Mark final position of
-            pattern = bitstring[i * L : (i + 1) * L]  # each pattern
-            idx = self.pattern2int(pattern)
-            T[idx] = i + 1  # +1 to number indexes 1..(2**L)+1
-            # instead of 0..2**L
-        # Step 4 Iterate
+        packed = bitstring.to_packed()
+        T = np.zeros(2**L, dtype=np.int64)  # zero out the table
         sum = 0.0
-        for i in range(Q, nblocks):
-            pattern = bitstring[i * L : (i + 1) * L]
-            j = self.pattern2int(pattern)
-            dist = i + 1 - T[j]
-            T[j] = i + 1
-            sum = sum + math.log(dist, 2)
+        for start in range(0, nblocks, SCAN_BLOCKS):
+            stop = min(start + SCAN_BLOCKS, nblocks)
+            with phase("build blocks"):
+                patterns = block_codes(packed, L, start, stop)
+            with phase("scan"):
+                sum += self._scan(patterns, start, Q, T)
+        return self._evaluate(L, K, sum, verbose)
+
+    def _patterns(self, blocks: np.ndarray) -> np.ndarray:
+        # Integer value of every L-bit block, first bit most significant
+        L = blocks.shape[1]
+        weights = 1 << np.arange(L - 1, -1, -1, dtype=np.int64)
+        return (blocks @ weights).astype(np.uint16)
+
+    def _scan(self, patterns: np.ndarray, first: int, Q: int, T: np.ndarray) -> float:
+        # Blocks first, first + 1, ... : the first Q only mark the final
+        # position of each pattern in T, the others add log2 of the distance
+        # to its previous occurrence. T is updated in place.
+        #
+        # A stable sort groups the blocks by pattern in the order they came.
+        # The previous occurrence of a block is the one before it in its
+        # group, or the position in T for the first of the group.
+        position = np.arange(first + 1, first + len(patterns) + 1, dtype=np.int64)
+        order = np.argsort(patterns, kind="stable")
+        sorted_patterns = patterns[order]
+        position = position[order]
+        group = np.ones(len(patterns), dtype=bool)
+        group[1:] = sorted_patterns[1:] != sorted_patterns[:-1]
+        previous = np.empty_like(position)
+        previous[1:] = position[:-1]
+        previous[group] = T[sorted_patterns[group]]
+
+        # Step 4 Iterate, over the blocks past the first Q
+        counted = position > Q
+        dist = position[counted] - previous[counted]
+        last = np.append(group[1:], True)
+        T[sorted_patterns[last]] = position[last]
+        return float(np.sum(np.log2(dist)))
+
+    def _evaluate(
+        self, L: int, K: int, sum: float, verbose: bool = False
+    ) -> TestResult:
         if verbose:
             print("  sum =", sum)
 
@@ -154,5 +207,71 @@ class MaurersUniversalTest(TestInterface):
         outcome = TestOutcome.PASSED if (p >= 0.01) else TestOutcome.FAILED
         return TestResult(outcome=outcome, p_value=p, p_list=None)
 
-    def is_eligible(self, bitstring: Sequence) -> bool:
-        return len(bitstring) >= 387840
+    def is_eligible(
+        self, bitstring: BitSequence, context: SequenceContext | None = None
+    ) -> bool:
+        n = len(bitstring)
+        if self._block_length is None:
+            return n >= 387840
+        L = self._block_length
+        return n // L > self.initialization_blocks(L)
+
+    def accumulator(
+        self, length: int | None = None, offset: int = 0
+    ) -> "MaurersUniversalAccumulator":
+        return MaurersUniversalAccumulator(self, length, offset)
+
+
+class MaurersUniversalAccumulator(BlockAccumulator):
+    """The table of the last position of every L-bit pattern, the running
+    sum of log2 distances and the incomplete last block.
+
+    A shard does not know where the patterns were last seen before it, so
+    the distances of its first occurrences are taken from position 0, as
+    for patterns that never occurred before, and corrected when the shard
+    is merged after the previous ones."""
+
+    state_fields = ("buffer", "T", "first_seen", "scanned", "sum")
+
+    def __init__(
+        self, test: MaurersUniversalTest, length: int | None = None, offset: int = 0
+    ):
+        super().__init__(test, length, offset)
+        self.L = test.block_length(self.reference_length)
+        self.Q = test.initialization_blocks(self.L)
+        self.buffer = BlockBuffer(self.L, offset=offset)
+        self.T = np.zeros(2**self.L, dtype=np.int64)
+        # Position of the first occurrence of each pattern, 0 if none
+        self.first_seen = np.zeros(2**self.L, dtype=np.int64)
+        self.scanned = 0
+        self.sum = 0.0
+
+    def _add_blocks(self, blocks: np.ndarray) -> None:
+        first = self.buffer.first + self.scanned
+        self.scanned += len(blocks)
+        patterns = self.test._patterns(blocks)
+        codes, index = np.unique(patterns, return_index=True)
+        new = self.first_seen[codes] == 0
+        self.first_seen[codes[new]] = first + index[new] + 1
+        self.sum += self.test._scan(patterns, first, self.Q, self.T)
+
+    def _merge_blocks(self, other: "MaurersUniversalAccumulator") -> None:
+        self.scanned += other.scanned
+        last = self.T
+        seen = (other.first_seen > self.Q) & (last > 0)
+        position = other.first_seen[seen]
+        self.sum += other.sum + float(
+            np.sum(np.log2(position - last[seen]) - np.log2(position))
+        )
+        self.T = np.where(other.T > 0, other.T, last)
+        self.first_seen = np.where(
+            self.first_seen > 0, self.first_seen, other.first_seen
+        )
+
+    def is_eligible(self) -> bool:
+        if self.n < 387840 and self.test._block_length is None:
+            return False
+        return self.buffer.blocks > self.Q
+
+    def _finalize(self) -> TestResult:
+        return self.test._evaluate(self.L, self.buffer.blocks - self.Q, self.sum)
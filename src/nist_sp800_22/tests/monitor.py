@@ -0,0 +1,278 @@
+from typing import Callable, Sequence
+
+import numpy as np
+from pydantic import BaseModel
+
+from nist_sp800_22.bit_sequence import BitSequence
+from nist_sp800_22.utils.pattern_counts import use_dense, window_codes
+
+from .approximate_entropy import ApproximateEntropyTest
+from .binary_matrix_rank import BinaryMatrixRankTest
+from .dft import DiscreteFourierTransformTest
+from .frequency_within_block import FrequencyWithinBlockTest
+from .linear_complexity import LinearComplexityTest
+from .monobit import MonobitTest
+from .parallel import iter_results
+from .random_excursion import RandomExcursionTest
+from .random_excursion_variant import RandomExcursionVariantTest
+from .runs import RunsTest
+from .serial import SerialTest
+from .streaming import as_bits
+from .test_interface import TestInterface
+from .test_outcome_enum import TestOutcome
+from .test_result import TestResult
+
+# Tests only run every ``expensive_interval`` bits
+EXPENSIVE_TESTS = (
+    BinaryMatrixRankTest,
+    LinearComplexityTest,
+    DiscreteFourierTransformTest,
+    RandomExcursionTest,
+    RandomExcursionVariantTest,
+)
+
+# Longest pattern that can straddle the bits entering or leaving the window
+_CONTEXT_BITS = 64
+
+
+class Alert(BaseModel):
+    test: str
+    # Number of bits seen when the failing window ended
+    position: int
+    result: TestResult
+
+
+class HealthMonitor:
+    """Tests the last ``window`` bits of a never ending stream.
+
+    The window is a ring buffer of packed bytes. The statistics of the
+    monobit, runs, serial, approximate entropy and frequency within block
+    tests are updated as bits enter and leave it, so their p-values cost
+    nothing to re-evaluate. Every ``interval`` bits the window is tested,
+    the other tests being run on it from scratch; the expensive ones only
+    every ``expensive_interval`` bits. Failures are passed to ``on_alert``.
+    """
+
+    def __init__(
+        self,
+        tests: list[TestInterface],
+        window: int = 1000000,
+        interval: int | None = None,
+        expensive_interval: int | None = None,
+        on_alert: Callable[[Alert], None] | None = None,
+    ):
+        if interval is None:
+            interval = max(window // 64 * 8, 8)
+        if expensive_interval is None:
+            # The first multiple of interval past a whole window
+            expensive_interval = -(-window // interval) * interval
+        if window < 128 or window % 8:
+            raise ValueError("window must be a multiple of 8 of at least 128 bits")
+        if interval % 8 or not 0 < interval <= window:
+            raise ValueError("interval must be a multiple of 8 in (0, window]")
+        if expensive_interval % interval:
+            raise ValueError("expensive interval must be a multiple of interval")
+        self.tests = tests
+        self.window = window
+        self.interval = interval
+        self.expensive_interval = expensive_interval
+        self.on_alert = on_alert
+
+        self._ring = np.zeros(window // 8, dtype=np.uint8)
+        self._start = 0  # Ring index of the oldest byte
+        self._filled = 0  # Bytes in the ring
+        self._partial = np.zeros(0, dtype=np.uint8)  # Bits short of a byte
+        self.position = 0  # Bits that entered the window
+        self._next = window
+        self._next_expensive = window
+        self.results: dict[str, TestResult] = {}
+
+        # Sufficient statistics of the window
+        self._ones = 0
+        self._transitions = 0
+        self._incremental: set[str] = {MonobitTest.name, RunsTest.name}
+        # Overlapping pattern counts by pattern length, without the windows
+        # that wrap around the end
+        self._patterns: dict[int, np.ndarray] = {}
+        for test in tests:
+            if isinstance(test, SerialTest):
+                m = test.pattern_length(window)
+                if 2 <= m and use_dense(window, m):
+                    self._patterns[m] = np.zeros(2**m, dtype=np.int64)
+                    self._incremental.add(test.name)
+            elif isinstance(test, ApproximateEntropyTest):
+                m = test.pattern_length(window) + 1
+                self._patterns[m] = np.zeros(2**m, dtype=np.int64)
+                self._incremental.add(test.name)
+            elif isinstance(test, FrequencyWithinBlockTest):
+                # Ones of the blocks of M bits of the whole stream, in a
+                # ring; the window's blocks are these when it starts at a
+                # multiple of M
+                self._block_count, self._block_size = test.block_shape(window)
+                self._blocks = np.zeros(
+                    -(-window // self._block_size) + 1, dtype=np.int64
+                )
+                self._incremental.add(test.name)
+
+    @property
+    def is_full(self) -> bool:
+        return self._filled == len(self._ring)
+
+    def window_bits(self) -> BitSequence:
+        """The bits of the window, oldest first."""
+        packed = np.concatenate((self._ring[self._start :], self._ring[: self._start]))[
+            : self._filled
+        ]
+        return BitSequence.from_buffer(packed.tobytes())
+
+    def update(
+        self,
+        chunk: BitSequence | bytes | bytearray | memoryview | Sequence | np.ndarray,
+    ) -> None:
+        bits = as_bits(chunk)
+        if len(self._partial):
+            bits = np.concatenate((self._partial, bits))
+        whole = len(bits) // 8 * 8
+        self._partial = bits[whole:].copy()
+        packed = np.packbits(bits[:whole])
+
+        done = 0
+        while done < len(packed):
+            # Stop at the next evaluation, and at the end of the filling
+            stop = (self._next - self.position) // 8
+            if not self.is_full:
+                stop = min(stop, len(self._ring) - self._filled)
+            piece = packed[done : done + max(stop, 1)]
+            self._push(piece)
+            done += len(piece)
+            if self.position == self._next:
+                self._evaluate_window()
+
+    def _read(self, start: int, count: int) -> np.ndarray:
+        # Unpacked bits start .. start + count of the window, oldest first
+        first = start // 8
+        last = min(-(-(start + count) // 8), self._filled)
+        index = (self._start + np.arange(first, last)) % len(self._ring)
+        bits = np.unpackbits(self._ring[index])
+        return bits[start - first * 8 : start - first * 8 + count]
+
+    def _push(self, piece: np.ndarray) -> None:
+        # The bits leave before the new ones enter, so that a block of the
+        # stream has left the window before its slot is reused
+        entering = np.unpackbits(piece)
+        k = len(piece)
+        length = self._filled * 8
+        before = self._read(max(length - _CONTEXT_BITS, 0), _CONTEXT_BITS)
+        if self.is_full:
+            leaving = self._read(0, len(entering) + _CONTEXT_BITS)
+            after = np.concatenate((leaving[len(entering) :], entering))
+            self._leave(
+                leaving[: len(entering)],
+                after[:_CONTEXT_BITS],
+                self.position - self.window,
+            )
+            index = (self._start + np.arange(k)) % len(self._ring)
+            self._ring[index] = piece
+            self._start = (self._start + k) % len(self._ring)
+        else:
+            self._ring[self._filled : self._filled + k] = piece
+            self._filled += k
+        self._enter(entering, before, self.position)
+        self.position += len(entering)
+
+    def _enter(self, bits: np.ndarray, before: np.ndarray, position: int) -> None:
+        self._ones += int(np.count_nonzero(bits))
+        joined = np.concatenate((before[-1:], bits))
+        self._transitions += int(np.count_nonzero(joined[:-1] != joined[1:]))
+        for m, counts in self._patterns.items():
+            joined = np.concatenate(
+                (before[len(before) - min(m - 1, len(before)) :], bits)
+            )
+            counts += np.bincount(window_codes(joined, m), minlength=2**m)
+        if hasattr(self, "_blocks"):
+            self._count_blocks(bits, position, 1)
+
+    def _leave(self, bits: np.ndarray, after: np.ndarray, position: int) -> None:
+        self._ones -= int(np.count_nonzero(bits))
+        joined = np.concatenate((bits, after[:1]))
+        self._transitions -= int(np.count_nonzero(joined[:-1] != joined[1:]))
+        for m, counts in self._patterns.items():
+            joined = np.concatenate((bits, after[: m - 1]))
+            counts -= np.bincount(window_codes(joined, m), minlength=2**m)
+        if hasattr(self, "_blocks"):
+            self._count_blocks(bits, position, -1)
+
+    def _count_blocks(self, bits: np.ndarray, position: int, sign: int) -> None:
+        # Once all its bits have left, the slot of a block is back to zero
+        blocks = (position + np.flatnonzero(bits)) // self._block_size
+        index, ones = np.unique(blocks % len(self._blocks), return_counts=True)
+        self._blocks[index] += sign * ones
+
+    def _cyclic_counts(self, m: int) -> np.ndarray:
+        # Add the m-1 windows that wrap around the end of the window
+        wrap = np.concatenate(
+            (self._read(self.window - (m - 1), m - 1), self._read(0, m - 1))
+        )
+        return self._patterns[m] + np.bincount(window_codes(wrap, m), minlength=2**m)
+
+    def _incremental_result(self, test: TestInterface) -> TestResult | None:
+        n = self.window
+        if isinstance(test, MonobitTest):
+            return test._evaluate(n, self._ones)
+        if isinstance(test, RunsTest):
+            return test._evaluate(n, self._ones, self._transitions)
+        if isinstance(test, SerialTest):
+            m = test.pattern_length(n)
+            return test._evaluate(n, m, self._cyclic_counts(m))
+        if isinstance(test, ApproximateEntropyTest):
+            m = test.pattern_length(n)
+            return test._evaluate(n, m, self._cyclic_counts(m + 1))
+        if isinstance(test, FrequencyWithinBlockTest):
+            N, M = self._block_count, self._block_size
+            start = self.position - n
+            if start % M:
+                return None
+            index = (start // M + np.arange(N)) % len(self._blocks)
+            return test._evaluate(N, M, test._deviation(self._blocks[index], M))
+        return None
+
+    def evaluate(self, expensive: bool = True) -> dict[str, TestResult]:
+        """Test the current window, without the expensive tests unless
+        ``expensive``, and return the latest result of every test."""
+        if not self.is_full:
+            raise ValueError(
+                "the window holds %d of %d bits" % (self._filled * 8, self.window)
+            )
+        fresh = {}
+        rerun = []
+        for test in self.tests:
+            if isinstance(test, EXPENSIVE_TESTS) and not expensive:
+                continue
+            result = None
+            if test.name in self._incremental:
+                result = self._incremental_result(test)
+            if result is None:
+                rerun.append(test)
+            else:
+                fresh[test.name] = result
+        if rerun:
+            for test, result in iter_results(rerun, self.window_bits()):
+                fresh[test.name] = result
+
+        for test in self.tests:
+            if test.name not in fresh:
+                continue
+            result = fresh[test.name]
+            self.results[test.name] = result
+            if result.outcome == TestOutcome.FAILED and self.on_alert is not None:
+                self.on_alert(
+                    Alert(test=test.name, position=self.position, result=result)
+                )
+        return dict(self.results)
+
+    def _evaluate_window(self) -> None:
+        expensive = self.position >= self._next_expensive
+        if expensive:
+            self._next_expensive += self.expensive_interval
+        self._next += self.interval
+        self.evaluate(expensive)
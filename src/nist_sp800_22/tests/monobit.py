@@ -17,20 +17,33 @@
 # along with sp800_22_tests.  If not, see <http://www.gnu.org/licenses/>.
 
 
-from typing import Sequence
+from nist_sp800_22.bit_sequence import BitSequence
 from .test_result import TestResult
 
 from .test_outcome_enum import TestOutcome
 from .test_interface import TestInterface
+from .sequence_context import SequenceContext
+from .streaming import Accumulator
 import math
+import numpy as np
 
 
 class MonobitTest(TestInterface):
     name = "Monobit Test"
+    cost = 1
+    context_keys = (SequenceContext.ONES_COUNT,)
 
-    def _test(self, bitstring: Sequence, verbose: bool = False) -> TestResult:
-        n = len(bitstring)
-        ones = sum(bitstring)
+    def _test(
+        self,
+        bitstring: BitSequence,
+        verbose: bool = False,
+        context: SequenceContext | None = None,
+    ) -> TestResult:
+        if context is None:
+            context = SequenceContext(bitstring)
+        return self._evaluate(len(bitstring), context.ones_count, verbose)
+
+    def _evaluate(self, n: int, ones: int, verbose: bool = False) -> TestResult:
         zeroes = n - ones
         s = abs(ones - zeroes)
 
@@ -43,5 +56,30 @@ class MonobitTest(TestInterface):
         outcome = TestOutcome.PASSED if (p >= 0.01) else TestOutcome.FAILED
         return TestResult(outcome=outcome, p_value=p, p_list=None)
 
-    def is_eligible(self, bitstring: Sequence) -> bool:
+    def is_eligible(
+        self, bitstring: BitSequence, context: SequenceContext | None = None
+    ) -> bool:
         return True
+
+    def accumulator(
+        self, length: int | None = None, offset: int = 0
+    ) -> "MonobitAccumulator":
+        return MonobitAccumulator(self, length, offset)
+
+
+class MonobitAccumulator(Accumulator):
+    mergeable = True
+    state_fields = ("ones",)
+
+    def __init__(self, test: MonobitTest, length: int | None = None, offset: int = 0):
+        super().__init__(test, length, offset)
+        self.ones = 0
+
+    def _update(self, bits: np.ndarray) -> None:
+        self.ones += int(np.count_nonzero(bits))
+
+    def _merge(self, other: "MonobitAccumulator") -> None:
+        self.ones += other.ones
+
+    def _finalize(self) -> TestResult:
+        return self.test._evaluate(self.n, self.ones)
@@ -16,227 +16,201 @@
 # You should have received a copy of the GNU General Public License
 # along with sp800_22_tests.  If not, see <http://www.gnu.org/licenses/>.
 
+from functools import lru_cache
 
-from typing import Sequence
+from nist_sp800_22.bit_sequence import BitSequence
 from .test_result import TestResult
 
 from .test_outcome_enum import TestOutcome
 from .test_interface import TestInterface
+from .sequence_context import SequenceContext
+from .parameters import NonOverlappingTemplateMatchingParameters
+from .instrumentation import phase
+from .streaming import BlockPiece, BlockTally, TallyAccumulator
 import math
-import random
-from nist_sp800_22.utils.gamma_functions import gammaincc
+import numpy as np
+from nist_sp800_22.utils.special_functions import igamc
+from nist_sp800_22.utils.pattern_counts import CODE_CHUNK, window_codes
+
+
+@lru_cache(maxsize=None)
+def aperiodic_templates(m: int) -> np.ndarray:
+    # Codes (first bit highest) of the m-bit templates that cannot overlap
+    # a shifted copy of themselves, in increasing order: 148 for m = 9
+    codes = np.arange(2**m, dtype=np.int64)
+    aperiodic = np.ones(2**m, dtype=bool)
+    for shift in range(1, m):
+        # The last m - shift bits equal the first m - shift bits
+        aperiodic &= (codes >> shift) != (codes & ((1 << (m - shift)) - 1))
+    templates = codes[aperiodic]
+    templates.flags.writeable = False
+    return templates
+
+
+@lru_cache(maxsize=None)
+def template_index(m: int) -> np.ndarray:
+    # Index of each m-bit code among the aperiodic templates, -1 if none
+    templates = aperiodic_templates(m)
+    index = np.full(2**m, -1, dtype=np.int64)
+    index[templates] = np.arange(len(templates))
+    index.flags.writeable = False
+    return index
 
 
 class NonOverlappingTemplateMatchingTest(TestInterface):
     name = "Non-Overlapping Template Matching Test"
-
-    def _test(self, bitstring: Sequence, verbose: bool = False) -> TestResult:
-        # The templates provdided in SP800-22rev1a
-        templates = [None for x in range(7)]
-        templates[0] = [[0, 1], [1, 0]]
-        templates[1] = [[0, 0, 1], [0, 1, 1], [1, 0, 0], [1, 1, 0]]
-        templates[2] = [
-            [0, 0, 0, 1],
-            [0, 0, 1, 1],
-            [0, 1, 1, 1],
-            [1, 0, 0, 0],
-            [1, 1, 0, 0],
-            [1, 1, 1, 0],
-        ]
-        templates[3] = [
-            [0, 0, 0, 0, 1],
-            [0, 0, 0, 1, 1],
-            [0, 0, 1, 0, 1],
-            [0, 1, 0, 1, 1],
-            [0, 0, 1, 1, 1],
-            [0, 1, 1, 1, 1],
-            [1, 1, 1, 0, 0],
-            [1, 1, 0, 1, 0],
-            [1, 0, 1, 0, 0],
-            [1, 1, 0, 0, 0],
-            [1, 0, 0, 0, 0],
-            [1, 1, 1, 1, 0],
-        ]
-        templates[4] = [
-            [0, 0, 0, 0, 0, 1],
-            [0, 0, 0, 0, 1, 1],
-            [0, 0, 0, 1, 0, 1],
-            [0, 0, 0, 1, 1, 1],
-            [0, 0, 1, 0, 1, 1],
-            [0, 0, 1, 1, 0, 1],
-            [0, 0, 1, 1, 1, 1],
-            [0, 1, 0, 0, 1, 1],
-            [0, 1, 0, 1, 1, 1],
-            [0, 1, 1, 1, 1, 1],
-            [1, 0, 0, 0, 0, 0],
-            [1, 0, 1, 0, 0, 0],
-            [1, 0, 1, 1, 0, 0],
-            [1, 1, 0, 0, 0, 0],
-            [1, 1, 0, 0, 1, 0],
-            [1, 1, 0, 1, 0, 0],
-            [1, 1, 1, 0, 0, 0],
-            [1, 1, 1, 0, 1, 0],
-            [1, 1, 1, 1, 0, 0],
-            [1, 1, 1, 1, 1, 0],
-        ]
-        templates[5] = [
-            [0, 0, 0, 0, 0, 0, 1],
-            [0, 0, 0, 0, 0, 1, 1],
-            [0, 0, 0, 0, 1, 0, 1],
-            [0, 0, 0, 0, 1, 1, 1],
-            [0, 0, 0, 1, 0, 0, 1],
-            [0, 0, 0, 1, 0, 1, 1],
-            [0, 0, 0, 1, 1, 0, 1],
-            [0, 0, 0, 1, 1, 1, 1],
-            [0, 0, 1, 0, 0, 1, 1],
-            [0, 0, 1, 0, 1, 0, 1],
-            [0, 0, 1, 0, 1, 1, 1],
-            [0, 0, 1, 1, 0, 1, 1],
-            [0, 0, 1, 1, 1, 0, 1],
-            [0, 0, 1, 1, 1, 1, 1],
-            [0, 1, 0, 0, 0, 1, 1],
-            [0, 1, 0, 0, 1, 1, 1],
-            [0, 1, 0, 1, 0, 1, 1],
-            [0, 1, 0, 1, 1, 1, 1],
-            [0, 1, 1, 0, 1, 1, 1],
-            [0, 1, 1, 1, 1, 1, 1],
-            [1, 0, 0, 0, 0, 0, 0],
-            [1, 0, 0, 1, 0, 0, 0],
-            [1, 0, 1, 0, 0, 0, 0],
-            [1, 0, 1, 0, 1, 0, 0],
-            [1, 0, 1, 1, 0, 0, 0],
-            [1, 0, 1, 1, 1, 0, 0],
-            [1, 1, 0, 0, 0, 0, 0],
-            [1, 1, 0, 0, 0, 1, 0],
-            [1, 1, 0, 0, 1, 0, 0],
-            [1, 1, 0, 1, 0, 0, 0],
-            [1, 1, 0, 1, 0, 1, 0],
-            [1, 1, 0, 1, 1, 0, 0],
-            [1, 1, 1, 0, 0, 0, 0],
-            [1, 1, 1, 0, 0, 1, 0],
-            [1, 1, 1, 0, 1, 0, 0],
-            [1, 1, 1, 0, 1, 1, 0],
-            [1, 1, 1, 1, 0, 0, 0],
-            [1, 1, 1, 1, 0, 1, 0],
-            [1, 1, 1, 1, 1, 0, 0],
-            [1, 1, 1, 1, 1, 1, 0],
-        ]
-        templates[6] = [
-            [0, 0, 0, 0, 0, 0, 0, 1],
-            [0, 0, 0, 0, 0, 0, 1, 1],
-            [0, 0, 0, 0, 0, 1, 0, 1],
-            [0, 0, 0, 0, 0, 1, 1, 1],
-            [0, 0, 0, 0, 1, 0, 0, 1],
-            [0, 0, 0, 0, 1, 0, 1, 1],
-            [0, 0, 0, 0, 1, 1, 0, 1],
-            [0, 0, 0, 0, 1, 1, 1, 1],
-            [0, 0, 0, 1, 0, 0, 1, 1],
-            [0, 0, 0, 1, 0, 1, 0, 1],
-            [0, 0, 0, 1, 0, 1, 1, 1],
-            [0, 0, 0, 1, 1, 0, 0, 1],
-            [0, 0, 0, 1, 1, 0, 1, 1],
-            [0, 0, 0, 1, 1, 1, 0, 1],
-            [0, 0, 0, 1, 1, 1, 1, 1],
-            [0, 0, 1, 0, 0, 0, 1, 1],
-            [0, 0, 1, 0, 0, 1, 0, 1],
-            [0, 0, 1, 0, 0, 1, 1, 1],
-            [0, 0, 1, 0, 1, 0, 1, 1],
-            [0, 0, 1, 0, 1, 1, 0, 1],
-            [0, 0, 1, 0, 1, 1, 1, 1],
-            [0, 0, 1, 1, 0, 1, 0, 1],
-            [0, 0, 1, 1, 0, 1, 1, 1],
-            [0, 0, 1, 1, 1, 0, 1, 1],
-            [0, 0, 1, 1, 1, 1, 0, 1],
-            [0, 0, 1, 1, 1, 1, 1, 1],
-            [0, 1, 0, 0, 0, 0, 1, 1],
-            [0, 1, 0, 0, 0, 1, 1, 1],
-            [0, 1, 0, 0, 1, 0, 1, 1],
-            [0, 1, 0, 0, 1, 1, 1, 1],
-            [0, 1, 0, 1, 0, 0, 1, 1],
-            [0, 1, 0, 1, 0, 1, 1, 1],
-            [0, 1, 0, 1, 1, 0, 1, 1],
-            [0, 1, 0, 1, 1, 1, 1, 1],
-            [0, 1, 1, 0, 0, 1, 1, 1],
-            [0, 1, 1, 0, 1, 1, 1, 1],
-            [0, 1, 1, 1, 1, 1, 1, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0],
-            [1, 0, 0, 1, 0, 0, 0, 0],
-            [1, 0, 0, 1, 1, 0, 0, 0],
-            [1, 0, 1, 0, 0, 0, 0, 0],
-            [1, 0, 1, 0, 0, 1, 0, 0],
-            [1, 0, 1, 0, 1, 0, 0, 0],
-            [1, 0, 1, 0, 1, 1, 0, 0],
-            [1, 0, 1, 1, 0, 0, 0, 0],
-            [1, 0, 1, 1, 0, 1, 0, 0],
-            [1, 0, 1, 1, 1, 0, 0, 0],
-            [1, 0, 1, 1, 1, 1, 0, 0],
-            [1, 1, 0, 0, 0, 0, 0, 0],
-            [1, 1, 0, 0, 0, 0, 1, 0],
-            [1, 1, 0, 0, 0, 1, 0, 0],
-            [1, 1, 0, 0, 1, 0, 0, 0],
-            [1, 1, 0, 0, 1, 0, 1, 0],
-            [1, 1, 0, 1, 0, 0, 0, 0],
-            [1, 1, 0, 1, 0, 0, 1, 0],
-            [1, 1, 0, 1, 0, 1, 0, 0],
-            [1, 1, 0, 1, 1, 0, 0, 0],
-            [1, 1, 0, 1, 1, 0, 1, 0],
-            [1, 1, 0, 1, 1, 1, 0, 0],
-            [1, 1, 1, 0, 0, 0, 0, 0],
-            [1, 1, 1, 0, 0, 0, 1, 0],
-            [1, 1, 1, 0, 0, 1, 0, 0],
-            [1, 1, 1, 0, 0, 1, 1, 0],
-            [1, 1, 1, 0, 1, 0, 0, 0],
-            [1, 1, 1, 0, 1, 0, 1, 0],
-            [1, 1, 1, 0, 1, 1, 0, 0],
-            [1, 1, 1, 1, 0, 0, 0, 0],
-            [1, 1, 1, 1, 0, 0, 1, 0],
-            [1, 1, 1, 1, 0, 1, 0, 0],
-            [1, 1, 1, 1, 0, 1, 1, 0],
-            [1, 1, 1, 1, 1, 0, 0, 0],
-            [1, 1, 1, 1, 1, 0, 1, 0],
-            [1, 1, 1, 1, 1, 1, 0, 0],
-            [1, 1, 1, 1, 1, 1, 1, 0],
-        ]
-
-        # n = len(bitstring)
-
-        # Choose the template B
-        r = random.SystemRandom()
-        template_list = r.choice(templates)
-        B = r.choice(template_list)
-
-        m = len(B)
-
+    cost = 10
+
+    def __init__(self, template_length: int = 9):
+        self.parameters = NonOverlappingTemplateMatchingParameters(
+            template_length=template_length
+        )
+        self._template_length: int = template_length
+
+    def _test(
+        self,
+        bitstring: BitSequence,
+        verbose: bool = False,
+        context: SequenceContext | None = None,
+    ) -> TestResult:
         N = 8
         M = int(math.floor(len(bitstring) / 8))
         # n = M * N
-
-        blocks = list()  # Split into N blocks of M bits
-        for i in range(N):
-            blocks.append(bitstring[i * M : (i + 1) * M])
-
-        W = list()  # Count the number of matches of the template in each block Wj
-        for block in blocks:
-            position = 0
-            count = 0
-            while position < (M - m):
-                if block[position : position + m] == B:
-                    position += m
-                    count += 1
-                else:
-                    position += 1
-            W.append(count)
-
-        mu = float(M - m + 1) / float(2**m)  # Compute mu and sigma
-        sigma = M * ((1.0 / float(2**m)) - (float((2 * m) - 1) / float(2 ** (2 * m))))
-
-        chisq = 0.0  # Compute Chi-Square
-        for j in range(N):
-            chisq += ((W[j] - mu) ** 2) / (sigma**2)
-
-        p = gammaincc(N / 2.0, chisq / 2.0)  # Compute P value
-        outcome = TestOutcome.PASSED if (p >= 0.01) else TestOutcome.FAILED
-        return TestResult(outcome=outcome, p_value=p, p_list=None)
-
-    def is_eligible(self, bitstring: Sequence) -> bool:
-        return True
+        blocks = bitstring.unpacked[: N * M].reshape(N, M)
+
+        if verbose:
+            print("  N = %d blocks of M = %d bits" % (N, M))
+        with phase("match"):
+            chisq = self._chi_square(blocks)
+        with phase("p-values"):
+            return self._evaluate(N, chisq, verbose)
+
+    def _chi_square(self, blocks: np.ndarray) -> np.ndarray:
+        return self._block_chi_square(self._matches(blocks), blocks.shape[1])
+
+    def _matches(self, blocks: np.ndarray) -> np.ndarray:
+        # Count the matches of every template in each block Wj at once: each
+        # position has one m-bit code, which is at most one of the templates.
+        # An aperiodic template cannot overlap itself, so skipping m bits
+        # after each match never skips another match and W is a plain count.
+        m = self._template_length
+        K = len(aperiodic_templates(m))
+        N, M = blocks.shape
+        index = template_index(m)
+        offsets = np.arange(N)[:, None] * K
+        W = np.zeros(N * K, dtype=np.int64)
+        # About CODE_CHUNK codes at a time, whatever the length of the blocks
+        step = max(CODE_CHUNK // max(N, 1), 1)
+        for a in range(0, M - m + 1, step):
+            matched = index[window_codes(blocks[:, a : a + step + m - 1], m)]
+            hits = matched >= 0
+            W += np.bincount((offsets + matched)[hits], minlength=N * K)
+        return W.reshape(N, K)
+
+    def _block_chi_square(self, W: np.ndarray, M: int) -> np.ndarray:
+        # Sum over the blocks of (W_j - mu)^2 / sigma^2, for each template
+        m = self._template_length
+        mu = float(M - m + 1) / float(2**m)  # Compute mu and sigma^2
+        sigma_sq = M * (
+            (1.0 / float(2**m)) - (float((2 * m) - 1) / float(2 ** (2 * m)))
+        )
+
+        return (((W - mu) ** 2) / sigma_sq).sum(axis=0)  # Compute Chi-Square
+
+    def _evaluate(self, N: int, chisq: np.ndarray, verbose: bool = False) -> TestResult:
+        K = len(chisq)
+        if verbose:
+            print("  m = %d, %d templates" % (self._template_length, K))
+
+        plist = igamc(N / 2.0, chisq / 2.0).tolist()
+
+        # With K p-values some fail by chance: require the proportion of
+        # passing templates to be within 3 sigma of 0.99 (4.2.1)
+        passed = sum(1 for p in plist if p >= 0.01)
+        minimum = 0.99 - 3.0 * math.sqrt(0.99 * 0.01 / K)
+        if verbose:
+            print("  %d of %d templates passed, minimum %f" % (passed, K, minimum))
+        outcome = TestOutcome.PASSED if (passed / K >= minimum) else TestOutcome.FAILED
+        return TestResult(outcome=outcome, p_value=None, p_list=plist)
+
+    def is_eligible(
+        self, bitstring: BitSequence, context: SequenceContext | None = None
+    ) -> bool:
+        # Each of the 8 blocks holds at least one template
+        return len(bitstring) // 8 >= self._template_length
+
+    def accumulator(
+        self, length: int | None = None, offset: int = 0
+    ) -> "NonOverlappingTemplateMatchingAccumulator":
+        return NonOverlappingTemplateMatchingAccumulator(self, length, offset)
+
+
+class TemplateMatches(BlockPiece):
+    """Matches of every template in consecutive bits of a block, with the
+    first and last m - 1 bits, to count the matches across a junction."""
+
+    state_fields = ("W", "first", "last")
+
+    def __init__(self, test: NonOverlappingTemplateMatchingTest):
+        super().__init__()
+        self.test = test
+        self.m = test._template_length
+        self.W = np.zeros(len(aperiodic_templates(self.m)), dtype=np.int64)
+        self.first = np.zeros(0, dtype=np.uint8)
+        self.last = np.zeros(0, dtype=np.uint8)
+
+    def _count(self, bits: np.ndarray) -> None:
+        if len(bits) >= self.m:
+            self.W += self.test._matches(bits[None])[0]
+
+    def _extend(self, bits: np.ndarray) -> None:
+        m = self.m
+        if len(self.first) < m - 1:
+            self.first = np.concatenate((self.first, bits[: m - 1 - len(self.first)]))
+        for a in range(0, len(bits), CODE_CHUNK):
+            # The windows ending in this slice, the last ones starting before
+            window = np.concatenate((self.last, bits[a : a + CODE_CHUNK]))
+            self._count(window)
+            self.last = window[max(len(window) - (m - 1), 0) :].copy()
+
+    def _join(self, other: "TemplateMatches") -> None:
+        m = self.m
+        self._count(np.concatenate((self.last, other.first)))
+        self.W += other.W
+        self.first = np.concatenate((self.first, other.first))[: m - 1]
+        last = np.concatenate((self.last, other.last))
+        self.last = last[max(len(last) - (m - 1), 0) :]
+
+
+class NonOverlappingTemplateMatchingAccumulator(TallyAccumulator):
+    state_fields = ("buffer", "chisq")
+
+    def __init__(
+        self,
+        test: NonOverlappingTemplateMatchingTest,
+        length: int | None = None,
+        offset: int = 0,
+    ):
+        super().__init__(test, length, offset)
+        self.buffer = BlockTally(
+            max(self.reference_length // 8, 1),
+            lambda: TemplateMatches(test),
+            8 if self.block_limit_known else None,
+            offset,
+        )
+        self.chisq = np.zeros(len(aperiodic_templates(test._template_length)))
+
+    def _add_blocks(self, blocks: np.ndarray) -> None:
+        self.chisq += self.test._chi_square(blocks)
+
+    def _add_piece(self, piece: TemplateMatches) -> None:
+        self.chisq += self.test._block_chi_square(piece.W[None], piece.length)
+
+    def _merge_blocks(self, other: "NonOverlappingTemplateMatchingAccumulator") -> None:
+        self.chisq += other.chisq
+
+    def is_eligible(self) -> bool:
+        return self.buffer.blocks > 0 and self.buffer.size >= self.test._template_length
+
+    def _finalize(self) -> TestResult:
+        return self.test._evaluate(self.buffer.blocks, self.chisq)
@@ -17,106 +17,186 @@
 # along with sp800_22_tests.  If not, see <http://www.gnu.org/licenses/>.
 
 
+from functools import lru_cache
 from typing import Sequence
+
+from nist_sp800_22.bit_sequence import BitSequence
 from .test_result import TestResult
 
 from .test_outcome_enum import TestOutcome
 from .test_interface import TestInterface
+from .sequence_context import SequenceContext
+from .parameters import OverlappingTemplateMatchingParameters
+from .instrumentation import phase
+from .streaming import BlockAccumulator, BlockBuffer
 import math
-from nist_sp800_22.utils.gamma_functions import gammaincc, gamma
+import numpy as np
+from nist_sp800_22.utils.gamma_functions import gammaincc
+from nist_sp800_22.utils import special_functions
+from nist_sp800_22.utils.pattern_counts import window_codes
+
+# Bits matched at once, so that the temporaries stay bounded
+MATCH_BITS = 1 << 22
+
+
+def log_pr(u: int, eta: float) -> float:
+    """log of the probability of u matches of the all-ones template (STS),
+    as a log-sum-exp of its terms."""
+    if u == 0:
+        return -eta
+    terms = [
+        -eta
+        - u * math.log(2)
+        + lll * math.log(eta)
+        - special_functions.lgamma(lll + 1)
+        + special_functions.lgamma(u)
+        - special_functions.lgamma(lll)
+        - special_functions.lgamma(u - lll + 1)
+        for lll in range(1, u + 1)
+    ]
+    top = max(terms)
+    return top + math.log(math.fsum(math.exp(t - top) for t in terms))
+
+
+@lru_cache(maxsize=None)
+def ones_class_probabilities(M: int, m: int, K: int) -> tuple[float, ...]:
+    # 0 .. K - 1 matches in a block, and at least K
+    eta = (M - m + 1.0) / (2.0**m) / 2.0
+    pi = [math.exp(log_pr(u, eta)) for u in range(K)]
+    return tuple(pi + [1.0 - math.fsum(pi)])
+
+
+@lru_cache(maxsize=None)
+def template_class_probabilities(
+    template: tuple[int, ...], M: int, K: int
+) -> tuple[float, ...]:
+    """Exact probabilities of 0 .. K - 1 and at least K overlapping matches
+    of ``template`` in M random bits.
+
+    The bits drive the automaton whose state is the longest prefix of the
+    template ending at the last bit. With the match count (capped at K) it
+    is a Markov chain, raised to the power M.
+    """
+    m = len(template)
+    states = (m + 1) * (K + 1)
+    chain = np.zeros((states, states))
+    for state in range(m + 1):
+        for bit in (0, 1):
+            # Longest prefix of the template that ends the bits seen
+            seen = (template[:state] + (bit,))[-m:]
+            k = len(seen)
+            while k and seen[len(seen) - k :] != template[:k]:
+                k -= 1
+            for count in range(K + 1):
+                hit = min(count + (k == m), K)
+                chain[state * (K + 1) + count, k * (K + 1) + hit] += 0.5
+    P = np.linalg.matrix_power(chain, M)[0].reshape(m + 1, K + 1)
+    return tuple(P.sum(axis=0).tolist())
 
 
 class OverlappingTemplateMatchingTest(TestInterface):
+    """Counts the overlapping matches of a template in N blocks of M bits.
+
+    The template defaults to ``template_length`` ones. Their matches in a
+    run of r ones are max(0, r - m + 1), so they are counted from the run
+    lengths, with the class probabilities of the STS. Other templates are
+    matched through the rolling code of every m-bit window, with exact
+    class probabilities. ``blocks=None`` uses every complete block.
+    """
+
     name = "Overlapping Template Matching Test"
+    cost = 10
+    K = 5
+
+    def __init__(
+        self,
+        template: Sequence[int] | str | None = None,
+        block_size: int = 1062,
+        blocks: int | None = 968,
+        template_length: int = 10,
+    ):
+        self.parameters = OverlappingTemplateMatchingParameters(
+            template=template,
+            block_size=block_size,
+            blocks=blocks,
+            template_length=template_length,
+        )
+        self.m = self.parameters.pattern_length
+        self.template = self.parameters.template or (1,) * self.m
+        self.M = block_size
+        self.N = blocks
 
     def lgamma(self, x):
-        return math.log(gamma(x))
+        # Never forms gamma(x) itself, which overflows beyond x = 171
+        return special_functions.lgamma(x)
 
     def Pr(self, u, eta):
-        if u == 0:
-            p = math.exp(-eta)
-        else:
-            sum = 0.0
-            for lll in range(1, u + 1):
-                sum += math.exp(
-                    -eta
-                    - u * math.log(2)
-                    + lll * math.log(eta)
-                    - self.lgamma(lll + 1)
-                    + self.lgamma(u)
-                    - self.lgamma(lll)
-                    - self.lgamma(u - lll + 1)
-                )
-            p = sum
-        return p
-
-    def _test(self, bitstring: Sequence, verbose: bool = False) -> TestResult:
+        return math.exp(log_pr(u, eta))
+
+    def class_probabilities(self) -> tuple[float, ...]:
+        if all(self.template):
+            return ones_class_probabilities(self.M, self.m, self.K)
+        return template_class_probabilities(self.template, self.M, self.K)
+
+    def block_count(self, n: int) -> int:
+        return n // self.M if self.N is None else self.N
+
+    def _test(
+        self,
+        bitstring: BitSequence,
+        verbose: bool = False,
+        context: SequenceContext | None = None,
+    ) -> TestResult:
         # n = len(bitstring)
 
-        m = 10
-        # Build the template B as a random list of bits
-        B = [1 for x in range(m)]
+        N = self.block_count(len(bitstring))
+        M = self.M
 
-        N = 968
-        K = 5
-        M = 1062
-        if len(bitstring) < (M * N):
-            print(
-                "Insufficient data. %d bit provided. 1,028,016 bits required"
-                % len(bitstring)
-            )
-            return False, 0.0, None
-
-        blocks = list()  # Split into N blocks of M bits
-        for i in range(N):
-            blocks.append(bitstring[i * M : (i + 1) * M])
+        bits = bitstring.unpacked
+        blocks = bits[: N * M].reshape(N, M)  # Split into N blocks of M bits
+        with phase("match"):
+            v = self._frequencies(blocks)
+        with phase("chi-square"):
+            return self._evaluate(N, v, verbose)
 
+    def _frequencies(self, blocks: np.ndarray) -> list[int]:
         # Count the distribution of matches of the template across blocks: Vj
-        v = [0 for x in range(K + 1)]
-        for block in blocks:
-            count = 0
-            for position in range(M - m):
-                if block[position : position + m] == B:
-                    count += 1
-
-            if count >= (K):
-                v[K] += 1
-            else:
-                v[count] += 1
-
-        # lamd = float(M-m+1)/float(2**m) # Compute lambda and nu
-        # nu = lamd/2.0
-
-        chisq = 0.0  # Compute Chi-Square
-        # pi = [0.324652,0.182617,0.142670,0.106645,0.077147,0.166269] # From spec
-        pi = [0.364091, 0.185659, 0.139381, 0.100571, 0.0704323, 0.139865]  # From STS
+        K = self.K
+        v = np.zeros(K + 1, dtype=np.int64)
+        step = max(MATCH_BITS // self.M, 1)
+        for a in range(0, len(blocks), step):
+            matches = self._matches(blocks[a : a + step])
+            v += np.bincount(np.minimum(matches, K), minlength=K + 1)
+        return v.tolist()
+
+    def _matches(self, blocks: np.ndarray) -> np.ndarray:
+        # Overlapping matches of the template in each block
+        m = self.m
+        if all(self.template):
+            # Ones ending at each position: a window ends there iff at least m
+            position = np.arange(blocks.shape[1], dtype=np.int32)
+            last_zero = np.where(blocks == 0, position, -1)
+            np.maximum.accumulate(last_zero, axis=1, out=last_zero)
+            return np.count_nonzero(position - last_zero >= m, axis=1)
+        B = 0
+        for bit in self.template:
+            B = (B << 1) | bit
+        return np.count_nonzero(window_codes(blocks, m) == B, axis=1)
+
+    def _evaluate(self, N: int, v: list[int], verbose: bool = False) -> TestResult:
+        m = self.m
+        K = self.K
+        M = self.M
+        B = list(self.template)
+
+        pi = self.class_probabilities()
         piqty = [int(x * N) for x in pi]
 
-        lambd = (M - m + 1.0) / (2.0**m)
-        eta = lambd / 2.0
-        sum = 0.0
-        for i in range(K):  #  Compute Probabilities
-            pi[i] = self.Pr(i, eta)
-            sum += pi[i]
-
-        pi[K] = 1 - sum
-        # for block in blocks:
-        #    count = 0
-        #    for j in xrange(M-m+1):
-        #        if B == block[j:j+m]:
-        #            count += 1
-        #    if ( count <= 4 ):
-        #        v[count]+= 1
-        #    else:
-        #        v[K]+=1
-
-        sum = 0
-        chisq = 0.0
+        chisq = 0.0  # Compute Chi-Square
         for i in range(K + 1):
             chisq += ((v[i] - (N * pi[i])) ** 2) / (N * pi[i])
-            sum += v[i]
 
-        p = gammaincc(5.0 / 2.0, chisq / 2.0)  # Compute P value
+        p = gammaincc(K / 2.0, chisq / 2.0)  # Compute P value
 
         if verbose:
             print("  B = ", B)
@@ -131,7 +211,41 @@ class OverlappingTemplateMatchingTest(TestInterface):
         outcome = TestOutcome.PASSED if (p >= 0.01) else TestOutcome.FAILED
         return TestResult(outcome=outcome, p_value=p, p_list=None)
 
-    def is_eligible(self, bitstring: Sequence) -> bool:
-        N = 968
-        M = 1062
-        return len(bitstring) >= (M * N)
+    def is_eligible(
+        self, bitstring: BitSequence, context: SequenceContext | None = None
+    ) -> bool:
+        N = self.block_count(len(bitstring))
+        return N > 0 and len(bitstring) >= (self.M * N)
+
+    def accumulator(
+        self, length: int | None = None, offset: int = 0
+    ) -> "OverlappingTemplateMatchingAccumulator":
+        return OverlappingTemplateMatchingAccumulator(self, length, offset)
+
+
+class OverlappingTemplateMatchingAccumulator(BlockAccumulator):
+    state_fields = ("buffer", "v")
+
+    def __init__(
+        self,
+        test: OverlappingTemplateMatchingTest,
+        length: int | None = None,
+        offset: int = 0,
+    ):
+        super().__init__(test, length, offset)
+        limit = test.N if self.block_limit_known else None
+        self.buffer = BlockBuffer(test.M, limit, offset)
+        self.v = [0 for x in range(test.K + 1)]
+
+    def _add_blocks(self, blocks: np.ndarray) -> None:
+        counts = self.test._frequencies(blocks)
+        self.v = [a + b for a, b in zip(self.v, counts)]
+
+    def _merge_blocks(self, other: "OverlappingTemplateMatchingAccumulator") -> None:
+        self.v = [a + b for a, b in zip(self.v, other.v)]
+
+    def is_eligible(self) -> bool:
+        return self.buffer.blocks >= (self.test.N or 1)
+
+    def _finalize(self) -> TestResult:
+        return self.test._evaluate(self.buffer.blocks, self.v)
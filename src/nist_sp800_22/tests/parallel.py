@@ -0,0 +1,176 @@
+import sys
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Iterator, Literal
+
+import numpy as np
+
+from nist_sp800_22.bit_sequence import BitSequence
+
+from .instrumentation import Instrumentation
+from .sequence_context import SequenceContext
+from .streaming import StreamState, TestStream
+from .test_interface import TestInterface
+from .test_result import TestResult
+
+ExecutorKind = Literal["serial", "thread", "process"]
+
+# Pools are kept between runs so that worker processes, and whatever they
+# cached at module level (template tables, reference probabilities), are
+# reused instead of being rebuilt on every call.
+_executors: dict[tuple[str, int | None], Executor] = {}
+
+# Shared memory blocks attached by the current worker process, by name.
+_attached: dict[str, SharedMemory] = {}
+
+# Held while resource_tracker.register is swapped out, before Python 3.13
+_register_lock = threading.Lock()
+
+# Set in the workers of the process executor. They already run one test per
+# CPU, so the tests do not start threads of their own on top of that.
+_in_worker = False
+
+
+def iter_results(
+    tests: list[TestInterface],
+    bitstring: BitSequence,
+    instrumentation: Instrumentation | None = None,
+) -> Iterator[tuple[TestInterface, TestResult]]:
+    """Run ``tests`` one after the other on a single sequence."""
+    # Shared arrays are built once and dropped after their last consumer
+    context = SequenceContext(bitstring)
+    for test in tests:
+        context.acquire(test.context_keys)
+
+    for test in tests:
+        result = test.test(bitstring, context=context, instrumentation=instrumentation)
+        context.release(test.context_keys)
+        yield test, result
+
+
+def _init_worker() -> None:
+    global _in_worker
+    _in_worker = True
+
+
+def in_worker() -> bool:
+    """Whether this process is a worker of the process executor."""
+    return _in_worker
+
+
+def get_executor(kind: ExecutorKind, max_workers: int | None = None) -> Executor:
+    key = (kind, max_workers)
+    executor = _executors.get(key)
+    if executor is None or getattr(executor, "_broken", False):
+        if kind == "process":
+            executor = ProcessPoolExecutor(
+                max_workers=max_workers, initializer=_init_worker
+            )
+        elif kind == "thread":
+            executor = ThreadPoolExecutor(max_workers=max_workers)
+        else:
+            raise ValueError("unknown executor %r" % kind)
+        _executors[key] = executor
+    return executor
+
+
+def shutdown_executors() -> None:
+    while _executors:
+        _, executor = _executors.popitem()
+        executor.shutdown()
+
+
+class SharedBitSequence:
+    """Copy of a sequence's packed bits in ``multiprocessing.shared_memory``.
+
+    Only the block name and the number of bits are sent to the workers, which
+    map the block and wrap it in a ``BitSequence`` without copying it.
+    """
+
+    def __init__(self, bitstring: BitSequence):
+        packed = bitstring.to_packed()
+        self.length = len(bitstring)
+        self._shm = SharedMemory(create=True, size=max(packed.size, 1))
+        np.ndarray(packed.shape, np.uint8, buffer=self._shm.buf)[:] = packed
+        self.name = self._shm.name
+
+    def close(self) -> None:
+        self._shm.close()
+        self._shm.unlink()
+
+    def __enter__(self) -> "SharedBitSequence":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _attach(name: str) -> SharedMemory:
+    shm = _attached.get(name)
+    if shm is None:
+        # Blocks of previous runs are closed once nothing references them
+        for stale in list(_attached):
+            try:
+                _attached[stale].close()
+            except BufferError:
+                continue
+            del _attached[stale]
+        if sys.version_info >= (3, 13):
+            shm = SharedMemory(name=name, track=False)
+        else:
+            shm = _attach_untracked(name)
+        _attached[name] = shm
+    return shm
+
+
+def _attach_untracked(name: str) -> SharedMemory:
+    # What track=False does: the block belongs to the parent, which unlinks
+    # it. Registered here, it would be unlinked by the tracker of a worker
+    # forked before the parent's tracker started, and unregistering it
+    # afterwards would drop the parent's own registration from a shared
+    # tracker instead.
+    with _register_lock:
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+def run_shared_test(
+    test: TestInterface,
+    name: str,
+    length: int,
+    instrumentation: Instrumentation | None = None,
+) -> TestResult:
+    shm = _attach(name)
+    bitstring = BitSequence.from_buffer(shm.buf, length=length)
+    return test.test(bitstring, instrumentation=instrumentation)
+
+
+def run_shared_sequence(
+    tests: list[TestInterface], name: str, length: int, start: int, stop: int
+) -> list[TestResult]:
+    shm = _attach(name)
+    bitstring = BitSequence.from_buffer(shm.buf, length=length)[start:stop]
+    return [result for _, result in iter_results(tests, bitstring)]
+
+
+def stream_shard(
+    tests: list[TestInterface], bitstring: BitSequence, start: int, stop: int
+) -> StreamState:
+    """State of ``tests`` over bits ``start`` to ``stop`` of ``bitstring``."""
+    stream = TestStream(tests, len(bitstring), start)
+    stream.update(bitstring[start:stop])
+    return stream.snapshot()
+
+
+def stream_shared_shard(
+    tests: list[TestInterface], name: str, length: int, start: int, stop: int
+) -> StreamState:
+    shm = _attach(name)
+    bitstring = BitSequence.from_buffer(shm.buf, length=length)
+    return stream_shard(tests, bitstring, start, stop)
@@ -0,0 +1,106 @@
+from typing import Literal
+
+from pydantic import BaseModel, ConfigDict, Field, field_validator, model_validator
+
+from nist_sp800_22.utils.gf2rank import MAX_COLUMNS
+
+
+class TestParameters(BaseModel):
+    """Parameters of a test, checked against the ranges of the spec when
+    the test is built. Tests without parameters share this empty one.
+
+    ``None`` lets the test pick the value the spec recommends for the
+    length of the sequence.
+    """
+
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
+
+class FrequencyWithinBlockParameters(TestParameters):
+    # M >= 20 (2.2.7); None keeps at most 99 blocks
+    block_size: int | None = Field(default=None, ge=20)
+
+
+class LongestRunOnesInABlockParameters(TestParameters):
+    # M >= 8, the smallest of the spec's block sizes
+    block_size: int | None = Field(default=None, ge=8)
+
+
+class BinaryMatrixRankParameters(TestParameters):
+    rows: int = Field(default=32, ge=2)
+    cols: int = Field(default=32, ge=2, le=MAX_COLUMNS)
+
+
+# Smallest working memory of the out-of-core DFT
+MIN_FFT_MEMORY = 1 << 20
+
+
+class DiscreteFourierTransformParameters(TestParameters):
+    dtype: Literal["float32", "float64"] = "float64"
+    # Threads of scipy.fft, -1 for every CPU. None is every CPU, but one in
+    # the workers of the process executor.
+    workers: int | None = None
+    # Bytes above which the transform runs out of core, and its working
+    # memory then
+    max_memory: int | None = Field(default=None, ge=MIN_FFT_MEMORY)
+
+
+class NonOverlappingTemplateMatchingParameters(TestParameters):
+    # m in [2, 21], as in the STS (2.7.7 recommends 9 or 10)
+    template_length: int = Field(default=9, ge=2, le=21)
+
+
+class OverlappingTemplateMatchingParameters(TestParameters):
+    # None is template_length ones
+    template: tuple[Literal[0, 1], ...] | None = None
+    block_size: int = Field(default=1062, ge=1)
+    # None uses every complete block
+    blocks: int | None = Field(default=968, ge=1)
+    template_length: int = Field(default=10, ge=1, le=32)
+
+    @field_validator("template", mode="before")
+    @classmethod
+    def _bits(cls, template):
+        if template is None:
+            return None
+        return tuple(int(bit) for bit in template)
+
+    @model_validator(mode="after")
+    def _fits(self) -> "OverlappingTemplateMatchingParameters":
+        m = self.pattern_length
+        if not 1 <= m <= min(self.block_size, 32):
+            raise ValueError(
+                "template length must be in [1, %d], got %d"
+                % (min(self.block_size, 32), m)
+            )
+        return self
+
+    @property
+    def pattern_length(self) -> int:
+        if self.template is None:
+            return self.template_length
+        return len(self.template)
+
+
+class MaurersUniversalParameters(TestParameters):
+    # L in [6, 16] (2.9.7); None picks L from n
+    block_length: int | None = Field(default=None, ge=6, le=16)
+    # Q, None for 10 * 2^L
+    initialization_blocks: int | None = Field(default=None, ge=1)
+
+
+class LinearComplexityParameters(TestParameters):
+    # M in [500, 5000] (2.10.7)
+    block_size: int = Field(default=512, ge=500, le=5000)
+    # K, the classes of T being K + 1
+    degrees_of_freedom: int = Field(default=6, ge=1, le=32)
+
+
+class SerialParameters(TestParameters):
+    # None picks the largest m allowed by the spec, m < floor(log2 n) - 2
+    pattern_length: int | None = Field(default=None, ge=2, le=64)
+
+
+class ApproximateEntropyParameters(TestParameters):
+    # None picks m from n, m < floor(log2 n) - 5 (2.12.7)
+    pattern_length: int | None = Field(default=None, ge=1, le=24)
@@ -17,78 +17,78 @@
 # along with sp800_22_tests.  If not, see <http://www.gnu.org/licenses/>.
 
 
-from typing import Sequence
+from nist_sp800_22.bit_sequence import BitSequence
 from .test_result import TestResult
 
 from .test_outcome_enum import TestOutcome
 from .test_interface import TestInterface
+from .sequence_context import SequenceContext
+from .streaming import Accumulator
+import numpy as np
 
 # import math
 from nist_sp800_22.utils.gamma_functions import gammaincc
 
+STATES = [-4, -3, -2, -1, 1, 2, 3, 4]
+
+
+def cycle_visits(s: np.ndarray, zeros: np.ndarray) -> np.ndarray:
+    """(len(zeros) + 1, 8) visits of the states -4..-1, 1..4 in each cycle.
+
+    The cycle of a position is the number of zeros of the walk before it, so
+    one bincount over (cycle, state) pairs fills the whole table.
+    """
+    cycles = len(zeros) + 1
+    positions = np.flatnonzero((s >= -4) & (s <= 4) & (s != 0))
+    values = s[positions].astype(np.int64)
+    state = values + 4 - (values > 0)
+    cycle = np.searchsorted(zeros, positions)
+    return np.bincount(cycle * 8 + state, minlength=cycles * 8).reshape(cycles, 8)
+
+
+def occurrences(visits: np.ndarray) -> np.ndarray:
+    """(8, 6) number of cycles in which each state occurs k times, k = 5
+    meaning 5 times or more."""
+    return np.stack(
+        [
+            np.bincount(np.minimum(visits[:, index], 5), minlength=6)
+            for index in range(8)
+        ]
+    )
+
 
 class RandomExcursionTest(TestInterface):
     name = "Random Excursion Test"
-
-    def _test(self, bitstring: Sequence, verbose: bool = False) -> TestResult:
+    cost = 5
+    context_keys = (
+        SequenceContext.PARTIAL_SUMS,
+        SequenceContext.ZERO_CROSSINGS,
+    )
+
+    def _test(
+        self,
+        bitstring: BitSequence,
+        verbose: bool = False,
+        context: SequenceContext | None = None,
+    ) -> TestResult:
         # n = len(bitstring)
 
-        x = list()  # Convert to +1,-1
-        for bit in bitstring:
-            # if bit == 0:
-            x.append((bit * 2) - 1)
-
-        # print "x=",x
-        # Build the partial sums
-        pos = 0
-        s = list()
-        for e in x:
-            pos = pos + e
-            s.append(pos)
-        sprime = [0] + s + [0]  # Add 0 on each end
-
-        # print "sprime=",sprime
-        # Build the list of cycles
-        pos = 1
-        cycles = list()
-        while pos < len(sprime):
-            cycle = list()
-            cycle.append(0)
-            while sprime[pos] != 0:
-                cycle.append(sprime[pos])
-                pos += 1
-            cycle.append(0)
-            cycles.append(cycle)
-            pos = pos + 1
-
-        J = len(cycles)
+        if context is None:
+            context = SequenceContext(bitstring)
+        # The partial sums of the +1,-1 walk, 0 added on each end, split into
+        # cycles by its zeros: J cycles, the last one closed by the final 0
+        s = context.partial_sums
+        zeros = context.zero_crossings
+        J = len(zeros) + 1
+
+        # Count Occurances: vxk[index][k] cycles in which x occurs k times
+        vxk = occurrences(cycle_visits(s, zeros))
+        return self._evaluate(J, vxk, verbose)
+
+    def _evaluate(self, J: int, vxk: np.ndarray, verbose: bool = False) -> TestResult:
         if verbose:
             print("J=" + str(J))
-
-        vxk = [["a", "b", "c", "d", "e", "f"] for y in [-4, -3, -2, -1, 1, 2, 3, 4]]
-
-        # Count Occurances
-        for k in range(6):
-            for index in range(8):
-                mapping = [-4, -3, -2, -1, 1, 2, 3, 4]
-                x = mapping[index]
-                cyclecount = 0
-                # count how many cycles in which x occurs k times
-                for cycle in cycles:
-                    oc = 0
-                    # Count how many times x occurs in the current cycle
-                    for pos in cycle:
-                        if pos == x:
-                            oc += 1
-                    # If x occurs k times, increment the cycle count
-                    if k < 5:
-                        if oc == k:
-                            cyclecount += 1
-                    else:
-                        if k == 5:
-                            if oc >= 5:
-                                cyclecount += 1
-                vxk[index][k] = cyclecount
+        vxk = vxk.tolist()
 
         # Table for reference random probabilities
         pixk = [
@@ -104,8 +104,7 @@ class RandomExcursionTest(TestInterface):
         success = True
         plist = list()
         for index in range(8):
-            mapping = [-4, -3, -2, -1, 1, 2, 3, 4]
-            x = mapping[index]
+            x = STATES[index]
             chisq = 0.0
             for k in range(6):
                 top = float(vxk[index][k]) - (float(J) * (pixk[abs(x) - 1][k]))
@@ -126,34 +125,53 @@ class RandomExcursionTest(TestInterface):
         outcome = TestOutcome.PASSED if success else TestOutcome.FAILED
         return TestResult(outcome=outcome, p_value=None, p_list=plist)
 
-    def is_eligible(self, bitstring: Sequence) -> bool:
-        x = list()  # Convert to +1,-1
-        for bit in bitstring:
-            # if bit == 0:
-            x.append((bit * 2) - 1)
-
-        # print "x=",x
-        # Build the partial sums
-        pos = 0
-        s = list()
-        for e in x:
-            pos = pos + e
-            s.append(pos)
-        sprime = [0] + s + [0]  # Add 0 on each end
-
-        # print "sprime=",sprime
-        # Build the list of cycles
-        pos = 1
-        cycles = list()
-        while pos < len(sprime):
-            cycle = list()
-            cycle.append(0)
-            while sprime[pos] != 0:
-                cycle.append(sprime[pos])
-                pos += 1
-            cycle.append(0)
-            cycles.append(cycle)
-            pos = pos + 1
-
-        J = len(cycles)
+    def is_eligible(
+        self, bitstring: BitSequence, context: SequenceContext | None = None
+    ) -> bool:
+        if context is None:
+            context = SequenceContext(bitstring)
+        # Every zero of the walk closes a cycle, and so does the final 0
+        J = len(context.zero_crossings) + 1
         return J >= 500
+
+    def accumulator(
+        self, length: int | None = None, offset: int = 0
+    ) -> "RandomExcursionAccumulator":
+        return RandomExcursionAccumulator(self, length, offset)
+
+
+class RandomExcursionAccumulator(Accumulator):
+    """Occurrence counts of the closed cycles, and the visits of the cycle
+    still open at the end of the last chunk."""
+
+    state_fields = ("total", "closed", "vxk", "open")
+
+    def __init__(
+        self, test: RandomExcursionTest, length: int | None = None, offset: int = 0
+    ):
+        super().__init__(test, length, offset)
+        self.total = 0
+        self.closed = 0
+        self.vxk = np.zeros((8, 6), dtype=np.int64)
+        self.open = np.zeros(8, dtype=np.int64)
+
+    def _update(self, bits: np.ndarray) -> None:
+        if len(bits) == 0:
+            return
+        s = self.total + np.cumsum(bits.astype(np.int8) * 2 - 1, dtype=np.int64)
+        zeros = np.flatnonzero(s == 0)
+        visits = cycle_visits(s, zeros)
+        visits[0] += self.open
+        self.vxk += occurrences(visits[:-1])
+        self.open = visits[-1]
+        self.closed += len(zeros)
+        self.total = int(s[-1])
+
+    def is_eligible(self) -> bool:
+        return self.closed + 1 >= 500
+
+    def _finalize(self) -> TestResult:
+        # The final 0 closes the open cycle
+        return self.test._evaluate(
+            self.closed + 1, self.vxk + occurrences(self.open[None, :])
+        )
@@ -17,44 +17,55 @@
 # along with sp800_22_tests.  If not, see <http://www.gnu.org/licenses/>.
 
 
-from typing import Sequence
+from nist_sp800_22.bit_sequence import BitSequence
 from .test_result import TestResult
 
 from .test_outcome_enum import TestOutcome
 from .test_interface import TestInterface
+from .sequence_context import SequenceContext
+from .streaming import Accumulator
 import math
+import numpy as np
 
 
 class RandomExcursionVariantTest(TestInterface):
     name = "Random Excursion Variant Test"
+    cost = 5
+    context_keys = (
+        SequenceContext.PARTIAL_SUMS,
+        SequenceContext.ZERO_CROSSINGS,
+    )
 
-    def _test(self, bitstring: Sequence, verbose: bool = False) -> TestResult:
+    def _test(
+        self,
+        bitstring: BitSequence,
+        verbose: bool = False,
+        context: SequenceContext | None = None,
+    ) -> TestResult:
         # n = len(bitstring)
 
-        x = list()  # Convert to +1,-1
-        for bit in bitstring:
-            x.append((bit * 2) - 1)
-
-        # Build the partial sums
-        pos = 0
-        s = list()
-        for e in x:
-            pos = pos + e
-            s.append(pos)
-        sprime = [0] + s + [0]  # Add 0 on each end
+        if context is None:
+            context = SequenceContext(bitstring)
+        # The partial sums of the +1,-1 walk
+        s = context.partial_sums
 
         # Count the number of cycles J
-        J = 0
-        for value in sprime[1:]:
-            if value == 0:
-                J += 1
+        J = len(context.zero_crossings) + 1
+        return self._evaluate(J, self._visits(s), verbose)
+
+    def _visits(self, s: np.ndarray) -> np.ndarray:
+        # Visits of the states -9..9, state x at index x + 9
+        near = s[(s > -10) & (s < 10)].astype(np.int64)
+        return np.bincount(near + 9, minlength=19)
+
+    def _evaluate(
+        self, J: int, visits: np.ndarray, verbose: bool = False
+    ) -> TestResult:
         if verbose:
             print("J=", J)
-        # Build the counts of offsets
-        count = [0 for x in range(-9, 10)]
-        for value in sprime:
-            if abs(value) < 10:
-                count[value] += 1
+        # Build the counts of offsets, count[x] being the visits of state x
+        # (a negative x indexes from the end, as count[x + 19])
+        count = np.roll(visits, -9).tolist()
 
         # Compute P values
         success = True
@@ -79,22 +90,45 @@ class RandomExcursionVariantTest(TestInterface):
         outcome = TestOutcome.PASSED if success else TestOutcome.FAILED
         return TestResult(outcome=outcome, p_value=None, p_list=plist)
 
-    def is_eligible(self, bitstring: Sequence) -> bool:
-        x = list()  # Convert to +1,-1
-        for bit in bitstring:
-            x.append((bit * 2) - 1)
+    def is_eligible(
+        self, bitstring: BitSequence, context: SequenceContext | None = None
+    ) -> bool:
+        if context is None:
+            context = SequenceContext(bitstring)
+        # Every zero of the walk closes a cycle, and so does the final 0
+        J = len(context.zero_crossings) + 1
+        return J >= 500
 
-        # Build the partial sums
-        pos = 0
-        s = list()
-        for e in x:
-            pos = pos + e
-            s.append(pos)
-        sprime = [0] + s + [0]  # Add 0 on each end
+    def accumulator(
+        self, length: int | None = None, offset: int = 0
+    ) -> "RandomExcursionVariantAccumulator":
+        return RandomExcursionVariantAccumulator(self, length, offset)
 
-        # Count the number of cycles J
-        J = 0
-        for value in sprime[1:]:
-            if value == 0:
-                J += 1
-        return J >= 500
+
+class RandomExcursionVariantAccumulator(Accumulator):
+    state_fields = ("total", "zeros", "visits")
+
+    def __init__(
+        self,
+        test: RandomExcursionVariantTest,
+        length: int | None = None,
+        offset: int = 0,
+    ):
+        super().__init__(test, length, offset)
+        self.total = 0
+        self.zeros = 0
+        self.visits = np.zeros(19, dtype=np.int64)
+
+    def _update(self, bits: np.ndarray) -> None:
+        if len(bits) == 0:
+            return
+        s = self.total + np.cumsum(bits.astype(np.int8) * 2 - 1, dtype=np.int64)
+        self.visits += self.test._visits(s)
+        self.zeros += int(np.count_nonzero(s == 0))
+        self.total = int(s[-1])
+
+    def is_eligible(self) -> bool:
+        return self.zeros + 1 >= 500
+
+    def _finalize(self) -> TestResult:
+        return self.test._evaluate(self.zeros + 1, self.visits)
@@ -17,31 +17,38 @@
 # along with sp800_22_tests.  If not, see <http://www.gnu.org/licenses/>.
 
 
-from typing import Sequence
+from nist_sp800_22.bit_sequence import BitSequence
 from .test_result import TestResult
 
 from .test_outcome_enum import TestOutcome
 from .test_interface import TestInterface
+from .sequence_context import SequenceContext
+from .streaming import Accumulator
 import math
+import numpy as np
+from nist_sp800_22.utils.popcount import count_transitions
 
 
 class RunsTest(TestInterface):
     name = "Runs Test"
+    cost = 1
+    context_keys = (SequenceContext.ONES_COUNT,)
 
-    def count_ones_zeroes(self, bits):
-        ones = 0
-        zeroes = 0
-        for bit in bits:
-            if bit == 1:
-                ones += 1
-            else:
-                zeroes += 1
-        return (zeroes, ones)
-
-    def _test(self, bitstring: Sequence, verbose: bool = False) -> TestResult:
+    def _test(
+        self,
+        bitstring: BitSequence,
+        verbose: bool = False,
+        context: SequenceContext | None = None,
+    ) -> TestResult:
+        if context is None:
+            context = SequenceContext(bitstring)
         n = len(bitstring)
-        zeroes, ones = self.count_ones_zeroes(bitstring)
+        transitions = count_transitions(bitstring.to_packed(), n)
+        return self._evaluate(n, context.ones_count, transitions, verbose)
 
+    def _evaluate(
+        self, n: int, ones: int, transitions: int, verbose: bool = False
+    ) -> TestResult:
         prop = float(ones) / float(n)
         if verbose:
             print("  prop ", prop)
@@ -51,12 +58,9 @@ class RunsTest(TestInterface):
             print("  tau ", tau)
 
         if abs(prop - 0.5) > tau:
-            return TestResult(TestOutcome.FAILED, 0.0, None)
+            return TestResult(outcome=TestOutcome.FAILED, p_value=0.0, p_list=None)
 
-        vobs = 1.0
-        for i in range(n - 1):
-            if bitstring[i] != bitstring[i + 1]:
-                vobs += 1.0
+        vobs = 1.0 + transitions
 
         if verbose:
             print("  vobs ", vobs)
@@ -69,5 +73,50 @@ class RunsTest(TestInterface):
         outcome = TestOutcome.PASSED if (p >= 0.01) else TestOutcome.FAILED
         return TestResult(outcome=outcome, p_value=p, p_list=None)
 
-    def is_eligible(self, bitstring: Sequence) -> bool:
+    def is_eligible(
+        self, bitstring: BitSequence, context: SequenceContext | None = None
+    ) -> bool:
         return True
+
+    def accumulator(
+        self, length: int | None = None, offset: int = 0
+    ) -> "RunsAccumulator":
+        return RunsAccumulator(self, length, offset)
+
+
+class RunsAccumulator(Accumulator):
+    mergeable = True
+    state_fields = ("ones", "transitions", "first", "last")
+
+    def __init__(self, test: RunsTest, length: int | None = None, offset: int = 0):
+        super().__init__(test, length, offset)
+        self.ones = 0
+        self.transitions = 0
+        # First and last bits, for the transitions across chunks and shards
+        self.first: int | None = None
+        self.last: int | None = None
+
+    def _update(self, bits: np.ndarray) -> None:
+        if len(bits) == 0:
+            return
+        if self.first is None:
+            self.first = int(bits[0])
+        self.ones += int(np.count_nonzero(bits))
+        self.transitions += int(np.count_nonzero(bits[:-1] != bits[1:]))
+        if self.last is not None and self.last != bits[0]:
+            self.transitions += 1
+        self.last = int(bits[-1])
+
+    def _merge(self, other: "RunsAccumulator") -> None:
+        if other.first is None:
+            return
+        if self.first is None:
+            self.first = other.first
+        elif self.last != other.first:
+            self.transitions += 1
+        self.ones += other.ones
+        self.transitions += other.transitions
+        self.last = other.last
+
+    def _finalize(self) -> TestResult:
+        return self.test._evaluate(self.n, self.ones, self.transitions)
@@ -0,0 +1,101 @@
+from typing import Callable, Iterable
+
+import numpy as np
+
+from nist_sp800_22.bit_sequence import BitSequence
+from nist_sp800_22.utils.popcount import block_popcounts, popcount
+
+
+class SequenceContext:
+    """Per-sequence arrays shared by the tests of a suite run.
+
+    Values are computed on first access and memoized. When consumers have
+    been registered with ``acquire``, a value is only kept while at least one
+    consumer still holds it, and ``release`` evicts it once the last one is
+    done. Without any registered consumer everything is kept for the
+    lifetime of the context.
+    """
+
+    PLUS_MINUS_ONE = "plus_minus_one"
+    PARTIAL_SUMS = "partial_sums"
+    ZERO_CROSSINGS = "zero_crossings"
+    ONES_COUNT = "ones_count"
+    BLOCK_SUMS = "block_sums"
+
+    def __init__(self, bitstring: BitSequence):
+        self.bitstring = bitstring
+        self._values: dict = {}
+        self._consumers: dict[str, int] = {}
+        self._tracked = False
+
+    def acquire(self, keys: Iterable[str]) -> None:
+        self._tracked = True
+        for key in keys:
+            self._consumers[key] = self._consumers.get(key, 0) + 1
+
+    def release(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            remaining = self._consumers.get(key, 0) - 1
+            self._consumers[key] = max(remaining, 0)
+            if remaining <= 0:
+                self._evict(key)
+
+    def _evict(self, key: str) -> None:
+        for cached in list(self._values):
+            if cached == key or (isinstance(cached, tuple) and cached[0] == key):
+                del self._values[cached]
+
+    def _get(self, key, compute: Callable):
+        try:
+            return self._values[key]
+        except KeyError:
+            pass
+        value = compute()
+        name = key[0] if isinstance(key, tuple) else key
+        if not self._tracked or self._consumers.get(name, 0) > 0:
+            self._values[key] = value
+        return value
+
+    @property
+    def _index_dtype(self):
+        return np.int32 if len(self.bitstring) < 2**31 else np.int64
+
+    @property
+    def plus_minus_one(self) -> np.ndarray:
+        """The sequence mapped to -1/+1 as ``int8``."""
+        return self._get(
+            self.PLUS_MINUS_ONE,
+            lambda: self.bitstring.unpacked.astype(np.int8) * 2 - 1,
+        )
+
+    @property
+    def partial_sums(self) -> np.ndarray:
+        """S_k = X_1 + ... + X_k for k = 1..n (the random walk)."""
+        return self._get(
+            self.PARTIAL_SUMS,
+            lambda: np.cumsum(self.plus_minus_one, dtype=self._index_dtype),
+        )
+
+    @property
+    def zero_crossings(self) -> np.ndarray:
+        """Indices k (0 based) of the partial sums where the walk is back at 0."""
+        return self._get(
+            self.ZERO_CROSSINGS,
+            lambda: np.flatnonzero(self.partial_sums == 0).astype(self._index_dtype),
+        )
+
+    @property
+    def ones_count(self) -> int:
+        return self._get(
+            self.ONES_COUNT,
+            lambda: popcount(self.bitstring.to_packed()),
+        )
+
+    def block_sums(self, block_size: int) -> np.ndarray:
+        """Number of ones in each complete block of ``block_size`` bits."""
+
+        def compute():
+            blocks = len(self.bitstring) // block_size
+            return block_popcounts(self.bitstring.to_packed(), block_size, blocks)
+
+        return self._get((self.BLOCK_SUMS, block_size), compute)
@@ -17,69 +17,96 @@
 # along with sp800_22_tests.  If not, see <http://www.gnu.org/licenses/>.
 
 
-from typing import Sequence
+from nist_sp800_22.bit_sequence import BitSequence
 from .test_result import TestResult
 
 from .test_outcome_enum import TestOutcome
 from .test_interface import TestInterface
+from .sequence_context import SequenceContext
+from .parameters import SerialParameters
+from .instrumentation import phase
+from .streaming import Accumulator
 import math
+import numpy as np
 from nist_sp800_22.utils.gamma_functions import gammaincc
+from nist_sp800_22.utils.pattern_counts import (
+    StreamingPatternCounts,
+    marginal_histogram,
+    pattern_histogram,
+    sparse_marginal_counts,
+    sparse_pattern_counts,
+    use_dense,
+)
 
 
 class SerialTest(TestInterface):
     name = "Serial Test"
-
-    def int2patt(self, n, m):
-        pattern = list()
-        for i in range(m):
-            pattern.append((n >> i) & 1)
-        return pattern
-
-    def countpattern(self, patt, bits, n):
-        thecount = 0
-        for i in range(n):
-            match = True
-            for j in range(len(patt)):
-                if patt[j] != bits[i + j]:
-                    match = False
-            if match:
-                thecount += 1
-        return thecount
-
-    def psi_sq_mv1(self, m, n, padded_bits):
-        counts = [0 for i in range(2**m)]
-        for i in range(2**m):
-            pattern = self.int2patt(i, m)
-            count = self.countpattern(pattern, padded_bits, n)
-            counts.append(count)
-
-        psi_sq_m = 0.0
-        for count in counts:
-            psi_sq_m += count**2
+    cost = 10
+    # The default m of the STS, which keeps the 2^m histogram at 512 KiB
+    # however long the sequence
+    MAX_PATTERN_LENGTH = 16
+
+    def __init__(self, pattern_length: int | None = None):
+        # None picks the largest m allowed by the spec, m < floor(log2 n) - 2,
+        # up to MAX_PATTERN_LENGTH
+        self.parameters = SerialParameters(pattern_length=pattern_length)
+        self._pattern_length: int | None = pattern_length
+
+    def psi_sq_mv1(self, m, n, counts):
+        # Only the occurring patterns contribute to the sum of squares
+        psi_sq_m = float(np.dot(counts, counts))
         psi_sq_m = psi_sq_m * (2**m) / n
         psi_sq_m -= n
         return psi_sq_m
 
-    def _test(self, bitstring: Sequence, verbose: bool = False) -> TestResult:
-        patternlen = None
+    def pattern_length(self, n: int) -> int:
+        if self._pattern_length is not None:
+            return self._pattern_length
+        return min(int(math.floor(math.log(n, 2))) - 3, self.MAX_PATTERN_LENGTH)
+
+    def _test(
+        self,
+        bitstring: BitSequence,
+        verbose: bool = False,
+        context: SequenceContext | None = None,
+    ) -> TestResult:
         n = len(bitstring)
-        if patternlen is not None:
-            m = patternlen
-        else:
-            m = int(math.floor(math.log(n, 2))) - 2
+        m = self.pattern_length(n)
 
-            if m < 4:
-                print("Error. Not enough data for m to be 4")
-                return False, 0, None
-            m = 4
-
-        # Step 1
-        padded_bits = bitstring + bitstring[0 : m - 1]
+        if verbose:
+            print("  m          = ", m)
+
+        # Step 1: the m-bit histogram in one pass over the cyclic sequence
+        bits = bitstring.unpacked
+        with phase("histogram"):
+            if use_dense(n, m):
+                codes, counts_m = None, pattern_histogram(bits, m)
+            else:
+                codes, counts_m = sparse_pattern_counts(bits, m)
+        with phase("chi-square"):
+            return self._evaluate(n, m, counts_m, codes, verbose)
+
+    def _evaluate(
+        self,
+        n: int,
+        m: int,
+        counts_m: np.ndarray,
+        codes: np.ndarray | None = None,
+        verbose: bool = False,
+    ) -> TestResult:
+        # The (m-1) and (m-2)-bit histograms by merging the bins that share
+        # a prefix; ``codes`` are the patterns of sparse counts
+        if codes is None:
+            counts_mm1 = marginal_histogram(counts_m, 1)
+            counts_mm2 = marginal_histogram(counts_m, 2)
+        else:
+            codes, counts_mm1 = sparse_marginal_counts(codes, counts_m, 1)
+            _, counts_mm2 = sparse_marginal_counts(codes, counts_mm1, 1)
 
         # Step 2
-        psi_sq_m = self.psi_sq_mv1(m, n, padded_bits)
-        psi_sq_mm1 = self.psi_sq_mv1(m - 1, n, padded_bits)
-        psi_sq_mm2 = self.psi_sq_mv1(m - 2, n, padded_bits)
+        psi_sq_m = self.psi_sq_mv1(m, n, counts_m)
+        psi_sq_mm1 = self.psi_sq_mv1(m - 1, n, counts_mm1)
+        psi_sq_mm2 = self.psi_sq_mv1(m - 2, n, counts_mm2)
 
         delta1 = psi_sq_m - psi_sq_mm1
         delta2 = psi_sq_m - (2 * psi_sq_mm1) + psi_sq_mm2
@@ -100,5 +127,41 @@ class SerialTest(TestInterface):
         outcome = TestOutcome.PASSED if success else TestOutcome.FAILED
         return TestResult(outcome=outcome, p_value=None, p_list=[P1, P2])
 
-    def is_eligible(self, bitstring: Sequence) -> bool:
-        return True
+    def is_eligible(
+        self, bitstring: BitSequence, context: SequenceContext | None = None
+    ) -> bool:
+        n = len(bitstring)
+        return n > 0 and 2 <= self.pattern_length(n) <= n
+
+    def accumulator(
+        self, length: int | None = None, offset: int = 0
+    ) -> "SerialAccumulator":
+        return SerialAccumulator(self, length, offset)
+
+
+class SerialAccumulator(Accumulator):
+    mergeable = True
+    state_fields = ("patterns",)
+
+    def __init__(self, test: SerialTest, length: int | None = None, offset: int = 0):
+        super().__init__(test, length, offset)
+        self.m = test.pattern_length(max(self.reference_length, 1))
+        # A declared length too short for m >= 2 is never finalized, but
+        # still needs patterns to count
+        m = max(self.m, 1)
+        self.patterns = StreamingPatternCounts(m, use_dense(self.reference_length, m))
+
+    def _update(self, bits: np.ndarray) -> None:
+        self.patterns.update(bits)
+
+    def _merge(self, other: "SerialAccumulator") -> None:
+        self.patterns.merge(other.patterns)
+
+    def is_eligible(self) -> bool:
+        return 2 <= self.m <= self.n
+
+    def _finalize(self) -> TestResult:
+        if self.patterns.dense:
+            return self.test._evaluate(self.n, self.m, self.patterns.histogram())
+        codes, counts = self.patterns.sparse_counts()
+        return self.test._evaluate(self.n, self.m, counts, codes)
@@ -0,0 +1,534 @@
+import base64
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Any, Callable, Sequence
+
+import numpy as np
+from pydantic import BaseModel
+
+from nist_sp800_22.bit_sequence import BitSequence, as_bit_sequence
+
+from .test_outcome_enum import TestOutcome
+from .test_result import TestResult
+
+if TYPE_CHECKING:
+    from .test_interface import TestInterface
+
+# Parameters that the tests derive from the sequence length (block sizes,
+# pattern lengths) are taken from the length given to ``stream()``. A stream
+# of unknown length uses the parameters of a sequence of this many bits, and
+# its block based statistics then count every complete block.
+DEFAULT_STREAM_LENGTH = 1000000
+
+
+def as_bits(
+    chunk: BitSequence | bytes | bytearray | memoryview | Sequence | np.ndarray,
+):
+    """Unpacked bits of a chunk; ``bytes`` like chunks are packed, MSB first."""
+    if isinstance(chunk, (bytes, bytearray, memoryview)):
+        return BitSequence.from_buffer(chunk).unpacked
+    return as_bit_sequence(chunk).unpacked
+
+
+class BlockBuffer:
+    """Cuts a stream into blocks of ``size`` bits.
+
+    Only the incomplete last block is kept between chunks, in a buffer of
+    ``size`` bits filled in place. With ``limit``, blocks past the first
+    ``limit`` ones are dropped. A stream starting at bit ``offset`` of a
+    longer sequence keeps the bits before its first block boundary in
+    ``head``, to complete the last block of the stream it is merged after.
+    """
+
+    def __init__(self, size: int, limit: int | None = None, offset: int = 0):
+        self.size = size
+        self.limit = limit
+        self.skip = -offset % size
+        # Index of the first block starting in this stream
+        self.first = (offset + self.skip) // size
+        self.blocks = 0
+        self._head = np.zeros(self.skip, dtype=np.uint8)
+        self._pending = np.zeros(size, dtype=np.uint8)
+        self.head_length = 0
+        self.filled = 0
+
+    @property
+    def head(self) -> np.ndarray:
+        return self._head[: self.head_length]
+
+    @head.setter
+    def head(self, bits: np.ndarray) -> None:
+        self._head[: len(bits)] = bits
+        self.head_length = len(bits)
+
+    @property
+    def pending(self) -> np.ndarray:
+        return self._pending[: self.filled]
+
+    @pending.setter
+    def pending(self, bits: np.ndarray) -> None:
+        self._pending[: len(bits)] = bits
+        self.filled = len(bits)
+
+    def _full(self) -> bool:
+        return self.limit is not None and self.first + self.blocks >= self.limit
+
+    def _empty(self) -> np.ndarray:
+        return np.zeros((0, self.size), dtype=np.uint8)
+
+    def push(self, bits: np.ndarray) -> np.ndarray:
+        """The (k, size) blocks completed by ``bits``."""
+        if self.head_length < self.skip:
+            taken = bits[: self.skip - self.head_length]
+            self._head[self.head_length : self.head_length + len(taken)] = taken
+            self.head_length += len(taken)
+            bits = bits[len(taken) :]
+        if self._full() or len(bits) == 0:
+            return self._empty()
+        completed = None
+        if self.filled:
+            taken = bits[: self.size - self.filled]
+            self._pending[self.filled : self.filled + len(taken)] = taken
+            self.filled += len(taken)
+            bits = bits[len(taken) :]
+            if self.filled < self.size:
+                return self._empty()
+            completed = self._pending[None].copy()
+            self.filled = 0
+            self.blocks += 1
+            if self._full():
+                return completed
+        count = len(bits) // self.size
+        if self.limit is not None:
+            count = min(count, self.limit - self.first - self.blocks)
+        blocks = bits[: count * self.size].reshape(count, self.size)
+        self.blocks += count
+        if not self._full():
+            self.pending = bits[count * self.size :]
+        if completed is not None:
+            blocks = np.concatenate((completed, blocks))
+        return blocks
+
+    def merge(self, other: "BlockBuffer") -> np.ndarray:
+        """Append the buffer of the stream that follows this one; returns the
+        block (if any) made of this pending bits and the other head."""
+        if self.head_length < self.skip:
+            # No block boundary was reached yet, the other stream's blocks
+            # are this one's first
+            self.head = np.concatenate((self.head, other.head))
+            self.blocks = other.blocks
+            self.pending = other.pending
+            return self._empty()
+        if self._full():
+            return self._empty()
+        joined = np.concatenate((self.pending, other.head))
+        if other.head_length < other.skip:
+            self.pending = joined
+            return self._empty()
+        blocks = joined.reshape(-1, self.size)
+        self.blocks += len(blocks) + other.blocks
+        self.pending = other.pending
+        return blocks
+
+    def state(self) -> dict:
+        return {"blocks": self.blocks, "head": self.head, "pending": self.pending}
+
+    def load(self, state: dict) -> None:
+        for name, value in state.items():
+            setattr(self, name, value)
+
+
+class BlockPiece(ABC):
+    """Statistics of consecutive bits of one block, for blocks too long to
+    be buffered. Pieces are extended with the bits that follow, or joined
+    with the piece of the bits that follow."""
+
+    # Attributes that make up the state, besides length
+    state_fields: tuple[str, ...] = ()
+
+    def __init__(self):
+        self.length = 0
+
+    def extend(self, bits: np.ndarray) -> None:
+        self._extend(bits)
+        self.length += len(bits)
+
+    def join(self, other: "BlockPiece") -> None:
+        self._join(other)
+        self.length += other.length
+
+    @abstractmethod
+    def _extend(self, bits: np.ndarray) -> None:
+        pass
+
+    @abstractmethod
+    def _join(self, other: "BlockPiece") -> None:
+        pass
+
+    def state(self) -> dict:
+        state = {"length": self.length}
+        state.update((name, getattr(self, name)) for name in self.state_fields)
+        return state
+
+    def load(self, state: dict) -> None:
+        for name, value in state.items():
+            setattr(self, name, value)
+
+
+class BlockTally:
+    """Cuts a stream into blocks of ``size`` bits like ``BlockBuffer``, but
+    keeps the incomplete last block, and the head of a stream starting at
+    an offset, as ``BlockPiece`` statistics made by ``piece()`` instead of
+    bits. Memory then stays bounded however long the blocks are.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        piece: Callable[[], BlockPiece],
+        limit: int | None = None,
+        offset: int = 0,
+    ):
+        self.size = size
+        self.piece = piece
+        self.limit = limit
+        self.skip = -offset % size
+        # Index of the first block starting in this stream
+        self.first = (offset + self.skip) // size
+        self.blocks = 0
+        self.head = piece()
+        self.pending = piece()
+
+    def _full(self) -> bool:
+        return self.limit is not None and self.first + self.blocks >= self.limit
+
+    def _empty(self) -> np.ndarray:
+        return np.zeros((0, self.size), dtype=np.uint8)
+
+    def push(self, bits: np.ndarray) -> tuple[BlockPiece | None, np.ndarray]:
+        """The piece of the block completed by the first bits of ``bits``,
+        if it started in an earlier chunk, and the (k, size) blocks that
+        lie within ``bits``."""
+        if self.head.length < self.skip:
+            taken = bits[: self.skip - self.head.length]
+            self.head.extend(taken)
+            bits = bits[len(taken) :]
+        if self._full() or len(bits) == 0:
+            return None, self._empty()
+        completed = None
+        if self.pending.length:
+            taken = bits[: self.size - self.pending.length]
+            self.pending.extend(taken)
+            bits = bits[len(taken) :]
+            if self.pending.length < self.size:
+                return None, self._empty()
+            completed, self.pending = self.pending, self.piece()
+            self.blocks += 1
+            if self._full():
+                return completed, self._empty()
+        count = len(bits) // self.size
+        if self.limit is not None:
+            count = min(count, self.limit - self.first - self.blocks)
+        blocks = bits[: count * self.size].reshape(count, self.size)
+        self.blocks += count
+        if not self._full() and count * self.size < len(bits):
+            self.pending.extend(bits[count * self.size :])
+        return completed, blocks
+
+    def merge(self, other: "BlockTally") -> BlockPiece | None:
+        """Append the tally of the stream that follows this one; returns the
+        piece of the block (if any) completed by the other head."""
+        if self.head.length < self.skip:
+            # No block boundary was reached yet, the other stream's blocks
+            # are this one's first
+            self.head.join(other.head)
+            self.blocks = other.blocks
+            self.pending = other.pending
+            return None
+        if self._full():
+            return None
+        if other.skip == 0:  # This stream ends on a block boundary
+            self.blocks += other.blocks
+            self.pending = other.pending
+            return None
+        self.pending.join(other.head)
+        if other.head.length < other.skip:
+            return None
+        completed = self.pending
+        self.blocks += 1 + other.blocks
+        self.pending = other.pending
+        return completed
+
+    def state(self) -> dict:
+        return {"blocks": self.blocks, "head": self.head, "pending": self.pending}
+
+    def load(self, state: dict) -> None:
+        for name, value in state.items():
+            setattr(self, name, value)
+
+
+def encode_array(values: np.ndarray) -> str:
+    """Little endian bytes of an array, base64 encoded."""
+    return base64.b64encode(
+        np.ascontiguousarray(values, dtype=values.dtype.newbyteorder("<")).tobytes()
+    ).decode("ascii")
+
+
+def decode_array(data: str, template: np.ndarray) -> np.ndarray:
+    """Array encoded by ``encode_array``, with the dtype of ``template`` and
+    its shape but for the first axis."""
+    return (
+        np.frombuffer(base64.b64decode(data), dtype=template.dtype.newbyteorder("<"))
+        .astype(template.dtype)
+        .reshape((-1,) + template.shape[1:])
+    )
+
+
+# States are made of ints, floats, lists and arrays, and of objects (block
+# buffers, pattern counts) whose state() gives a dict of those. The arrays
+# are decoded with the dtype of the same field of a fresh accumulator.
+
+
+def _encode(value: Any) -> Any:
+    if hasattr(value, "state"):
+        value = value.state()
+    if isinstance(value, dict):
+        return {name: _encode(field) for name, field in value.items()}
+    if isinstance(value, np.ndarray):
+        return encode_array(value)
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _decode(value: Any, template: Any) -> Any:
+    if hasattr(template, "load"):
+        template.load(_decode(value, template.state()))
+        return template
+    if isinstance(template, dict):
+        return {name: _decode(field, template[name]) for name, field in value.items()}
+    if isinstance(template, np.ndarray):
+        return decode_array(value, template)
+    return value
+
+
+class AccumulatorState(BaseModel):
+    """Serializable snapshot of an ``Accumulator``."""
+
+    test: str
+    length: int | None
+    offset: int
+    n: int
+    fields: dict[str, Any]
+
+
+class StreamState(BaseModel):
+    """Serializable snapshot of a ``TestStream``."""
+
+    length: int | None
+    offset: int
+    n: int
+    accumulators: list[AccumulatorState]
+
+
+class Accumulator(ABC):
+    """Sufficient statistics of one test, updated chunk by chunk.
+
+    ``finalize`` can be called at any time, as often as needed: it computes
+    the result of the bits seen so far without changing the state.
+
+    An accumulator whose ``mergeable`` is true can also start at bit
+    ``offset`` of the sequence, so that disjoint shards are accumulated
+    separately and merged, in order, into the state of the whole sequence.
+    ``snapshot`` saves the state, to be merged or extended later.
+    """
+
+    mergeable: bool = False
+    # Attributes that make up the state, besides n
+    state_fields: tuple[str, ...] = ()
+
+    def __init__(
+        self, test: "TestInterface", length: int | None = None, offset: int = 0
+    ):
+        if offset and not self.mergeable:
+            raise ValueError("%s cannot start at an offset" % test.name)
+        self.test = test
+        # Declared length of the stream, None when it is unknown
+        self.length = length
+        self.offset = offset
+        self.n = 0
+
+    @property
+    def reference_length(self) -> int:
+        """Length the length dependent parameters are chosen for."""
+        return self.length if self.length is not None else DEFAULT_STREAM_LENGTH
+
+    @property
+    def block_limit_known(self) -> bool:
+        """Whether only the blocks the test itself would use are counted."""
+        return self.length is not None
+
+    def update(self, bits: np.ndarray) -> None:
+        self._update(bits)
+        self.n += len(bits)
+
+    @abstractmethod
+    def _update(self, bits: np.ndarray) -> None:
+        pass
+
+    def merge(self, other: "Accumulator") -> None:
+        """Add the state of the shard that directly follows this one."""
+        if not self.mergeable:
+            raise NotImplementedError("%s states cannot be merged" % self.test.name)
+        if type(other) is not type(self) or other.length != self.length:
+            raise ValueError("cannot merge states of different tests or lengths")
+        if other.offset != self.offset + self.n:
+            raise ValueError(
+                "shard at bit %d does not follow bits %d to %d"
+                % (other.offset, self.offset, self.offset + self.n)
+            )
+        self._merge(other)
+        self.n += other.n
+
+    def _merge(self, other: "Accumulator") -> None:
+        pass
+
+    def snapshot(self) -> AccumulatorState:
+        return AccumulatorState(
+            test=self.test.name,
+            length=self.length,
+            offset=self.offset,
+            n=self.n,
+            fields={name: _encode(getattr(self, name)) for name in self.state_fields},
+        )
+
+    def load(self, state: AccumulatorState) -> "Accumulator":
+        """Restore a snapshot into this fresh accumulator."""
+        if state.test != self.test.name:
+            raise ValueError(
+                "snapshot of %s given to %s" % (state.test, self.test.name)
+            )
+        self.length = state.length
+        self.offset = state.offset
+        self.n = state.n
+        for name in self.state_fields:
+            setattr(self, name, _decode(state.fields[name], getattr(self, name)))
+        return self
+
+    def is_eligible(self) -> bool:
+        return self.n > 0
+
+    @abstractmethod
+    def _finalize(self) -> TestResult:
+        pass
+
+    def finalize(self) -> TestResult:
+        if not self.is_eligible():
+            return TestResult(outcome=TestOutcome.UNELIGIBLE, p_value=None, p_list=None)
+        return self._finalize()
+
+
+class BlockAccumulator(Accumulator):
+    """Accumulator of statistics summed over the blocks of a ``BlockBuffer``."""
+
+    mergeable = True
+    buffer: BlockBuffer
+
+    def _update(self, bits: np.ndarray) -> None:
+        blocks = self.buffer.push(bits)
+        if len(blocks):
+            self._add_blocks(blocks)
+
+    @abstractmethod
+    def _add_blocks(self, blocks: np.ndarray) -> None:
+        pass
+
+    def _merge(self, other: "BlockAccumulator") -> None:
+        blocks = self.buffer.merge(other.buffer)
+        if len(blocks):
+            self._add_blocks(blocks)
+        self._merge_blocks(other)
+
+    def _merge_blocks(self, other: "BlockAccumulator") -> None:
+        """Add the statistics of the other accumulator's blocks."""
+        pass
+
+
+class TallyAccumulator(BlockAccumulator):
+    """Accumulator of statistics summed over the blocks of a ``BlockTally``,
+    the blocks that straddle chunks being added from their pieces."""
+
+    buffer: BlockTally
+
+    def _update(self, bits: np.ndarray) -> None:
+        completed, blocks = self.buffer.push(bits)
+        if completed is not None:
+            self._add_piece(completed)
+        if len(blocks):
+            self._add_blocks(blocks)
+
+    @abstractmethod
+    def _add_piece(self, piece: BlockPiece) -> None:
+        pass
+
+    def _merge(self, other: "TallyAccumulator") -> None:
+        completed = self.buffer.merge(other.buffer)
+        if completed is not None:
+            self._add_piece(completed)
+        self._merge_blocks(other)
+
+
+class TestStream:
+    """Runs a set of tests over a stream of chunks in bounded memory.
+
+    A stream starting at bit ``offset`` (of a sequence of ``length`` bits)
+    only runs the tests whose states can be merged.
+    """
+
+    def __init__(
+        self, tests: list["TestInterface"], length: int | None = None, offset: int = 0
+    ):
+        self.tests = tests
+        self.accumulators = [test.accumulator(length, offset) for test in tests]
+        self.length = length
+        self.offset = offset
+        self.n = 0
+
+    def update(
+        self,
+        chunk: BitSequence | bytes | bytearray | memoryview | Sequence | np.ndarray,
+    ) -> None:
+        bits = as_bits(chunk)
+        for accumulator in self.accumulators:
+            accumulator.update(bits)
+        self.n += len(bits)
+
+    def merge(self, other: "TestStream") -> None:
+        """Add the stream of the shard that directly follows this one."""
+        for accumulator, following in zip(self.accumulators, other.accumulators):
+            accumulator.merge(following)
+        self.n += other.n
+
+    def snapshot(self) -> StreamState:
+        return StreamState(
+            length=self.length,
+            offset=self.offset,
+            n=self.n,
+            accumulators=[accumulator.snapshot() for accumulator in self.accumulators],
+        )
+
+    @classmethod
+    def restore(cls, tests: list["TestInterface"], state: StreamState) -> "TestStream":
+        """The stream saved in ``state``, ready for more chunks or a merge."""
+        stream = cls(tests, state.length, state.offset)
+        for accumulator, saved in zip(stream.accumulators, state.accumulators):
+            accumulator.load(saved)
+        stream.n = state.n
+        return stream
+
+    def finalize(self) -> dict:
+        """Results of the bits seen so far, shaped like ``run``'s."""
+        results = {}
+        for test, accumulator in zip(self.tests, self.accumulators):
+            result = accumulator.finalize()
+            results[test.name] = (result.outcome.value, result.p_value, result.p_list)
+        return results
@@ -0,0 +1,40 @@
+from pydantic import BaseModel, ConfigDict
+
+from .monobit import MonobitTest
+from .test_outcome_enum import TestOutcome
+from .test_result import TestResult
+
+
+class TerminationPolicy(BaseModel):
+    """When a run stops testing a sequence whose verdict is settled.
+
+    The suite runs the tests cheapest first and asks ``settled`` after each
+    one; once it answers True the remaining tests are reported as SKIPPED.
+    This base policy never stops.
+    """
+
+    model_config = ConfigDict(frozen=True)
+
+    def settled(self, name: str, result: TestResult) -> bool:
+        return False
+
+
+class NeverStop(TerminationPolicy):
+    pass
+
+
+class StopOnFirstFailure(TerminationPolicy):
+    def settled(self, name: str, result: TestResult) -> bool:
+        return result.outcome == TestOutcome.FAILED
+
+
+class StopOnFailureOf(TerminationPolicy):
+    # Names of the tests whose failure settles the verdict
+    tests: frozenset[str]
+
+    def settled(self, name: str, result: TestResult) -> bool:
+        return name in self.tests and result.outcome == TestOutcome.FAILED
+
+
+# What ``run`` did before policies: nothing else matters once Monobit fails
+DEFAULT_POLICY = StopOnFailureOf(tests=frozenset({MonobitTest.name}))
@@ -1,23 +1,69 @@
 from abc import ABC, abstractmethod
-from typing import Sequence
+from typing import TYPE_CHECKING, Sequence
 
+from nist_sp800_22.bit_sequence import BitSequence, as_bit_sequence
+
+from .parameters import TestParameters
+from .sequence_context import SequenceContext
 from .test_result import TestResult
 
 from .test_outcome_enum import TestOutcome
 
+if TYPE_CHECKING:
+    from .instrumentation import Instrumentation
+    from .streaming import Accumulator
+
 
 class TestInterface(ABC):
     name: str
+    # SequenceContext values used by the test, so that the suite can evict
+    # them once every test that needs them has run.
+    context_keys: tuple[str, ...] = ()
+    # Rough running time per bit, relative to the monobit test's, so that
+    # results can be reported cheapest first
+    cost: int = 10
+    # Validated parameters, set by the tests that have some
+    parameters: TestParameters = TestParameters()
+
+    @classmethod
+    def from_parameters(cls, parameters: TestParameters) -> "TestInterface":
+        return cls(**parameters.model_dump())
 
     @abstractmethod
-    def is_eligible(self, bitstring: Sequence) -> bool:
+    def is_eligible(
+        self, bitstring: BitSequence, context: SequenceContext | None = None
+    ) -> bool:
         pass
 
     @abstractmethod
-    def _test(self, bitstring: Sequence, verbose: bool = False) -> TestResult:
+    def _test(
+        self,
+        bitstring: BitSequence,
+        verbose: bool = False,
+        context: SequenceContext | None = None,
+    ) -> TestResult:
         pass
 
-    def test(self, bitstring: Sequence, verbose: bool = False) -> TestResult:
-        if not self.is_eligible(bitstring):
+    def test(
+        self,
+        bitstring: BitSequence | Sequence,
+        verbose: bool = False,
+        context: SequenceContext | None = None,
+        instrumentation: "Instrumentation | None" = None,
+    ) -> TestResult:
+        bitstring = as_bit_sequence(bitstring)
+        if instrumentation is not None:
+            return instrumentation.measure(self, bitstring, verbose, context)
+        if context is None:
+            context = SequenceContext(bitstring)
+        if not self.is_eligible(bitstring, context):
             return TestResult(outcome=TestOutcome.UNELIGIBLE, p_value=None, p_list=None)
-        return self._test(bitstring, verbose)
+        return self._test(bitstring, verbose, context)
+
+    def accumulator(self, length: int | None = None, offset: int = 0) -> "Accumulator":
+        """State of the test over a stream of chunks, see ``streaming``.
+
+        ``length`` is the total length of the stream when it is known, and
+        ``offset`` the position of its first bit, for a shard of it.
+        """
+        raise NotImplementedError("%s cannot run on a stream" % self.name)
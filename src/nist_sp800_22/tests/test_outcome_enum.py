@@ -5,3 +5,5 @@ class TestOutcome(Enum):
     PASSED = "PASSED"
     FAILED = "FAILED"
     UNELIGIBLE = "UNELIGIBLE"
+    # Not run, the verdict being settled by earlier tests
+    SKIPPED = "SKIPPED"
@@ -2,7 +2,20 @@ from pydantic import BaseModel
 from .test_outcome_enum import TestOutcome
 
 
+class TestMetrics(BaseModel):
+    wall_seconds: float
+    # CPU time of the thread that ran the test
+    cpu_seconds: float
+    # Peak of the memory allocated while the test ran, when traced
+    peak_memory_bytes: int | None
+    bits: int
+    # Seconds spent in the named phases of the test
+    phases: dict[str, float]
+
+
 class TestResult(BaseModel):
     outcome: TestOutcome
     p_value: float | None
     p_list: list[float] | None
+    # Only recorded when the test runs with an Instrumentation
+    metrics: TestMetrics | None = None
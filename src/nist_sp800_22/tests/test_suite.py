@@ -1,5 +1,27 @@
-from typing import Sequence
+import os
+from concurrent.futures import wait
+from contextlib import aclosing
+from typing import AsyncIterator, Callable, Iterator, Sequence
 
+from nist_sp800_22.bit_sequence import BitSequence, as_bit_sequence
+from .asynchronous import AsyncSource, iter_results_async, read_source
+from .batch import BatchReport, run_batch
+from .cache import ResultCache, sequence_digest
+from .instrumentation import Instrumentation
+from .monitor import Alert, HealthMonitor
+from .parallel import (
+    ExecutorKind,
+    SharedBitSequence,
+    get_executor,
+    iter_results,
+    run_shared_test,
+    stream_shard,
+    stream_shared_shard,
+)
+from .sequence_context import SequenceContext
+from .streaming import StreamState, TestStream
+from .termination import DEFAULT_POLICY, TerminationPolicy
+from .test_result import TestResult
 from .test_outcome_enum import TestOutcome
 from .approximate_entropy import ApproximateEntropyTest
 from .monobit import MonobitTest
@@ -37,27 +59,295 @@ class NistSP80022r1Tests:
         LinearComplexityTest(),
     ]
 
-    def run(self, bitstring: Sequence):
+    def __init__(
+        self,
+        instrumentation: Instrumentation | None = None,
+        cache: ResultCache | None = None,
+        policy: TerminationPolicy | None = None,
+    ):
+        # Metrics are only recorded, and observers called, when set
+        self.instrumentation = instrumentation
+        # Results of run are looked up in, and stored into, the cache
+        self.cache = cache
+        # When run and run_async stop testing a sequence
+        self.policy = DEFAULT_POLICY if policy is None else policy
+        self.observers: list[Callable[[str, TestResult], None]] = []
+
+    def add_observer(self, observer: Callable[[str, TestResult], None]) -> None:
+        """Call ``observer(name, result)`` after every test of ``run`` and
+        ``iter_results``, the result carrying its metrics. This turns the
+        instrumentation on if it was off."""
+        if self.instrumentation is None:
+            self.instrumentation = Instrumentation()
+        self.observers.append(observer)
+
+    def remove_observer(self, observer: Callable[[str, TestResult], None]) -> None:
+        self.observers.remove(observer)
+
+    def _notify(self, name: str, result: TestResult) -> None:
+        for observer in self.observers:
+            observer(name, result)
+
+    def run(
+        self,
+        bitstring: BitSequence | Sequence,
+        executor: ExecutorKind = "serial",
+        max_workers: int | None = None,
+    ):
+        """Run the tests cheapest first until ``self.policy`` settles the
+        verdict. The tests left are reported as SKIPPED."""
+        bitstring = as_bit_sequence(bitstring)
+        tests = sorted(self.tests, key=lambda test: test.cost)
+        cached = {}
+        if self.cache is not None:
+            digest = sequence_digest(bitstring)
+            cached = self.cache.lookup(tests, digest)
+        pending = [test for test in tests if test.name not in cached]
+        if executor == "serial":
+            test_results = iter_results(pending, bitstring, self.instrumentation)
+        else:
+            test_results = self._run_parallel(pending, bitstring, executor, max_workers)
+
         results = {}
+        try:
+            for test in tests:
+                if test.name in cached:
+                    current_result = cached[test.name]
+                else:
+                    _, current_result = next(test_results)
+                    if self.cache is not None:
+                        self.cache.store(test, digest, current_result)
+                self._notify(test.name, current_result)
+                results[test.name] = (
+                    current_result.outcome.value,
+                    current_result.p_value,
+                    current_result.p_list,
+                )
+                if self.policy.settled(test.name, current_result):
+                    break
+        finally:
+            test_results.close()
+        skipped = (TestOutcome.SKIPPED.value, None, None)
+        return {test.name: results.get(test.name, skipped) for test in self.tests}
 
-        for test in self.tests:
-            current_result = test.test(bitstring)
-
-            if (
-                test.name == "Monobit Test"
-                and current_result.outcome == TestOutcome.FAILED
-            ):
-                print("Monobit test failed, no need to run other tests.")
-                exit(1)
-            results[test.name] = (
-                current_result.outcome.value,
-                current_result.p_value,
-                current_result.p_list,
+    async def iter_results(
+        self,
+        source: AsyncSource,
+        executor: ExecutorKind = "thread",
+        max_workers: int | None = None,
+    ) -> AsyncIterator[tuple[str, TestResult]]:
+        """Read ``source`` (an ``asyncio.StreamReader``, an async iterator of
+        byte chunks, or the bits themselves) and yield ``(name, result)`` as
+        the tests complete in ``executor``, cheapest tests first.
+
+        Use it with ``async for name, result in suite.iter_results(...)``.
+        """
+        bitstring = await read_source(source)
+        # Closed with this generator, so that the tests still running are
+        # waited for when the caller stops early
+        async with aclosing(
+            iter_results_async(
+                self.tests, bitstring, executor, max_workers, self.instrumentation
             )
-        return results
+        ) as results:
+            async for test, result in results:
+                self._notify(test.name, result)
+                yield test.name, result
+
+    async def run_async(
+        self,
+        source: AsyncSource,
+        executor: ExecutorKind = "thread",
+        max_workers: int | None = None,
+    ) -> dict:
+        """``run`` on the bits read from ``source``, without blocking the
+        event loop. The tests still running when ``self.policy`` settles the
+        verdict are cancelled and reported as SKIPPED."""
+        results = {}
+        async with aclosing(
+            self.iter_results(source, executor, max_workers)
+        ) as test_results:
+            async for name, result in test_results:
+                results[name] = (result.outcome.value, result.p_value, result.p_list)
+                if self.policy.settled(name, result):
+                    break
+        skipped = (TestOutcome.SKIPPED.value, None, None)
+        return {test.name: results.get(test.name, skipped) for test in self.tests}
+
+    def run_batch(
+        self,
+        bitstring: BitSequence | Sequence,
+        sequences: int | None = None,
+        sequence_length: int | None = None,
+        executor: ExecutorKind = "process",
+        max_workers: int | None = None,
+        alpha: float = 0.01,
+    ) -> BatchReport:
+        """Split ``bitstring`` into sequences and analyse their p-values.
+
+        This is the SP800-22 section 4 evaluation: every test runs on each
+        sequence, then the proportion of passing sequences and the
+        uniformity of the p-values are checked for every test.
+        """
+        return run_batch(
+            self.tests,
+            as_bit_sequence(bitstring),
+            sequences,
+            sequence_length,
+            executor,
+            max_workers,
+            alpha,
+        )
+
+    def stream(self, length: int | None = None) -> TestStream:
+        """Accumulator running every test over a stream of chunks.
+
+        Feed it with ``update(chunk)`` and call ``finalize()`` for the
+        results, shaped like ``run``'s, as often as needed. Memory stays
+        bounded whatever the length of the stream. When ``length`` (in bits)
+        is given, the tests use the parameters they would choose for a
+        sequence of that length, so a stream of exactly ``length`` bits gives
+        the results of ``run`` on it.
+        """
+        return TestStream(self.tests, length)
+
+    def monitor(
+        self,
+        window: int = 1000000,
+        interval: int | None = None,
+        expensive_interval: int | None = None,
+        on_alert: Callable[[Alert], None] | None = None,
+    ) -> HealthMonitor:
+        """Health monitor testing the last ``window`` bits of a live source
+        every ``interval`` bits, see ``HealthMonitor``."""
+        return HealthMonitor(self.tests, window, interval, expensive_interval, on_alert)
+
+    def mergeable_tests(self) -> list:
+        """Tests whose stream states can be accumulated in shards and merged."""
+        return [test for test in self.tests if test.accumulator().mergeable]
+
+    def shard(self, length: int, offset: int) -> TestStream:
+        """Stream of the mergeable tests over the shard starting at bit
+        ``offset`` of a sequence of ``length`` bits.
+
+        Shards of the same sequence are accumulated independently, then
+        merged in order with ``TestStream.merge`` into the stream of the
+        whole sequence.
+        """
+        return TestStream(self.mergeable_tests(), length, offset)
+
+    def resume(self, state: StreamState) -> TestStream:
+        """The stream saved with ``TestStream.snapshot``, to append more
+        chunks to or to merge."""
+        tests = {test.name: test for test in self.tests}
+        return TestStream.restore(
+            [tests[saved.test] for saved in state.accumulators], state
+        )
+
+    def run_sharded(
+        self,
+        bitstring: BitSequence | Sequence,
+        shards: int | None = None,
+        executor: ExecutorKind = "process",
+        max_workers: int | None = None,
+    ) -> dict:
+        """``run``, with the mergeable tests accumulated over ``shards``
+        disjoint parts of the sequence concurrently and merged. The other
+        tests run on the whole sequence."""
+        bitstring = as_bit_sequence(bitstring)
+        n = len(bitstring)
+        if shards is None:
+            shards = max_workers or os.cpu_count() or 1
+        bounds = [n * i // shards for i in range(shards + 1)]
+        tests = self.mergeable_tests()
+
+        if executor == "serial":
+            states = [
+                stream_shard(tests, bitstring, start, stop)
+                for start, stop in zip(bounds, bounds[1:])
+            ]
+        else:
+            pool = get_executor(executor, max_workers)
+            if executor == "thread":
+                futures = [
+                    pool.submit(stream_shard, tests, bitstring, start, stop)
+                    for start, stop in zip(bounds, bounds[1:])
+                ]
+                states = [f.result() for f in futures]
+            else:
+                with SharedBitSequence(bitstring) as shared:
+                    futures = [
+                        pool.submit(
+                            stream_shared_shard, tests, shared.name, n, start, stop
+                        )
+                        for start, stop in zip(bounds, bounds[1:])
+                    ]
+                    states = [f.result() for f in futures]
+
+        stream = TestStream.restore(tests, states[0])
+        for state in states[1:]:
+            stream.merge(TestStream.restore(tests, state))
+        merged = stream.finalize()
+
+        others = [test for test in self.tests if test not in tests]
+        whole = {
+            test.name: (result.outcome.value, result.p_value, result.p_list)
+            for test, result in iter_results(others, bitstring)
+        }
+        return {
+            test.name: merged[test.name] if test in tests else whole[test.name]
+            for test in self.tests
+        }
+
+    def _run_parallel(
+        self,
+        tests: list,
+        bitstring: BitSequence,
+        executor: ExecutorKind,
+        max_workers: int | None,
+    ) -> Iterator[tuple[object, TestResult]]:
+        pool = get_executor(executor, max_workers)
+        shared = None
+        if executor == "thread":
+            context = SequenceContext(bitstring)
+            futures = [
+                pool.submit(
+                    test.test,
+                    bitstring,
+                    context=context,
+                    instrumentation=self.instrumentation,
+                )
+                for test in tests
+            ]
+        else:
+            # Worker processes map the packed bits instead of receiving a pickle
+            shared = SharedBitSequence(bitstring)
+            futures = [
+                pool.submit(
+                    run_shared_test,
+                    test,
+                    shared.name,
+                    shared.length,
+                    self.instrumentation,
+                )
+                for test in tests
+            ]
+        try:
+            for test, future in zip(tests, futures):
+                yield test, future.result()
+        finally:
+            # Tests not started yet are dropped once the verdict is settled
+            for future in futures:
+                future.cancel()
+            if shared is not None:
+                # Let the running tests finish with the block before unlinking it
+                wait(futures)
+                shared.close()
 
-    def eligible_tests(self, bitstring: Sequence):
+    def eligible_tests(self, bitstring: BitSequence | Sequence):
+        bitstring = as_bit_sequence(bitstring)
+        context = SequenceContext(bitstring)
         results = {}
         for test in self.tests:
-            results[test.name] = test.is_eligible(bitstring)
+            results[test.name] = test.is_eligible(bitstring, context)
         return results
@@ -0,0 +1,98 @@
+# berlekamp_massey.py
+#
+# Linear complexity over GF(2) with the Berlekamp-Massey algorithm.
+#
+# linear_complexity keeps the connection polynomials of one sequence as
+# Python integers, so the discrepancy is a popcount of (c & window) and the
+# update is a shifted XOR, both word wide.
+#
+# batched_linear_complexity bit-slices many sequences of the same length:
+# bit l of every uint64 word belongs to sequence l of a group of 64, so each
+# step of the algorithm advances 64 sequences per word, and all the groups
+# at once as NumPy arrays. Lanes only differ by masks, never by control flow.
+
+import numpy as np
+
+_LANES = 64
+
+
+def linear_complexity(bits) -> tuple[int, int]:
+    """Linear complexity L of ``bits`` and its connection polynomial.
+
+    The polynomial is returned as an integer whose bit i is c_i.
+    """
+    c = 1
+    b = 1
+    L = 0
+    m = -1
+    window = 0  # bit i holds s_{N-i}
+    for N, bit in enumerate(bits):
+        window = (window << 1) | int(bit)
+        # discrepancy d = s_N + c_1 s_{N-1} + ... + c_L s_{N-L}
+        if (c & window).bit_count() & 1:
+            t = c
+            c ^= b << (N - m)
+            if L <= (N / 2):
+                L = N + 1 - L
+                m = N
+                b = t
+    return L, c
+
+
+def _slice(blocks: np.ndarray) -> np.ndarray:
+    """(N, M) bits to (M, groups) uint64 words, block g*64+l in bit l."""
+    n, m = blocks.shape
+    groups = -(-n // _LANES)
+    padded = np.zeros((groups * _LANES, m), dtype=np.uint8)
+    padded[:n] = blocks
+    lanes = padded.reshape(groups, _LANES, m).transpose(2, 0, 1)
+    packed = np.packbits(lanes, axis=-1, bitorder="little")
+    return np.ascontiguousarray(packed).view("<u8").reshape(m, groups)
+
+
+def _lane_bits(words: np.ndarray) -> np.ndarray:
+    """(groups,) uint64 to (groups, 64) booleans."""
+    return np.unpackbits(
+        words.astype("<u8").view(np.uint8).reshape(-1, 8), axis=-1, bitorder="little"
+    ).astype(bool)
+
+
+def _lane_words(lanes: np.ndarray) -> np.ndarray:
+    """(groups, 64) booleans to (groups,) uint64."""
+    return np.packbits(lanes, axis=-1, bitorder="little").view("<u8").reshape(-1)
+
+
+def batched_linear_complexity(blocks: np.ndarray) -> np.ndarray:
+    """Linear complexity of every row of a (N, M) array of bits."""
+    n, m = blocks.shape
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    s = _slice(blocks)
+    groups = s.shape[1]
+
+    c = np.zeros((m + 1, groups), dtype=np.uint64)
+    c[0] = ~np.uint64(0)
+    # x^(N-m) b(x), kept shifted so that every lane uses the same offset
+    shifted_b = np.zeros((m + 1, groups), dtype=np.uint64)
+    shifted_b[1] = ~np.uint64(0)
+    L = np.zeros((groups, _LANES), dtype=np.int64)
+
+    reversed_s = s[::-1]
+    for N in range(m):
+        # Before step N, c and shifted_b have no term above x^(N+1)
+        top = min(N + 2, m + 1)
+        d = s[N] ^ np.bitwise_xor.reduce(c[1 : N + 1] & reversed_s[m - N : m], axis=0)
+        if d.any():
+            # Lanes whose discrepancy is 1 and whose length changes
+            grow = _lane_bits(d) & (2 * L <= N)
+            L = np.where(grow, N + 1 - L, L)
+            grow_mask = _lane_words(grow)
+
+            t = c[:top].copy()
+            c[:top] ^= shifted_b[:top] & d
+            shifted_b[:top] = (t & grow_mask) | (shifted_b[:top] & ~grow_mask)
+        shift = min(top, m)
+        shifted_b[1 : shift + 1] = shifted_b[:shift].copy()
+        shifted_b[0] = 0
+
+    return L.reshape(-1)[:n]
@@ -1,5 +1,7 @@
 from math import gamma, e
 
+from .special_functions import igamc
+
 
 # Continued Fraction Computation
 # 6.5.31 Handbook of Mathematical Functions, page 263
@@ -72,4 +74,5 @@ def gammainc(a, x):
 
 
 def gammaincc(a, x):
-    return upper_incomplete_gamma(a, x) / gamma(a)
+    # Iterative and accurate for any a, and memoized for scalar arguments
+    return igamc(a, x)
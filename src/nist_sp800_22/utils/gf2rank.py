@@ -0,0 +1,66 @@
+# gf2rank.py
+#
+# Ranks of many binary matrices at once. Each row of a matrix is packed into
+# a uint64 word (so up to 64 columns), and Gaussian elimination runs on the
+# whole (N, M) array of words: one pass per column, each pass being a few
+# vectorized word-wide XORs over all N matrices.
+
+import numpy as np
+
+MAX_COLUMNS = 64
+
+# Number of matrices eliminated together, to bound the temporary arrays
+_CHUNK = 1 << 16
+
+
+def pack_rows(matrices: np.ndarray) -> np.ndarray:
+    """Pack (N, M, Q) bits (Q <= 64) into (N, M) uint64 rows.
+
+    Column j of a matrix becomes bit j of the row word.
+    """
+    n, m, q = matrices.shape
+    if q > MAX_COLUMNS:
+        raise ValueError("at most %d columns are supported, got %d" % (MAX_COLUMNS, q))
+    packed = np.packbits(matrices, axis=-1, bitorder="little")
+    words = np.zeros((n, m, 8), dtype=np.uint8)
+    words[:, :, : packed.shape[-1]] = packed
+    return words.view("<u8").reshape(n, m)
+
+
+def batched_rank(rows: np.ndarray, columns: int) -> np.ndarray:
+    """Rank over GF(2) of each matrix of a (N, M) array of packed rows."""
+    ranks = np.empty(rows.shape[0], dtype=np.int64)
+    for start in range(0, rows.shape[0], _CHUNK):
+        chunk = rows[start : start + _CHUNK]
+        ranks[start : start + len(chunk)] = _rank_chunk(chunk.copy(), columns)
+    return ranks
+
+
+def _rank_chunk(rows: np.ndarray, columns: int) -> np.ndarray:
+    n, m = rows.shape
+    index = np.arange(n)
+    # Rows already used as a pivot are never reused nor eliminated again
+    used = np.zeros((n, m), dtype=bool)
+    for column in range(columns):
+        has_bit = ((rows >> np.uint64(column)) & np.uint64(1)).astype(bool)
+        candidates = has_bit & ~used
+        has_pivot = candidates.any(axis=1)
+        pivot = candidates.argmax(axis=1)
+        used[index[has_pivot], pivot[has_pivot]] = True
+
+        # XOR the pivot row into every other unused row with this bit set
+        pivot_rows = np.where(has_pivot, rows[index, pivot], np.uint64(0))
+        eliminate = candidates & ~used
+        rows ^= np.where(eliminate, pivot_rows[:, None], np.uint64(0))
+    return used.sum(axis=1)
+
+
+def rank_probability(rank: int, rows: int, columns: int) -> float:
+    """Probability that a random rows x columns binary matrix has ``rank``."""
+    product = 1.0
+    for i in range(rank):
+        upper1 = 1.0 - (2.0 ** (i - columns))
+        upper2 = 1.0 - (2.0 ** (i - rows))
+        lower = 1.0 - (2.0 ** (i - rank))
+        product = product * ((upper1 * upper2) / lower)
+    return product * (2.0 ** ((rank * (columns + rows - rank)) - (rows * columns)))
@@ -0,0 +1,76 @@
+# longest_runs.py
+#
+# Longest run of ones in each block of a packed sequence, as used by the
+# longest run of ones in a block test.
+#
+# Each block is shifted into a row of whole bytes of its own, the bits past
+# its end being zeros, which end any run. Per-byte tables then give the run
+# of ones a byte starts with, the run it ends with and the longest run
+# inside it. The run of ones reaching the end of byte j of a row is the
+# suffix run of the last byte before it that is not all ones, plus 8 bits
+# per full byte since, so the whole row is resolved with one accumulated
+# maximum instead of a walk over its bits.
+
+import numpy as np
+
+from .popcount import CHUNK_BYTES
+
+
+def _byte_tables() -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    bits = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1)
+    prefix = np.zeros(256, dtype=np.int32)
+    suffix = np.zeros(256, dtype=np.int32)
+    inner = np.zeros(256, dtype=np.int32)
+    for byte in range(256):
+        run = 0
+        for bit in bits[byte]:
+            run = run + 1 if bit else 0
+            inner[byte] = max(inner[byte], run)
+        suffix[byte] = run
+        prefix[byte] = np.argmin(bits[byte]) if byte != 255 else 8
+    return prefix, suffix, inner
+
+
+_PREFIX, _SUFFIX, _INNER = _byte_tables()
+
+
+def row_longest_runs(rows: np.ndarray) -> np.ndarray:
+    """Longest run of ones in each row of MSB first packed bytes."""
+    count, width = rows.shape
+    if width == 0:
+        return np.zeros(count, dtype=np.int32)
+    column = np.arange(width, dtype=np.int32)
+    # Index of the last byte up to j that is not all ones, -1 if none
+    last = np.where(rows != 0xFF, column, -1)
+    np.maximum.accumulate(last, axis=1, out=last)
+    ending = _SUFFIX[rows[np.arange(count)[:, None], np.maximum(last, 0)]]
+    ending = np.where(last >= 0, ending, 0) + 8 * (column - last)
+    # The run through the start of byte j, or inside it
+    through = _PREFIX[rows]
+    through[:, 1:] += ending[:, :-1]
+    longest = np.maximum(np.maximum(through, _INNER[rows]), ending)
+    return longest.max(axis=1)
+
+
+def longest_runs(packed: np.ndarray, M: int, N: int) -> np.ndarray:
+    """Longest run of ones in each of the first N blocks of M bits."""
+    if M < 1 or N * M > len(packed) * 8:
+        raise ValueError(
+            "%d blocks of %d bits do not fit in %d bytes" % (N, M, len(packed))
+        )
+    width = -(-M // 8)
+    tail = M % 8
+    longest = np.empty(N, dtype=np.int32)
+    step = max(CHUNK_BYTES // (48 * width), 1)
+    # One byte past the end, for the bits shifted in from the next byte
+    padded = np.append(packed[: -(-N * M // 8)], np.uint8(0))
+    for a in range(0, N, step):
+        b = min(a + step, N)
+        start = np.arange(a, b, dtype=np.int64) * M
+        shift = (start % 8)[:, None].astype(np.uint8)
+        index = (start // 8)[:, None] + np.arange(width)
+        rows = (padded[index] << shift) | (padded[index + 1] >> (8 - shift))
+        if tail:
+            rows[:, -1] &= (0xFF00 >> tail) & 0xFF
+        longest[a:b] = row_longest_runs(rows)
+    return longest
@@ -0,0 +1,221 @@
+# pattern_counts.py
+#
+# Cyclic overlapping m-bit pattern counts, as used by the serial and the
+# approximate entropy tests.
+#
+# Every position i of the sequence gets the integer code of the m bits
+# starting there (wrapping around the end), built in m vectorized passes, and
+# a single bincount gives the whole histogram. The m-bit pattern starting at
+# i begins with the (m-k)-bit pattern starting at i, so shorter histograms
+# are sums of adjacent bins of the longer one and never need a recount.
+#
+# For m much larger than log2(n) a dense histogram of 2^m bins is mostly
+# zeros, so the sparse variants only keep the codes that occur. Codes are
+# built CODE_CHUNK positions at a time, so the temporaries stay the same
+# size whatever the length of the sequence.
+
+from typing import Iterator
+
+import numpy as np
+
+# Dense histograms are used while 2^m stays within this factor of n, and
+# while their int64 counts fit in DENSE_MAX_BYTES
+_DENSE_RATIO = 4
+DENSE_MAX_BYTES = 1 << 26
+CODE_CHUNK = 1 << 22
+
+
+def overlapping_codes(bits: np.ndarray, m: int) -> np.ndarray:
+    """Code of the m bits starting at each position, first bit highest."""
+    n = len(bits)
+    if not 1 <= m <= min(n, 64):
+        raise ValueError("pattern length must be in [1, %d], got %d" % (min(n, 64), m))
+    codes = np.zeros(n, dtype=np.uint32 if m <= 32 else np.uint64)
+    for j in range(m):
+        codes <<= 1
+        # bit j of the window at i is bits[(i + j) % n]
+        codes[: n - j] |= bits[j:]
+        codes[n - j :] |= bits[:j]
+    return codes
+
+
+def window_codes(bits: np.ndarray, m: int) -> np.ndarray:
+    """Code of the m bits starting at each position of the last axis, without
+    wrapping, so the last axis shrinks to ``len - m + 1``."""
+    if not 1 <= m <= 64:
+        raise ValueError("pattern length must be in [1, 64], got %d" % m)
+    width = max(bits.shape[-1] - m + 1, 0)
+    codes = np.zeros(
+        bits.shape[:-1] + (width,), dtype=np.uint32 if m <= 32 else np.uint64
+    )
+    for j in range(m):
+        codes <<= 1
+        codes |= bits[..., j : j + width]
+    return codes
+
+
+def chunk_codes(bits: np.ndarray, m: int) -> Iterator[np.ndarray]:
+    """``overlapping_codes(bits, m)``, CODE_CHUNK positions at a time."""
+    n = len(bits)
+    if not 1 <= m <= min(n, 64):
+        raise ValueError("pattern length must be in [1, %d], got %d" % (min(n, 64), m))
+    for a in range(0, n, CODE_CHUNK):
+        b = min(a + CODE_CHUNK, n)
+        window = bits[a : b + m - 1]
+        if b + m - 1 > n:  # The windows wrapping around the end
+            window = np.concatenate((window, bits[: b + m - 1 - n]))
+        yield window_codes(window, m)
+
+
+def block_codes(packed: np.ndarray, m: int, start: int, stop: int) -> np.ndarray:
+    """Codes of the non-overlapping m-bit blocks start .. stop - 1 of an MSB
+    first packed buffer, read from the three bytes each block spans."""
+    if not 1 <= m <= 16:
+        raise ValueError("block length must be in [1, 16], got %d" % m)
+    first = start * m // 8
+    window = packed[first : -(-stop * m // 8) + 2]
+    needed = -(-stop * m // 8) + 2 - first
+    if len(window) < needed:
+        window = np.concatenate((window, np.zeros(needed - len(window), np.uint8)))
+    bit = np.arange(start, stop, dtype=np.int64) * m - first * 8
+    byte = bit >> 3
+    word = (
+        (window[byte].astype(np.uint32) << 16)
+        | (window[byte + 1].astype(np.uint32) << 8)
+        | window[byte + 2]
+    )
+    shift = (24 - m - (bit & 7)).astype(np.uint32)
+    return ((word >> shift) & ((1 << m) - 1)).astype(np.uint16)
+
+
+def use_dense(n: int, m: int) -> bool:
+    return 2**m <= min(_DENSE_RATIO * max(n, 1), DENSE_MAX_BYTES // 8)
+
+
+def pattern_histogram(bits: np.ndarray, m: int) -> np.ndarray:
+    """Counts of the 2^m cyclic overlapping patterns, indexed by code."""
+    counts = np.zeros(2**m, dtype=np.int64)
+    for codes in chunk_codes(bits, m):
+        counts += np.bincount(codes, minlength=2**m)
+    return counts
+
+
+def marginal_histogram(histogram: np.ndarray, k: int) -> np.ndarray:
+    """Histogram of the patterns k bits shorter."""
+    return histogram.reshape(-1, 2**k).sum(axis=1)
+
+
+def sparse_pattern_counts(bits: np.ndarray, m: int) -> tuple[np.ndarray, np.ndarray]:
+    """(codes, counts) of the cyclic overlapping patterns that occur."""
+    codes = np.zeros(0, dtype=np.uint64)
+    counts = np.zeros(0, dtype=np.int64)
+    for chunk in chunk_codes(bits, m):
+        codes, counts = _merge_sparse(
+            codes, counts, *np.unique(chunk, return_counts=True)
+        )
+    return codes, counts
+
+
+def sparse_marginal_counts(
+    codes: np.ndarray, counts: np.ndarray, k: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """(codes, counts) of the patterns k bits shorter."""
+    shorter, inverse = np.unique(codes >> k, return_inverse=True)
+    return shorter, np.bincount(inverse, weights=counts, minlength=len(shorter)).astype(
+        np.int64
+    )
+
+
+class StreamingPatternCounts:
+    """Cyclic overlapping m-bit pattern counts of a sequence given in chunks.
+
+    The windows that straddle two chunks are counted thanks to the last m-1
+    bits of the previous chunk, and the m-1 windows that wrap around the end
+    are only added when the histogram is asked for, from the first and the
+    last m-1 bits of the sequence. Counts of consecutive shards merge the
+    same way, the windows across the boundary being counted from the last
+    bits of one shard and the first bits of the next.
+    """
+
+    def __init__(self, m: int, dense: bool = True):
+        self.m = m
+        self.dense = dense
+        self.n = 0
+        self.head = np.zeros(0, dtype=np.uint8)
+        self.tail = np.zeros(0, dtype=np.uint8)
+        if dense:
+            self.counts = np.zeros(2**m, dtype=np.int64)
+        else:
+            self.codes = np.zeros(0, dtype=np.uint64)
+            self.counts = np.zeros(0, dtype=np.int64)
+
+    def update(self, bits: np.ndarray) -> None:
+        m = self.m
+        if len(self.head) < m - 1:
+            self.head = np.concatenate((self.head, bits[: m - 1 - len(self.head)]))
+        window = np.concatenate((self.tail, bits))
+        self._add(window_codes(window, m))
+        self.tail = window[max(len(window) - (m - 1), 0) :].copy()
+        self.n += len(bits)
+
+    def merge(self, other: "StreamingPatternCounts") -> None:
+        """Add the counts of the sequence that follows this one."""
+        m = self.m
+        self._add(window_codes(np.concatenate((self.tail, other.head)), m))
+        if self.dense:
+            self.counts += other.counts
+        else:
+            self.codes, self.counts = _merge_sparse(
+                self.codes, self.counts, other.codes, other.counts
+            )
+        self.head = np.concatenate((self.head, other.head))[: m - 1]
+        tail = np.concatenate((self.tail, other.tail))
+        self.tail = tail[max(len(tail) - (m - 1), 0) :]
+        self.n += other.n
+
+    def _add(self, codes: np.ndarray) -> None:
+        if self.dense:
+            self.counts += np.bincount(codes, minlength=2**self.m)
+        else:
+            self.codes, self.counts = _merge_sparse(
+                self.codes, self.counts, *np.unique(codes, return_counts=True)
+            )
+
+    def state(self) -> dict:
+        state = {"n": self.n, "head": self.head, "tail": self.tail}
+        state["counts"] = self.counts
+        if not self.dense:
+            state["codes"] = self.codes
+        return state
+
+    def load(self, state: dict) -> None:
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def _wrapped_codes(self) -> np.ndarray:
+        # Windows starting in the last m-1 bits and ending in the first ones
+        return window_codes(np.concatenate((self.tail, self.head)), self.m)
+
+    def histogram(self) -> np.ndarray:
+        """Dense cyclic histogram, as ``pattern_histogram`` would give."""
+        return self.counts + np.bincount(self._wrapped_codes(), minlength=2**self.m)
+
+    def sparse_counts(self) -> tuple[np.ndarray, np.ndarray]:
+        """Sparse cyclic counts, as ``sparse_pattern_counts`` would give."""
+        return _merge_sparse(
+            self.codes,
+            self.counts,
+            *np.unique(self._wrapped_codes(), return_counts=True),
+        )
+
+
+def _merge_sparse(
+    codes: np.ndarray, counts: np.ndarray, new_codes: np.ndarray, new_counts: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    merged, inverse = np.unique(
+        np.concatenate((codes, new_codes.astype(np.uint64))), return_inverse=True
+    )
+    weights = np.concatenate((counts, new_counts))
+    return merged, np.bincount(inverse, weights=weights, minlength=len(merged)).astype(
+        np.int64
+    )
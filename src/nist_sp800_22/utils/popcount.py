@@ -0,0 +1,88 @@
+# popcount.py
+#
+# Bit counts over MSB first packed bytes, as used by the monobit, frequency
+# within block and runs tests.
+#
+# The packed bytes are never unpacked: np.bitwise_count gives the ones of
+# each byte, and the bits at the edges of a block are masked off the bytes
+# they share with the neighbouring blocks. The buffers are walked in slices
+# of CHUNK_BYTES so that the temporaries stay small on multi-GB sequences.
+
+import math
+
+import numpy as np
+
+CHUNK_BYTES = 1 << 24
+
+
+def _head(count: int) -> int:
+    # Mask of the first ``count`` bits of an MSB first byte
+    return (0xFF00 >> count) & 0xFF
+
+
+def popcount(packed: np.ndarray) -> int:
+    """Number of ones in the packed bytes."""
+    total = 0
+    for a in range(0, len(packed), CHUNK_BYTES):
+        total += int(np.bitwise_count(packed[a : a + CHUNK_BYTES]).sum(dtype=np.int64))
+    return total
+
+
+def block_popcounts(packed: np.ndarray, M: int, N: int) -> np.ndarray:
+    """Ones in each of the first N blocks of M bits.
+
+    The blocks repeat their alignment on bytes every lcm(M, 8) bits, so the
+    bytes are reshaped into rows of that many bits and the ones before each
+    block boundary of a row are a prefix sum of byte counts plus the head of
+    the byte the boundary falls in.
+    """
+    if M < 1 or N * M > len(packed) * 8:
+        raise ValueError(
+            "%d blocks of %d bits do not fit in %d bytes" % (N, M, len(packed))
+        )
+    g = math.gcd(M, 8)
+    row_bytes = M // g
+    per_row = 8 // g
+    rows = -(-N // per_row)
+    boundaries = np.arange(per_row + 1) * M
+    column = boundaries // 8
+    heads = np.array([_head(b % 8) for b in boundaries], dtype=np.uint8)
+
+    sums = np.empty((rows, per_row), dtype=np.int64)
+    step = max(CHUNK_BYTES // (9 * row_bytes), 1)
+    for a in range(0, rows, step):
+        b = min(a + step, rows)
+        chunk = packed[a * row_bytes : b * row_bytes]
+        if len(chunk) < (b - a) * row_bytes:  # The last row is cut short
+            chunk = np.concatenate(
+                (chunk, np.zeros((b - a) * row_bytes - len(chunk), dtype=np.uint8))
+            )
+        chunk = chunk.reshape(b - a, row_bytes)
+        before = np.zeros((b - a, row_bytes + 1), dtype=np.int64)
+        np.cumsum(np.bitwise_count(chunk), axis=1, out=before[:, 1:])
+        ones = before[:, column]
+        partial = column < row_bytes
+        ones[:, partial] += np.bitwise_count(chunk[:, column[partial]] & heads[partial])
+        sums[a:b] = np.diff(ones, axis=1)
+    return sums.reshape(-1)[:N]
+
+
+def count_transitions(packed: np.ndarray, n: int) -> int:
+    """Number of i < n - 1 with bit i != bit i + 1, the popcount of the
+    sequence XOR itself shifted by one bit."""
+    if n < 2:
+        return 0
+    count = n - 1
+    size = -(-count // 8)
+    total = 0
+    for a in range(0, size, CHUNK_BYTES):
+        b = min(a + CHUNK_BYTES, size)
+        chunk = packed[a:b]
+        following = packed[a + 1 : b + 1]
+        if len(following) < len(chunk):
+            following = np.append(following, np.uint8(0))
+        changes = chunk ^ ((chunk << 1) | (following >> 7))
+        if b == size and count % 8:
+            changes[-1] &= _head(count % 8)
+        total += int(np.bitwise_count(changes).sum(dtype=np.int64))
+    return total
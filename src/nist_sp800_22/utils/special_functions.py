@@ -0,0 +1,149 @@
+# special_functions.py
+#
+# The special functions behind the p-values, evaluated on NumPy arrays.
+#
+# igamc is the regularized upper incomplete gamma function Q(a, x). Below
+# x = a + 1 it is 1 - P(a, x) with P summed as a power series, above it is a
+# continued fraction evaluated with the modified Lentz algorithm. Both loops
+# run on whole arrays and stop, element by element, once the next term no
+# longer changes the result at double precision; the prefactor
+# x^a e^-x / gamma(a) is computed in log space, so large a does not overflow.
+#
+# Scalar calls go through an LRU memo, since the same (a, x) pairs come back
+# over and over in batch and second-level runs.
+
+import math
+from functools import lru_cache
+
+import numpy as np
+
+EPSILON = np.finfo(np.float64).eps
+MAX_ITERATIONS = 100000
+_TINY = 1e-300
+
+# Lanczos approximation, g = 7, n = 9
+_LANCZOS_G = 7.0
+_LANCZOS = np.array(
+    [
+        0.99999999999980993,
+        676.5203681218851,
+        -1259.1392167224028,
+        771.32342877765313,
+        -176.61502916214059,
+        12.507343278686905,
+        -0.13857109526572012,
+        9.9843695780195716e-6,
+        1.5056327351493116e-7,
+    ]
+)
+
+
+def _scalar_or_array(values: np.ndarray):
+    return float(values) if values.ndim == 0 else values
+
+
+def lgamma(x):
+    """log |gamma(x)|."""
+    x = np.asarray(x, dtype=np.float64)
+    # Reflection formula below 1/2
+    reflect = x < 0.5
+    z = np.where(reflect, 1.0 - x, x) - 1.0
+    series = _LANCZOS[0] + sum(_LANCZOS[i] / (z + i) for i in range(1, len(_LANCZOS)))
+    t = z + _LANCZOS_G + 0.5
+    result = 0.5 * math.log(2 * math.pi) + (z + 0.5) * np.log(t) - t + np.log(series)
+    with np.errstate(divide="ignore"):
+        result = np.where(
+            reflect, np.log(np.pi / np.abs(np.sin(np.pi * x))) - result, result
+        )
+    return _scalar_or_array(result)
+
+
+def _log_prefactor(a: np.ndarray, x: np.ndarray) -> np.ndarray:
+    # log(x^a e^-x / gamma(a))
+    return a * np.log(x) - x - lgamma(a)
+
+
+def _lower_series(a: np.ndarray, x: np.ndarray) -> np.ndarray:
+    """P(a, x) as x^a e^-x / gamma(a+1) * sum x^n / ((a+1)...(a+n))."""
+    total = np.ones_like(x)
+    term = np.ones_like(x)
+    denominator = a.copy()
+    active = np.arange(len(x))
+    for _ in range(MAX_ITERATIONS):
+        if len(active) == 0:
+            break
+        denominator[active] += 1.0
+        term[active] *= x[active] / denominator[active]
+        total[active] += term[active]
+        active = active[np.abs(term[active]) >= np.abs(total[active]) * EPSILON]
+    return total * np.exp(_log_prefactor(a, x)) / a
+
+
+def _upper_fraction(a: np.ndarray, x: np.ndarray) -> np.ndarray:
+    """Q(a, x) as a continued fraction (modified Lentz)."""
+    b = x + 1.0 - a
+    c = np.full_like(x, 1.0 / _TINY)
+    d = 1.0 / b
+    h = d.copy()
+    active = np.arange(len(x))
+    for i in range(1, MAX_ITERATIONS):
+        if len(active) == 0:
+            break
+        an = -i * (i - a[active])
+        b[active] += 2.0
+        d_active = an * d[active] + b[active]
+        d_active = np.where(np.abs(d_active) < _TINY, _TINY, d_active)
+        c_active = b[active] + an / c[active]
+        c_active = np.where(np.abs(c_active) < _TINY, _TINY, c_active)
+        d_active = 1.0 / d_active
+        delta = d_active * c_active
+        d[active] = d_active
+        c[active] = c_active
+        h[active] *= delta
+        active = active[np.abs(delta - 1.0) >= EPSILON]
+    return np.exp(_log_prefactor(a, x)) * h
+
+
+def _igamc_array(a: np.ndarray, x: np.ndarray) -> np.ndarray:
+    a, x = np.broadcast_arrays(
+        np.asarray(a, dtype=np.float64), np.asarray(x, dtype=np.float64)
+    )
+    shape = a.shape
+    a = a.reshape(-1)
+    x = x.reshape(-1)
+    result = np.ones_like(x)
+    result[np.isinf(x)] = 0.0
+    result[np.isnan(x) | np.isnan(a)] = np.nan
+
+    finite = np.isfinite(x) & np.isfinite(a) & (x > 0.0)
+    series = finite & (x < a + 1.0)
+    fraction = finite & ~series
+    if series.any():
+        result[series] = 1.0 - _lower_series(a[series], x[series])
+    if fraction.any():
+        result[fraction] = _upper_fraction(a[fraction], x[fraction])
+    return np.clip(result, 0.0, 1.0).reshape(shape)
+
+
+@lru_cache(maxsize=65536)
+def _igamc_scalar(a: float, x: float) -> float:
+    return float(_igamc_array(a, x))
+
+
+def igamc(a, x):
+    """Regularized upper incomplete gamma function Q(a, x), element-wise."""
+    if np.ndim(a) == 0 and np.ndim(x) == 0:
+        return _igamc_scalar(float(a), float(x))
+    return _igamc_array(a, x)
+
+
+def erfc(x):
+    """Complementary error function, element-wise."""
+    x = np.asarray(x, dtype=np.float64)
+    upper = np.asarray(igamc(0.5, x * x))
+    return _scalar_or_array(np.where(x >= 0.0, upper, 2.0 - upper))
+
+
+def normal_cdf(x):
+    """Standard normal cumulative distribution function, element-wise."""
+    return _scalar_or_array(0.5 * np.asarray(erfc(-np.asarray(x) * math.sqrt(0.5))))
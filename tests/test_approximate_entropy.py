@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+
+from nist_sp800_22.tests import ApproximateEntropyTest, NistSP80022r1Tests
+from nist_sp800_22.tests import TestOutcome as Outcome
+
+
+@pytest.mark.parametrize("bits", [[], [1], [0, 1]])
+def test_short_sequence_is_uneligible(bits):
+    assert ApproximateEntropyTest().test(bits).outcome == Outcome.UNELIGIBLE
+
+
+def test_short_sequence_in_the_suite():
+    results = NistSP80022r1Tests().run([0, 1])
+    assert results[ApproximateEntropyTest.name][0] == Outcome.UNELIGIBLE.value
+
+
+def test_shortest_eligible_sequence():
+    bits = np.array([0, 1, 1], dtype=np.uint8)
+    assert ApproximateEntropyTest().test(bits).outcome != Outcome.UNELIGIBLE
+    stream = ApproximateEntropyTest().accumulator(3)
+    stream.update(bits)
+    assert stream.finalize() == ApproximateEntropyTest().test(bits)
@@ -0,0 +1,76 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from nist_sp800_22.tests import NistSP80022r1Tests
+from nist_sp800_22.tests import TestOutcome as Outcome
+from nist_sp800_22.tests import asynchronous
+
+N = 100000
+
+
+@pytest.fixture(scope="module")
+def biased():
+    # Fails Monobit and most of the other tests
+    return (np.random.default_rng(17).random(N) < 0.52).astype(np.uint8)
+
+
+@pytest.fixture(scope="module")
+def random():
+    return np.random.default_rng(18).integers(0, 2, N, dtype=np.uint8)
+
+
+def outcomes(results):
+    return {name: outcome for name, (outcome, _, _) in results.items()}
+
+
+@pytest.mark.parametrize("executor", ["serial", "thread"])
+def test_run_async(biased, random, executor):
+    suite = NistSP80022r1Tests()
+    data = np.packbits(random).tobytes()
+    assert asyncio.run(suite.run_async(data, executor)) == suite.run(random)
+    results = asyncio.run(suite.run_async(np.packbits(biased).tobytes(), executor))
+    assert results["Monobit Test"][0] == Outcome.FAILED.value
+    assert "SKIPPED" in outcomes(results).values()
+
+
+def test_iter_results_from_stream_reader(random):
+    async def collect():
+        reader = asyncio.StreamReader()
+        reader.feed_data(np.packbits(random).tobytes())
+        reader.feed_eof()
+        suite = NistSP80022r1Tests()
+        return [name async for name, _ in suite.iter_results(reader, "thread")]
+
+    names = asyncio.run(collect())
+    assert sorted(names) == sorted(test.name for test in NistSP80022r1Tests.tests)
+
+
+def test_shared_block_outlives_the_running_tests(monkeypatch, biased):
+    submitted = []
+    closed = []
+
+    class Recording:
+        def __init__(self, pool):
+            self.pool = pool
+
+        def submit(self, *args, **kwargs):
+            future = self.pool.submit(*args, **kwargs)
+            submitted.append(future)
+            return future
+
+    class Shared(asynchronous.SharedBitSequence):
+        def close(self):
+            closed.append(all(future.done() for future in submitted))
+            super().close()
+
+    get_executor = asynchronous.get_executor
+    monkeypatch.setattr(
+        asynchronous, "get_executor", lambda *args: Recording(get_executor(*args))
+    )
+    monkeypatch.setattr(asynchronous, "SharedBitSequence", Shared)
+    # The default policy stops after Monobit, with the other tests running
+    results = asyncio.run(NistSP80022r1Tests().run_async(biased, "process"))
+    assert results["Monobit Test"][0] == Outcome.FAILED.value
+    assert closed == [True]
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from nist_sp800_22.utils.berlekamp_massey import (
+    batched_linear_complexity,
+    linear_complexity,
+)
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(11)
+
+
+def reference_linear_complexity(bits):
+    # Berlekamp-Massey as written in SP800-22 section 2.10.4
+    n = len(bits)
+    c = [1] + [0] * n
+    b = [1] + [0] * n
+    L, m = 0, -1
+    for N in range(n):
+        d = bits[N]
+        for i in range(1, L + 1):
+            d ^= c[i] & bits[N - i]
+        if d:
+            t = c[:]
+            for i in range(n + 1 - (N - m)):
+                c[N - m + i] ^= b[i]
+            if L <= N // 2:
+                L, m, b = N + 1 - L, N, t
+    return L
+
+
+@pytest.mark.parametrize("M", [13, 64, 200])
+def test_batched_linear_complexity(rng, M):
+    blocks = rng.integers(0, 2, (150, M), dtype=np.uint8)
+    blocks[0] = 0
+    blocks[1, :-1] = 0
+    expected = [reference_linear_complexity(block.tolist()) for block in blocks]
+    assert batched_linear_complexity(blocks).tolist() == expected
+    assert [linear_complexity(block)[0] for block in blocks] == expected
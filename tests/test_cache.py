@@ -0,0 +1,51 @@
+import numpy as np
+
+from nist_sp800_22.tests import MonobitTest, NistSP80022r1Tests, ResultCache, RunsTest
+from nist_sp800_22.tests.cache import sequence_digest
+from nist_sp800_22.bit_sequence import BitSequence
+
+
+def sequence(seed, n=20000):
+    return BitSequence.from_bits(
+        np.random.default_rng(seed).integers(0, 2, n, dtype=np.uint8)
+    )
+
+
+def test_results_are_reused(tmp_path):
+    bits = sequence(14)
+    calls = []
+    with ResultCache(tmp_path / "results.db") as cache:
+        suite = NistSP80022r1Tests(cache=cache)
+        suite.add_observer(lambda name, result: calls.append(result.metrics))
+        first = suite.run(bits)
+        second = suite.run(bits)
+    assert first == second
+    # Cached results come back without the metrics of a run
+    assert all(metrics is None for metrics in calls[len(first) :])
+    with ResultCache(tmp_path / "results.db") as cache:
+        assert len(
+            cache.lookup(NistSP80022r1Tests.tests, sequence_digest(bits))
+        ) == len(first)
+
+
+def test_keys_depend_on_sequence_and_parameters(tmp_path):
+    with ResultCache(tmp_path / "results.db") as cache:
+        digest = sequence_digest(sequence(15))
+        assert digest != sequence_digest(sequence(15, 20001))
+        assert digest != sequence_digest(sequence(16))
+        assert cache.key(MonobitTest(), digest) != cache.key(RunsTest(), digest)
+        suite = NistSP80022r1Tests.tests
+        keys = {cache.key(test, digest) for test in suite}
+        assert len(keys) == len(suite)
+
+
+def test_least_recently_used_results_are_evicted(tmp_path):
+    with ResultCache(tmp_path / "results.db", max_bytes=250) as cache:
+        test = MonobitTest()
+        digests = [sequence_digest(sequence(seed, 1000)) for seed in range(6)]
+        for seed, digest in enumerate(digests):
+            cache.store(test, digest, test.test(sequence(seed, 1000)))
+        assert cache.get(cache.key(test, digests[0])) is None
+        assert cache.get(cache.key(test, digests[-1])) is not None
+        cache.clear()
+        assert cache.get(cache.key(test, digests[-1])) is None
@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+from nist_sp800_22.cli import main
+
+
+@pytest.fixture
+def random_file(tmp_path):
+    path = tmp_path / "random.bin"
+    path.write_bytes(np.random.default_rng(0).integers(0, 256, 12500, np.uint8))
+    return str(path)
+
+
+@pytest.fixture
+def biased_file(tmp_path):
+    # Passes Monobit, fails the runs test
+    bits = np.tile(np.array([0, 0, 1, 1], dtype=np.uint8), 25000)
+    path = tmp_path / "biased.bin"
+    path.write_bytes(np.packbits(bits).tobytes())
+    return str(path)
+
+
+@pytest.mark.parametrize(
+    "options", [[], ["--fail-fast", "never"], ["--fail-fast", "first"], ["--stream"]]
+)
+def test_exit_status_follows_failures(capsys, random_file, biased_file, options):
+    assert main([random_file] + options) == 0
+    assert main([biased_file] + options) == 1
+
+
+def test_batch_exit_status(capsys, biased_file):
+    assert main([biased_file, "--batch", "--sequences", "10"]) == 1
@@ -0,0 +1,69 @@
+import math
+
+import numpy as np
+import pytest
+from pydantic import ValidationError
+
+from nist_sp800_22.bit_sequence import BitSequence
+from nist_sp800_22.tests import DiscreteFourierTransformTest
+from nist_sp800_22.tests.dft import _smooth_splits
+from nist_sp800_22.tests.parallel import get_executor
+from nist_sp800_22.tests.parameters import MIN_FFT_MEMORY
+
+
+def reference_p_value(bits):
+    # 2.6.4, with numpy's complex FFT of the -1/+1 sequence
+    n = len(bits)
+    x = bits[: n - n % 2].astype(np.int64) * 2 - 1
+    peaks = np.count_nonzero(
+        np.abs(np.fft.fft(x))[: n // 2] < math.sqrt(math.log(20) * n)
+    )
+    d = (peaks - 0.95 * n / 2) / math.sqrt(n * 0.95 * 0.05 / 4)
+    return math.erfc(abs(d) / math.sqrt(2))
+
+
+@pytest.mark.parametrize("n", [1000, 1001, 12290, 100000])
+def test_transforms_match_reference(n):
+    bits = np.random.default_rng(n).integers(0, 2, n, dtype=np.uint8)
+    expected = reference_p_value(bits)
+    sequence = BitSequence.from_bits(bits)
+    assert DiscreteFourierTransformTest().test(sequence).p_value == pytest.approx(
+        expected, rel=1e-12
+    )
+    # Out of core, with the smallest budget
+    test = DiscreteFourierTransformTest(max_memory=MIN_FFT_MEMORY)
+    out_of_core = test._evaluate(*test._four_step_peaks(sequence.to_packed(), n, False))
+    assert out_of_core.p_value == pytest.approx(expected, rel=1e-12)
+
+
+def test_length_without_balanced_split_is_cut():
+    # 2 * 99991 only splits as 2 x 99991, whose rows exceed the budget
+    n = 2 * 99991
+    bits = np.random.default_rng(10).integers(0, 2, n, dtype=np.uint8)
+    (n1, n2), _ = _smooth_splits(n)
+    assert n - n1 * n2 < n1
+    result = DiscreteFourierTransformTest(max_memory=MIN_FFT_MEMORY).test(
+        BitSequence.from_bits(bits)
+    )
+    assert result.p_value == pytest.approx(
+        reference_p_value(bits[: n1 * n2]), rel=1e-12
+    )
+
+
+def test_budget_without_split_raises():
+    test = DiscreteFourierTransformTest(max_memory=MIN_FFT_MEMORY)
+    n = 1 << 42
+    with pytest.raises(ValueError):
+        test._four_step_peaks(np.zeros(0, dtype=np.uint8), n, False)
+
+
+def test_budget_below_the_floor_is_rejected():
+    with pytest.raises(ValidationError):
+        DiscreteFourierTransformTest(max_memory=MIN_FFT_MEMORY - 1)
+
+
+def test_one_fft_thread_in_process_workers():
+    assert DiscreteFourierTransformTest()._workers() == -1
+    assert DiscreteFourierTransformTest(workers=3)._workers() == 3
+    pool = get_executor("process", 1)
+    assert pool.submit(DiscreteFourierTransformTest()._workers).result() == 1
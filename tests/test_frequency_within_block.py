@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+from scipy.special import gammaincc
+
+from nist_sp800_22.tests import FrequencyWithinBlockTest
+from nist_sp800_22.tests import TestOutcome as Outcome
+from nist_sp800_22.utils.popcount import block_popcounts
+
+
+def test_block_popcounts_match_reference():
+    bits = np.random.default_rng(7).integers(0, 2, 10007, dtype=np.uint8)
+    packed = np.packbits(bits)
+    for M in (1, 3, 8, 20, 101, 1000):
+        N = len(bits) // M
+        expected = bits[: N * M].reshape(N, M).sum(axis=1)
+        assert block_popcounts(packed, M, N).tolist() == expected.tolist()
+
+
+def test_matches_spec_formula():
+    # chi^2 = 4 M sum (pi_i - 1/2)^2, P-value = igamc(N / 2, chi^2 / 2) (2.2.4)
+    bits = np.random.default_rng(8).integers(0, 2, 10000, dtype=np.uint8)
+    M, N = 50, 200
+    pi = bits.reshape(N, M).mean(axis=1)
+    expected = gammaincc(N / 2, 4 * M * np.sum((pi - 0.5) ** 2) / 2)
+    result = FrequencyWithinBlockTest(block_size=M).test(bits)
+    assert result.p_value == pytest.approx(expected, rel=1e-9)
+
+
+@pytest.mark.parametrize("n", [20, 50, 99])
+def test_short_sequence_is_uneligible(n):
+    result = FrequencyWithinBlockTest().test(np.ones(n, dtype=np.uint8))
+    assert result.outcome == Outcome.UNELIGIBLE
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from nist_sp800_22.utils.gf2rank import batched_rank, pack_rows
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(11)
+
+
+def reference_rank(matrix):
+    rows = [int("".join(map(str, row)), 2) for row in matrix]
+    rank = 0
+    for column in reversed(range(matrix.shape[1])):
+        pivot = next((r for r in rows if r >> column & 1), None)
+        if pivot is None:
+            continue
+        rows.remove(pivot)
+        rows = [r ^ pivot if r >> column & 1 else r for r in rows]
+        rank += 1
+    return rank
+
+
+@pytest.mark.parametrize("shape", [(32, 32), (6, 8), (5, 64), (64, 3)])
+def test_batched_rank(rng, shape):
+    # Low density rows, so that low ranks occur as well
+    matrices = (rng.random((300,) + shape) < 0.2).astype(np.uint8)
+    ranks = batched_rank(pack_rows(matrices), shape[1])
+    assert ranks.tolist() == [reference_rank(matrix) for matrix in matrices]
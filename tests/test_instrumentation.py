@@ -0,0 +1,48 @@
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from nist_sp800_22.tests import Instrumentation, NistSP80022r1Tests
+from nist_sp800_22.tests import TestOutcome as Outcome
+from nist_sp800_22.tests.test_interface import TestInterface as Interface
+from nist_sp800_22.tests.test_result import TestResult as Result
+
+
+class Allocating(Interface):
+    name = "Allocating"
+
+    def __init__(self, size):
+        self.size = size
+
+    def is_eligible(self, bitstring, context=None):
+        return True
+
+    def _test(self, bitstring, verbose=False, context=None):
+        buffer = np.ones(self.size, dtype=np.uint8)
+        return Result(outcome=Outcome.PASSED, p_value=float(buffer[-1]), p_list=None)
+
+
+def test_concurrent_peaks_are_not_mixed():
+    instrumentation = Instrumentation(trace_memory=True)
+    sizes = [(4 + i % 4) << 20 for i in range(16)]
+    with ThreadPoolExecutor(8) as pool:
+        results = list(
+            pool.map(
+                lambda size: instrumentation.measure(Allocating(size), [0, 1]), sizes
+            )
+        )
+    for size, result in zip(sizes, results):
+        assert size <= result.metrics.peak_memory_bytes < size + (1 << 20)
+    assert not tracemalloc.is_tracing()
+
+
+def test_thread_executor_records_metrics():
+    bits = np.random.default_rng(6).integers(0, 2, 100000, dtype=np.uint8)
+    suite = NistSP80022r1Tests(Instrumentation(trace_memory=True))
+    results = {}
+    suite.add_observer(lambda name, result: results.update({name: result}))
+    suite.run(bits, executor="thread")
+    assert results
+    for result in results.values():
+        assert result.metrics.peak_memory_bytes >= 0
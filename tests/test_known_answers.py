@@ -0,0 +1,66 @@
+# Worked examples of NIST SP800-22 Rev1a, section 2
+import pytest
+
+from nist_sp800_22.tests import (
+    ApproximateEntropyTest,
+    CumulativeSumsTest,
+    DiscreteFourierTransformTest,
+    LongestRunOnesInABlockTest,
+    MonobitTest,
+    RunsTest,
+    SerialTest,
+)
+from nist_sp800_22.utils.berlekamp_massey import linear_complexity
+
+# The 100 bits used by the examples of sections 2.1.8, 2.3.8, 2.6.8, 2.12.8
+# and 2.13.8
+E100 = (
+    "11001001000011111101101010100010001000010110100011"
+    "00001000110100110001001100011001100010100010111000"
+)
+
+# Section 2.4.8
+E128 = (
+    "11001100000101010110110001001100111000000000001001001101010100010001"
+    "001111010110100000001101011111001100111001101101100010110010"
+)
+
+
+def bits(text):
+    return [int(bit) for bit in text]
+
+
+@pytest.mark.parametrize(
+    "test, epsilon, p_value",
+    [
+        (MonobitTest(), "1011010101", 0.527089),
+        (MonobitTest(), E100, 0.109599),
+        (RunsTest(), "1001101011", 0.147232),
+        (RunsTest(), E100, 0.500798),
+        (LongestRunOnesInABlockTest(), E128, 0.180609),
+        (DiscreteFourierTransformTest(), E100, 0.646355),
+        (ApproximateEntropyTest(pattern_length=3), "0100110101", 0.261961),
+        (ApproximateEntropyTest(pattern_length=2), E100, 0.235301),
+    ],
+)
+def test_p_value(test, epsilon, p_value):
+    assert test.test(bits(epsilon)).p_value == pytest.approx(p_value, abs=1e-6)
+
+
+@pytest.mark.parametrize(
+    "test, epsilon, p_list, tolerance",
+    [
+        (SerialTest(pattern_length=3), "0011011101", [0.808792, 0.670320], 1e-6),
+        # Worked out with rounded normal tables in 2.13.4
+        (CumulativeSumsTest(), "1011010111", [0.4116588, 0.4116588], 1e-4),
+        (CumulativeSumsTest(), E100, [0.219194, 0.114866], 1e-6),
+    ],
+)
+def test_p_list(test, epsilon, p_list, tolerance):
+    result = test.test(bits(epsilon))
+    assert result.p_list == pytest.approx(p_list, abs=tolerance)
+
+
+def test_linear_complexity():
+    # Section 2.10.4
+    assert linear_complexity(bits("1101011110001"))[0] == 4
@@ -0,0 +1,34 @@
+import numpy as np
+
+from nist_sp800_22.tests import LongestRunOnesInABlockTest
+from nist_sp800_22.tests import TestOutcome as Outcome
+from nist_sp800_22.utils.longest_runs import longest_runs
+
+
+def reference_longest_runs(bits, M, N):
+    longest = []
+    for block in bits[: N * M].reshape(N, M):
+        run = best = 0
+        for bit in block:
+            run = run + 1 if bit else 0
+            best = max(best, run)
+        longest.append(best)
+    return longest
+
+
+def test_longest_runs_match_reference():
+    rng = np.random.default_rng(5)
+    # Long runs, to cross byte boundaries
+    bits = (rng.random(20000) < 0.8).astype(np.uint8)
+    packed = np.packbits(bits)
+    for M in (8, 13, 128, 1000):
+        N = len(bits) // M
+        assert longest_runs(packed, M, N).tolist() == reference_longest_runs(bits, M, N)
+
+
+def test_block_larger_than_sequence_is_uneligible():
+    bits = np.random.default_rng(6).integers(0, 2, 5000, dtype=np.uint8)
+    result = LongestRunOnesInABlockTest(block_size=10000).test(bits)
+    assert result.outcome == Outcome.UNELIGIBLE
+    result = LongestRunOnesInABlockTest().test(bits[:100])
+    assert result.outcome == Outcome.UNELIGIBLE
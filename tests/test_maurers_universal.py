@@ -0,0 +1,40 @@
+import math
+
+import numpy as np
+import pytest
+
+from nist_sp800_22.tests import MaurersUniversalTest
+from nist_sp800_22.utils.pattern_counts import block_codes
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(11)
+
+
+@pytest.mark.parametrize("m", [1, 5, 8, 11, 16])
+def test_block_codes(rng, m):
+    bits = rng.integers(0, 2, 1000, dtype=np.uint8)
+    blocks = len(bits) // m
+    expected = [
+        int("".join(map(str, bits[i * m : (i + 1) * m])), 2) for i in range(blocks)
+    ]
+    assert block_codes(np.packbits(bits), m, 0, blocks).tolist() == expected
+    assert block_codes(np.packbits(bits), m, 3, blocks).tolist() == expected[3:]
+
+
+def test_maurers_universal(rng):
+    # Steps 3 to 6 of SP800-22 section 2.9.4, one block at a time
+    bits = rng.integers(0, 2, 400000, dtype=np.uint8)
+    L, Q = 6, 640
+    blocks = len(bits) // L
+    K = blocks - Q
+    last = [0] * 2**L
+    total = 0.0
+    for i in range(blocks):
+        code = int("".join(map(str, bits[i * L : (i + 1) * L])), 2)
+        if i >= Q:
+            total += math.log2(i + 1 - last[code])
+        last[code] = i + 1
+    expected = MaurersUniversalTest()._evaluate(L, K, total).p_value
+    assert MaurersUniversalTest().test(bits).p_value == pytest.approx(expected)
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from nist_sp800_22.tests import NistSP80022r1Tests
+from nist_sp800_22.tests import TestOutcome as Outcome
+
+WINDOW = 100000
+
+
+def test_incremental_statistics_match_the_window():
+    suite = NistSP80022r1Tests()
+    monitor = suite.monitor(WINDOW, interval=WINDOW // 4)
+    data = np.random.default_rng(12).integers(0, 256, 3 * WINDOW // 8, np.uint8)
+    a = 0
+    for size in (1000, 4001, 7, 12500, 20000) * 4:
+        monitor.update(data[a : a + size].tobytes())
+        a += size
+    results = monitor.evaluate()
+    window = monitor.window_bits()
+    assert len(window) == WINDOW
+    for test in suite.tests:
+        expected = test.test(window)
+        assert results[test.name].outcome == expected.outcome, test.name
+        assert results[test.name].p_value == pytest.approx(expected.p_value)
+        assert results[test.name].p_list == pytest.approx(expected.p_list)
+
+
+def test_biased_source_raises_alerts():
+    alerts = []
+    monitor = NistSP80022r1Tests().monitor(WINDOW, on_alert=alerts.append)
+    rng = np.random.default_rng(13)
+    monitor.update(rng.integers(0, 256, WINDOW // 8, np.uint8).tobytes())
+    assert not any(alert.test == "Monobit Test" for alert in alerts)
+    # Mostly ones
+    biased = np.packbits(rng.random(WINDOW) < 0.55)
+    monitor.update(biased.tobytes())
+    monobit = [alert for alert in alerts if alert.test == "Monobit Test"]
+    assert monobit and monobit[-1].result.outcome == Outcome.FAILED
+    assert WINDOW < monobit[0].position <= 2 * WINDOW
+
+
+def test_window_must_be_whole_bytes():
+    with pytest.raises(ValueError):
+        NistSP80022r1Tests().monitor(1001)
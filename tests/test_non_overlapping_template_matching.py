@@ -0,0 +1,60 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from nist_sp800_22.tests import NonOverlappingTemplateMatchingTest
+from nist_sp800_22.tests import TestOutcome as Outcome
+from nist_sp800_22.tests import non_overlapping_template_matching
+from nist_sp800_22.tests.non_overlapping_template_matching import (
+    aperiodic_templates,
+)
+
+
+def reference_matches(block, template, m):
+    # Steps 2 and 3 of SP800-22 section 2.7.4: skip m bits after a match
+    count, i = 0, 0
+    while i <= len(block) - m:
+        if int("".join(map(str, block[i : i + m])), 2) == template:
+            count += 1
+            i += m
+        else:
+            i += 1
+    return count
+
+
+@pytest.mark.parametrize("chunk", [1 << 22, 1000, 1])
+def test_matches_in_chunks_match_reference(monkeypatch, chunk):
+    monkeypatch.setattr(non_overlapping_template_matching, "CODE_CHUNK", chunk)
+    m = 4
+    test = NonOverlappingTemplateMatchingTest(template_length=m)
+    blocks = np.random.default_rng(9).integers(0, 2, (8, 1001), dtype=np.uint8)
+    expected = [
+        [reference_matches(block.tolist(), int(t), m) for t in aperiodic_templates(m)]
+        for block in blocks
+    ]
+    assert test._matches(blocks).tolist() == expected
+
+
+def test_memory_is_bounded():
+    # 32 MB of unpacked bits; more than 12 bytes per bit without chunks
+    bits = np.random.default_rng(10).integers(0, 2, 32 * 10**6, dtype=np.uint8)
+    test = NonOverlappingTemplateMatchingTest()
+    tracemalloc.start()
+    try:
+        test._matches(bits.reshape(8, -1))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert peak < 128 << 20
+
+
+@pytest.mark.parametrize("n", [0, 7, 8, 71])
+def test_too_short_for_a_template_per_block_is_uneligible(n):
+    bits = np.ones(n, dtype=np.uint8)
+    assert NonOverlappingTemplateMatchingTest().test(bits).outcome == (
+        Outcome.UNELIGIBLE
+    )
+    accumulator = NonOverlappingTemplateMatchingTest().accumulator(n)
+    accumulator.update(bits)
+    assert accumulator.finalize().outcome == Outcome.UNELIGIBLE
@@ -0,0 +1,40 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from nist_sp800_22.tests import OverlappingTemplateMatchingTest
+from nist_sp800_22.tests.overlapping_template_matching import (
+    template_class_probabilities,
+)
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(11)
+
+
+@pytest.mark.parametrize("template", ["1111", "0110", "101"])
+def test_overlapping_matches(rng, template):
+    test = OverlappingTemplateMatchingTest(template=template, block_size=200)
+    blocks = (rng.random((50, 200)) < 0.7).astype(np.uint8)
+    expected = [
+        sum(
+            "".join(map(str, block[i : i + len(template)])) == template
+            for i in range(200 - len(template) + 1)
+        )
+        for block in blocks
+    ]
+    assert test._matches(blocks).tolist() == expected
+
+
+def test_template_class_probabilities():
+    # Every sequence of M bits, for a small M
+    template, M, K = (1, 0, 1), 12, 3
+    counts = np.zeros(K + 1)
+    for bits in itertools.product((0, 1), repeat=M):
+        matches = sum(bits[i : i + 3] == template for i in range(M - 2))
+        counts[min(matches, K)] += 1
+    assert template_class_probabilities(template, M, K) == pytest.approx(
+        counts / 2**M, abs=1e-12
+    )
@@ -0,0 +1,45 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+from nist_sp800_22.tests import NistSP80022r1Tests
+
+
+def test_executors_agree():
+    bits = np.random.default_rng(9).integers(0, 2, 100000, dtype=np.uint8)
+    suite = NistSP80022r1Tests()
+    serial = suite.run(bits)
+    assert suite.run(bits, executor="thread") == serial
+    assert suite.run(bits, executor="process", max_workers=2) == serial
+
+
+# Workers forked before the parent's resource tracker started have trackers
+# of their own, which unlink whatever they registered when they exit
+ATTACH_SCRIPT = """
+import multiprocessing, time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from nist_sp800_22.bit_sequence import BitSequence
+from nist_sp800_22.tests import MonobitTest
+from nist_sp800_22.tests.parallel import SharedBitSequence, run_shared_test
+
+pool = ProcessPoolExecutor(2, mp_context=multiprocessing.get_context("fork"))
+pool.submit(int).result()
+with SharedBitSequence(BitSequence.from_buffer(bytes(range(256)))) as shared:
+    for _ in range(4):
+        pool.submit(run_shared_test, MonobitTest(), shared.name, 2048).result()
+    pool.shutdown()
+    time.sleep(0.5)
+    SharedMemory(name=shared.name).close()
+"""
+
+
+def test_workers_leave_the_block_to_the_parent():
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    process = subprocess.run(
+        [sys.executable, "-c", ATTACH_SCRIPT], env=env, capture_output=True, text=True
+    )
+    assert process.returncode == 0, process.stderr
+    assert "resource_tracker" not in process.stderr
@@ -0,0 +1,17 @@
+import numpy as np
+import pytest
+
+from nist_sp800_22.utils.popcount import count_transitions, popcount
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(11)
+
+
+@pytest.mark.parametrize("n", [0, 1, 2, 7, 8, 9, 1001])
+def test_popcount_and_transitions(rng, n):
+    bits = rng.integers(0, 2, n, dtype=np.uint8)
+    packed = np.packbits(bits)
+    assert popcount(packed) == int(bits.sum())
+    assert count_transitions(packed, n) == int(np.count_nonzero(np.diff(bits)))
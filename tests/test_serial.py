@@ -0,0 +1,54 @@
+import tracemalloc
+
+import numpy as np
+
+from nist_sp800_22.tests import SerialTest
+from nist_sp800_22.tests import TestOutcome as Outcome
+from nist_sp800_22.utils import pattern_counts
+from nist_sp800_22.utils.pattern_counts import (
+    overlapping_codes,
+    pattern_histogram,
+    sparse_pattern_counts,
+    use_dense,
+)
+
+
+def test_default_pattern_length_is_capped():
+    test = SerialTest()
+    assert test.pattern_length(10**6) == 16
+    assert test.pattern_length(8 * 10**9) == SerialTest.MAX_PATTERN_LENGTH
+    assert SerialTest(pattern_length=20).pattern_length(8 * 10**9) == 20
+
+
+def test_dense_histograms_are_bounded():
+    assert use_dense(10**6, 16)
+    assert not use_dense(8 * 10**9, 30)
+    assert not use_dense(1000, 16)
+
+
+def test_chunked_counts_match_whole_codes(monkeypatch):
+    bits = np.random.default_rng(1).integers(0, 2, 10000, dtype=np.uint8)
+    reference = np.bincount(overlapping_codes(bits, 6), minlength=64)
+    monkeypatch.setattr(pattern_counts, "CODE_CHUNK", 999)
+    assert np.array_equal(pattern_histogram(bits, 6), reference)
+    codes, counts = sparse_pattern_counts(bits, 6)
+    assert np.array_equal(codes, np.flatnonzero(reference))
+    assert np.array_equal(counts, reference[reference > 0])
+
+
+def test_stream_of_large_declared_length():
+    bits = np.random.default_rng(2).integers(0, 2, 100000, dtype=np.uint8)
+    tracemalloc.start()
+    try:
+        accumulator = SerialTest().accumulator(8 * 10**10)
+        accumulator.update(bits)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert accumulator.m == SerialTest.MAX_PATTERN_LENGTH
+    assert peak < 16 << 20
+
+
+def test_short_sequence_is_uneligible():
+    result = SerialTest().test([0, 1, 1, 0])
+    assert result.outcome == Outcome.UNELIGIBLE
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from nist_sp800_22.tests import NeverStop, NistSP80022r1Tests, StreamState
+
+N = 200003
+
+
+@pytest.fixture(scope="module")
+def bits():
+    return np.random.default_rng(3).integers(0, 2, N, dtype=np.uint8)
+
+
+def chunks(bits, seed, largest=5000):
+    rng = np.random.default_rng(seed)
+    a = 0
+    while a < len(bits):
+        b = a + int(rng.integers(1, largest))
+        yield bits[a:b]
+        a = b
+
+
+def test_merged_shards_match_whole_stream(bits):
+    suite = NistSP80022r1Tests()
+    whole = suite.shard(N, 0)
+    whole.update(bits)
+    bounds = [0, 1, 777, 25001, 25002, 100000, N]
+    shards = []
+    for start, stop in zip(bounds, bounds[1:]):
+        shard = suite.shard(N, start)
+        for chunk in chunks(bits[start:stop], start, 3000):
+            shard.update(chunk)
+        # Saved and restored on the way, as a worker would
+        shards.append(suite.resume(shard.snapshot()))
+    merged = shards[0]
+    for shard in shards[1:]:
+        merged.merge(shard)
+    assert merged.n == N
+    results = merged.finalize()
+    for name, (outcome, p_value, p_list) in whole.finalize().items():
+        assert results[name][0] == outcome, name
+        assert results[name][1] == pytest.approx(p_value), name
+        assert results[name][2] == pytest.approx(p_list), name
+
+
+def test_resumed_stream_appends_to_saved_state(bits):
+    suite = NistSP80022r1Tests()
+    whole = suite.stream(N)
+    whole.update(bits)
+    stream = suite.stream(N)
+    stream.update(bits[:70001])
+    saved = stream.snapshot().model_dump_json()
+    stream = suite.resume(StreamState.model_validate_json(saved))
+    stream.update(bits[70001:])
+    results = stream.finalize()
+    for name, (outcome, p_value, p_list) in whole.finalize().items():
+        assert results[name][0] == outcome, name
+        assert results[name][1] == pytest.approx(p_value), name
+        assert results[name][2] == pytest.approx(p_list), name
+
+
+@pytest.mark.parametrize("executor", ["serial", "process"])
+def test_run_sharded_matches_run(bits, executor):
+    suite = NistSP80022r1Tests(policy=NeverStop())
+    expected = suite.run(bits)
+    results = suite.run_sharded(bits, shards=3, executor=executor)
+    assert list(results) == list(expected)
+    for name, (outcome, p_value, p_list) in expected.items():
+        assert results[name][0] == outcome, name
+        assert results[name][1] == pytest.approx(p_value), name
+        assert results[name][2] == pytest.approx(p_list), name
@@ -0,0 +1,102 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from nist_sp800_22.tests import (
+    FrequencyWithinBlockTest,
+    NeverStop,
+    NistSP80022r1Tests,
+    NonOverlappingTemplateMatchingTest,
+    TestStream as Stream,
+)
+from nist_sp800_22.tests.streaming import BlockBuffer
+
+N = 200003
+
+
+@pytest.fixture(scope="module")
+def bits():
+    return np.random.default_rng(3).integers(0, 2, N, dtype=np.uint8)
+
+
+def chunks(bits, seed, largest=5000):
+    rng = np.random.default_rng(seed)
+    a = 0
+    while a < len(bits):
+        b = a + int(rng.integers(1, largest))
+        yield bits[a:b]
+        a = b
+
+
+@pytest.mark.parametrize(
+    "test", [FrequencyWithinBlockTest(), NonOverlappingTemplateMatchingTest()]
+)
+def test_stream_in_uneven_chunks_matches_run(bits, test):
+    expected = test.test(bits)
+    stream = Stream([test], N)
+    for chunk in chunks(bits, 4):
+        stream.update(chunk)
+    outcome, p_value, p_list = stream.finalize()[test.name]
+    assert outcome == expected.outcome.value
+    assert p_value == pytest.approx(expected.p_value)
+    assert p_list == pytest.approx(expected.p_list)
+
+
+def test_block_buffer_keeps_one_block():
+    buffer = BlockBuffer(10, limit=4, offset=4)
+    assert len(buffer.push(np.arange(5, dtype=np.uint8))) == 0
+    assert buffer.head.tolist() == [0, 1, 2, 3, 4]
+    blocks = buffer.push(np.ones(27, dtype=np.uint8))
+    assert buffer.head.tolist() == [0, 1, 2, 3, 4, 1]
+    assert blocks.shape == (2, 10)
+    assert buffer.pending.tolist() == [1] * 6
+    blocks = buffer.push(np.zeros(100, dtype=np.uint8))
+    assert blocks.tolist() == [[1] * 6 + [0] * 4]
+    assert len(buffer.push(np.zeros(100, dtype=np.uint8))) == 0
+
+
+def test_stream_of_large_declared_length(bits):
+    tracemalloc.start()
+    try:
+        stream = NistSP80022r1Tests().stream(8 * 10**10)
+        stream.update(bits)
+        stream.snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert peak < 64 << 20
+
+
+def test_stream_of_every_test_matches_run():
+    # Long enough for every test, short enough for one DFT block, and with
+    # enough cycles for the random excursion tests
+    n = 1100003
+    bits = np.random.default_rng(20).integers(0, 2, n, dtype=np.uint8)
+    suite = NistSP80022r1Tests(policy=NeverStop())
+    expected = suite.run(bits)
+    stream = suite.stream(n)
+    for chunk in chunks(bits, 20, 300000):
+        stream.update(np.packbits(chunk).tobytes() if len(chunk) % 8 == 0 else chunk)
+    results = stream.finalize()
+    assert list(results) == list(expected)
+    for name, (outcome, p_value, p_list) in expected.items():
+        assert outcome != "UNELIGIBLE", name
+        assert results[name][0] == outcome, name
+        assert results[name][1] == pytest.approx(p_value, rel=1e-9), name
+        assert results[name][2] == pytest.approx(p_list, rel=1e-9), name
+
+
+@pytest.mark.parametrize("n", [0, 1, 5, 15])
+def test_stream_of_short_declared_length(n):
+    # Too short for the default m of the pattern tests and for a DFT block
+    stream = NistSP80022r1Tests().stream(n)
+    assert stream.snapshot().accumulators
+
+
+def test_short_stream_matches_run():
+    bits = np.random.default_rng(21).integers(0, 2, 20, dtype=np.uint8)
+    suite = NistSP80022r1Tests(policy=NeverStop())
+    stream = suite.stream(20)
+    stream.update(bits)
+    assert stream.finalize() == suite.run(bits)
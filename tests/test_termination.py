@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from nist_sp800_22.tests import (
+    DEFAULT_POLICY,
+    NeverStop,
+    NistSP80022r1Tests,
+    StopOnFailureOf,
+    StopOnFirstFailure,
+)
+from nist_sp800_22.tests import TestOutcome as Outcome
+
+N = 100000
+
+
+@pytest.fixture(scope="module")
+def biased():
+    # Fails Monobit and most of the other tests
+    return (np.random.default_rng(17).random(N) < 0.52).astype(np.uint8)
+
+
+@pytest.fixture(scope="module")
+def random():
+    return np.random.default_rng(18).integers(0, 2, N, dtype=np.uint8)
+
+
+def outcomes(results):
+    return {name: outcome for name, (outcome, _, _) in results.items()}
+
+
+@pytest.mark.parametrize("executor", ["serial", "thread", "process"])
+def test_default_policy_stops_after_monobit(biased, executor):
+    results = NistSP80022r1Tests().run(biased, executor=executor)
+    assert list(results) == [test.name for test in NistSP80022r1Tests.tests]
+    assert results["Monobit Test"][0] == Outcome.FAILED.value
+    skipped = [
+        name for name, outcome in outcomes(results).items() if outcome == "SKIPPED"
+    ]
+    assert len(skipped) == len(results) - 1
+    assert results["Linear Complexity Test"] == (Outcome.SKIPPED.value, None, None)
+
+
+def test_tests_run_cheapest_first(biased):
+    ran = []
+    suite = NistSP80022r1Tests(policy=StopOnFailureOf(tests={"Runs Test"}))
+    suite.add_observer(lambda name, result: ran.append(name))
+    results = suite.run(biased)
+    costs = {test.name: test.cost for test in suite.tests}
+    assert [costs[name] for name in ran] == sorted(costs[name] for name in ran)
+    assert ran[-1] == "Runs Test"
+    assert outcomes(results)["Binary Matrix Rank Test"] == "SKIPPED"
+
+
+def test_first_failure_stops(biased):
+    results = NistSP80022r1Tests(policy=StopOnFirstFailure()).run(biased)
+    failed = [
+        name for name, outcome in outcomes(results).items() if outcome == "FAILED"
+    ]
+    assert failed == ["Monobit Test"]
+
+
+def test_never_stop_runs_everything(biased, random):
+    for bits in (biased, random):
+        results = NistSP80022r1Tests(policy=NeverStop()).run(bits)
+        assert "SKIPPED" not in outcomes(results).values()
+    assert NistSP80022r1Tests().run(random) == NistSP80022r1Tests(
+        policy=NeverStop()
+    ).run(random)
+
+
+def test_default_policy():
+    assert NistSP80022r1Tests().policy == DEFAULT_POLICY